@@ -0,0 +1,304 @@
+"""
+Analytics Module
+Circulation rollups (day x category x membership type) maintained
+incrementally from the change log, for dashboards and reports
+
+Each loan's contribution is kept in loan_facts. When a loan changes, its
+old contribution is subtracted and the new one added, so reports never
+rescan transactions. Category and membership type are those at the time
+the loan was first counted.
+
+Usage: python analytics.py [--db library.db] [--days 90] [--rebuild]
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from db_manager import DatabaseManager
+
+CONSUMER = 'analytics'
+DIMENSIONS = ('category', 'membership_type')
+
+# Loan facts derived from a transactions(_history) row t joined to books b and members m
+_FACT_SELECT = """
+    SELECT t.transaction_id,
+           date(t.issue_date),
+           CASE WHEN t.return_date IS NOT NULL AND t.return_date != '' THEN date(t.return_date) END,
+           COALESCE(b.category, ''),
+           COALESCE(m.membership_type, ''),
+           CASE WHEN t.return_date IS NOT NULL AND t.return_date != ''
+                THEN MAX(0, CAST(julianday(t.return_date) - julianday(t.issue_date) AS INTEGER)) END,
+           CASE WHEN t.return_date IS NOT NULL AND t.return_date != ''
+                THEN t.return_date <= t.due_date END,
+           COALESCE(t.fine_amount, 0)
+"""
+
+
+class AnalyticsManager:
+    def __init__(self, db_name: str = "library.db", batch_size: int = 5000):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.db = DatabaseManager(db_name)
+        self.db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS loan_facts (
+                transaction_id INTEGER PRIMARY KEY,
+                issue_day TEXT,
+                return_day TEXT,
+                category TEXT,
+                membership_type TEXT,
+                loan_days INTEGER,
+                on_time INTEGER,
+                fine REAL
+            )
+        """)
+        # Loans are counted on their issue day; returns, durations and
+        # fines on their return day
+        self.db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS loan_rollups (
+                day TEXT NOT NULL,
+                category TEXT NOT NULL,
+                membership_type TEXT NOT NULL,
+                loans INTEGER DEFAULT 0,
+                returns INTEGER DEFAULT 0,
+                returned_on_time INTEGER DEFAULT 0,
+                loan_days INTEGER DEFAULT 0,
+                fines REAL DEFAULT 0,
+                PRIMARY KEY (day, category, membership_type)
+            ) WITHOUT ROWID
+        """)
+        self.db.conn.commit()
+
+    # ========== MAINTENANCE ==========
+    def is_built(self) -> bool:
+        self.db.cursor.execute("SELECT 1 FROM change_consumers WHERE consumer = ?", (CONSUMER,))
+        return self.db.cursor.fetchone() is not None
+
+    def rebuild(self):
+        """Recompute every rollup from transactions_history in one transaction"""
+        cursor = self.db.cursor
+        if self.db.conn.in_transaction:
+            self.db.conn.commit()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            seq = self.db.get_last_change_seq()
+            cursor.execute("DELETE FROM loan_facts")
+            cursor.execute("DELETE FROM loan_rollups")
+            cursor.execute(f"""
+                INSERT INTO loan_facts
+                {_FACT_SELECT}
+                FROM transactions_history t
+                LEFT JOIN books b ON t.book_id = b.book_id
+                LEFT JOIN members m ON t.member_id = m.member_id
+            """)
+            cursor.execute("""
+                INSERT INTO loan_rollups
+                SELECT day, category, membership_type, SUM(loans), SUM(returns),
+                       SUM(on_time), SUM(loan_days), SUM(fine)
+                FROM (
+                    SELECT issue_day AS day, category, membership_type,
+                           1 AS loans, 0 AS returns, 0 AS on_time, 0 AS loan_days, 0 AS fine
+                    FROM loan_facts WHERE issue_day IS NOT NULL
+                    UNION ALL
+                    SELECT return_day, category, membership_type, 0, 1, on_time, loan_days, fine
+                    FROM loan_facts WHERE return_day IS NOT NULL
+                )
+                GROUP BY day, category, membership_type
+            """)
+            self.db.ack_changes(CONSUMER, seq)  # commits
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+    def _apply(self, fact: tuple, sign: int):
+        """Add (sign=1) or remove (sign=-1) one loan's contribution"""
+        _, issue_day, return_day, category, membership_type, loan_days, on_time, fine = fact
+        upsert = """
+            INSERT INTO loan_rollups (day, category, membership_type, loans, returns,
+                                      returned_on_time, loan_days, fines)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(day, category, membership_type) DO UPDATE SET
+                loans = loans + excluded.loans,
+                returns = returns + excluded.returns,
+                returned_on_time = returned_on_time + excluded.returned_on_time,
+                loan_days = loan_days + excluded.loan_days,
+                fines = fines + excluded.fines
+        """
+        if issue_day:
+            self.db.cursor.execute(upsert, (issue_day, category, membership_type, sign, 0, 0, 0, 0))
+        if return_day:
+            self.db.cursor.execute(upsert, (return_day, category, membership_type, 0, sign,
+                                            sign * (on_time or 0), sign * (loan_days or 0),
+                                            sign * (fine or 0)))
+
+    def _update_loan(self, transaction_id: int) -> bool:
+        """Re-derive one loan's fact; returns whether its contribution changed"""
+        cursor = self.db.cursor
+        cursor.execute("SELECT * FROM loan_facts WHERE transaction_id = ?", (transaction_id,))
+        old = cursor.fetchone()
+        old = tuple(old) if old else None
+
+        new = None
+        # Archived loans leave the hot table but stay in the history view
+        for source in ('transactions', 'transactions_history'):
+            cursor.execute(f"""
+                {_FACT_SELECT}
+                FROM {source} t
+                LEFT JOIN books b ON t.book_id = b.book_id
+                LEFT JOIN members m ON t.member_id = m.member_id
+                WHERE t.transaction_id = ?
+            """, (transaction_id,))
+            row = cursor.fetchone()
+            if row:
+                new = tuple(row)
+                break
+        if old:
+            # Keep the dimensions the loan was first counted under
+            new = new and new[:3] + old[3:5] + new[5:]
+        if new == old:
+            return False
+
+        if old:
+            self._apply(old, -1)
+            cursor.execute("DELETE FROM loan_facts WHERE transaction_id = ?", (transaction_id,))
+        if new:
+            self._apply(new, 1)
+            cursor.execute("INSERT INTO loan_facts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", new)
+        return True
+
+    def refresh(self) -> int:
+        """Fold changes since the last refresh into the rollups; returns loans updated"""
+        if not self.is_built():
+            self.rebuild()
+            return 0
+        position = self.db.get_consumer_position(CONSUMER)
+        updated = 0
+        while True:
+            changes = self.db.changes_since(position, self.batch_size)
+            if not changes:
+                break
+            try:
+                for transaction_id in {c['row_id'] for c in changes if c['table_name'] == 'transactions'}:
+                    updated += self._update_loan(transaction_id)
+                position = changes[-1]['seq']
+                self.db.ack_changes(CONSUMER, position)  # commits with the rollup updates
+            except Exception:
+                self.db.conn.rollback()
+                raise
+        return updated
+
+    # ========== REPORTS ==========
+    def _where(self, start: Optional[str], end: Optional[str], **filters) -> tuple:
+        conditions, params = [], []
+        if start:
+            conditions.append("day >= ?")
+            params.append(start)
+        if end:
+            conditions.append("day <= ?")
+            params.append(end)
+        for column, value in filters.items():
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+    @staticmethod
+    def _summarize(row) -> Dict:
+        loans, returns, on_time, loan_days, fines = (value or 0 for value in row)
+        return {
+            'loans': loans,
+            'returns': returns,
+            'on_time_rate': round(on_time / returns, 3) if returns else None,
+            'avg_loan_days': round(loan_days / returns, 1) if returns else None,
+            'fines': round(fines, 2),
+        }
+
+    def summary(self, start: str = None, end: str = None, category: str = None,
+                membership_type: str = None) -> Dict:
+        """Loans, returns, on-time rate, average loan length and fines for a period"""
+        where, params = self._where(start, end, category=category, membership_type=membership_type)
+        self.db.cursor.execute(f"""
+            SELECT SUM(loans), SUM(returns), SUM(returned_on_time), SUM(loan_days), SUM(fines)
+            FROM loan_rollups {where}
+        """, params)
+        return self._summarize(self.db.cursor.fetchone())
+
+    def breakdown(self, dimension: str, start: str = None, end: str = None) -> List[Dict]:
+        """Summary per category or per membership type, busiest first"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        where, params = self._where(start, end)
+        self.db.cursor.execute(f"""
+            SELECT {dimension}, SUM(loans), SUM(returns), SUM(returned_on_time), SUM(loan_days), SUM(fines)
+            FROM loan_rollups {where}
+            GROUP BY {dimension}
+            ORDER BY SUM(loans) DESC
+        """, params)
+        return [dict(self._summarize(row[1:]), **{dimension: row[0] or '(none)'})
+                for row in self.db.cursor.fetchall()]
+
+    def loans_by_day(self, start: str = None, end: str = None, category: str = None,
+                     membership_type: str = None) -> List[tuple]:
+        """(day, loans) pairs in date order"""
+        where, params = self._where(start, end, category=category, membership_type=membership_type)
+        self.db.cursor.execute(f"""
+            SELECT day, SUM(loans) FROM loan_rollups {where}
+            GROUP BY day HAVING SUM(loans) > 0 ORDER BY day
+        """, params)
+        return [tuple(row) for row in self.db.cursor.fetchall()]
+
+    def fines_by_month(self, start: str = None, end: str = None) -> List[tuple]:
+        """(YYYY-MM, fine revenue) pairs in date order"""
+        where, params = self._where(start, end)
+        self.db.cursor.execute(f"""
+            SELECT substr(day, 1, 7) AS month, ROUND(SUM(fines), 2) FROM loan_rollups {where}
+            GROUP BY month ORDER BY month
+        """, params)
+        return [tuple(row) for row in self.db.cursor.fetchall()]
+
+    def close(self):
+        self.db.close()
+
+
+def period_start(days: Optional[int]) -> Optional[str]:
+    """ISO date `days` ago, or None for all time"""
+    return (datetime.now().date() - timedelta(days=days)).isoformat() if days else None
+
+
+def branch_summaries(branches: Dict[str, str], start: str = None, end: str = None) -> Dict[str, Dict]:
+    """Refresh and summarize each branch database's rollups"""
+    summaries = {}
+    for name, db_name in branches.items():
+        manager = AnalyticsManager(db_name)
+        try:
+            manager.refresh()
+            summaries[name] = manager.summary(start, end)
+        finally:
+            manager.close()
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Circulation analytics from precomputed rollups")
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--days", type=int, default=90, help="report period (0 = all time)")
+    parser.add_argument("--rebuild", action="store_true", help="recompute rollups from scratch")
+    args = parser.parse_args()
+
+    manager = AnalyticsManager(args.db)
+    if args.rebuild:
+        manager.rebuild()
+    else:
+        print(f"Updated {manager.refresh()} loans")
+    start = period_start(args.days)
+    print(f"Summary: {manager.summary(start)}")
+    for dimension in DIMENSIONS:
+        print(f"By {dimension.replace('_', ' ')}:")
+        for row in manager.breakdown(dimension, start):
+            print(f"  {row[dimension]}: {row['loans']} loans, {row['fines']} fines, "
+                  f"on time {row['on_time_rate']}")
+    print("Fines by month:", manager.fines_by_month(start))
+    manager.close()
+
+
+if __name__ == "__main__":
+    main()
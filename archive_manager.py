@@ -0,0 +1,160 @@
+"""
+Archive Manager Module
+Moves returned loans older than a horizon out of the hot transactions table
+into yearly archive tables, in small batches
+
+History queries read the transactions_history view, which unions the hot
+table with every archive table.
+
+Usage: python archive_manager.py --horizon-days 730 --batch-size 500
+"""
+import argparse
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from db_manager import DatabaseManager
+
+
+class ArchiveManager:
+    def __init__(self, db_name: str = "library.db", horizon_days: int = 730,
+                 batch_size: int = 500, pause: float = 0.05):
+        self.db_name = db_name
+        self.horizon_days = horizon_days
+        self.batch_size = batch_size
+        # Pause between batches so desk writers can get the lock
+        self.pause = pause
+        self.db = DatabaseManager(db_name)
+        self.db.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_transactions_status_return
+            ON transactions(status, return_date)
+        """)
+        self.db.conn.commit()
+
+    def _columns(self) -> List[str]:
+        self.db.cursor.execute("PRAGMA table_info(transactions)")
+        return [row[1] for row in self.db.cursor.fetchall()]
+
+    def archive_tables(self) -> List[str]:
+        """Names of the existing yearly archive tables"""
+        self.db.cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name LIKE 'transactions_archive_%'
+            ORDER BY name
+        """)
+        return [row[0] for row in self.db.cursor.fetchall()]
+
+    def _ensure_archive_table(self, year: str) -> str:
+        """Create the archive table for a year, matching the hot table's columns"""
+        table = f"transactions_archive_{int(year)}"
+        self.db.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} AS
+            SELECT * FROM transactions WHERE 0
+        """)
+        self.db.cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in self.db.cursor.fetchall()}
+        for column in self._columns():
+            if column not in existing:
+                self.db.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+        self.db.cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_id ON {table}(transaction_id)")
+        self.db.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_member ON {table}(member_id)")
+        return table
+
+    def cutoff_date(self) -> str:
+        return (datetime.now().date() - timedelta(days=self.horizon_days)).isoformat()
+
+    def pending_count(self) -> int:
+        """Number of returned loans older than the horizon still in the hot table"""
+        self.db.cursor.execute("""
+            SELECT COUNT(*) FROM transactions
+            WHERE status = 'Returned' AND return_date < ?
+        """, (self.cutoff_date(),))
+        return self.db.cursor.fetchone()[0]
+
+    def archive_batch(self) -> int:
+        """Move one batch of old returned loans; returns the number of rows moved"""
+        cutoff = self.cutoff_date()
+        columns = ', '.join(self._columns())
+        self.db.cursor.execute("""
+            SELECT transaction_id, substr(COALESCE(issue_date, return_date), 1, 4) AS year
+            FROM transactions
+            WHERE status = 'Returned' AND return_date < ?
+            ORDER BY transaction_id
+            LIMIT ?
+        """, (cutoff, self.batch_size))
+        rows = self.db.cursor.fetchall()
+        if not rows:
+            return 0
+
+        by_year: Dict[str, List[int]] = {}
+        for transaction_id, year in rows:
+            by_year.setdefault(year, []).append(transaction_id)
+
+        created = False
+        try:
+            for year, ids in by_year.items():
+                before = set(self.archive_tables())
+                table = self._ensure_archive_table(year)
+                created = created or table not in before
+                placeholders = ', '.join('?' * len(ids))
+                self.db.cursor.execute(f"""
+                    INSERT OR REPLACE INTO {table} ({columns})
+                    SELECT {columns} FROM transactions WHERE transaction_id IN ({placeholders})
+                """, ids)
+                self.db.cursor.execute(f"DELETE FROM transactions WHERE transaction_id IN ({placeholders})", ids)
+            if created:
+                self.db.refresh_history_view()
+            self.db.conn.commit()
+        except sqlite3.Error:
+            self.db.conn.rollback()
+            raise
+        return len(rows)
+
+    def run(self, max_batches: int = None, progress: Callable = None) -> int:
+        """Archive in batches until nothing is left (or max_batches is reached)"""
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            moved = self.archive_batch()
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            if progress:
+                progress(total)
+            time.sleep(self.pause)
+        return total
+
+    def get_statistics(self) -> Dict:
+        """Row counts of the hot table and each archive table"""
+        stats = {}
+        for table in ['transactions'] + self.archive_tables():
+            self.db.cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            stats[table] = self.db.cursor.fetchone()[0]
+        return stats
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old returned loans")
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--horizon-days", type=int, default=730, help="keep loans returned within this many days")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--max-batches", type=int)
+    args = parser.parse_args()
+
+    manager = ArchiveManager(args.db, args.horizon_days, args.batch_size, args.pause)
+    print(f"{manager.pending_count()} loans returned before {manager.cutoff_date()} to archive")
+    moved = manager.run(args.max_batches, progress=lambda n: print(f"\rArchived {n} loans", end="", flush=True))
+    print(f"\nArchived {moved} loans")
+    for table, count in manager.get_statistics().items():
+        print(f"  {table}: {count}")
+    manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Async Book API Module
+asyncio variant of BookAPI for bulk enrichment jobs, with per-provider
+concurrency limits, token-bucket rate limiting and keep-alive connections
+"""
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import aiohttp
+
+from book_api import BookAPI
+from isbn_utils import clean_isbn, isbn_key
+from provider_health import ProviderHealth, ProviderUnavailable, order_providers
+
+
+class TokenBucket:
+    """Token bucket that also honours server-requested pauses (429 Retry-After)"""
+
+    def __init__(self, rate: float, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Parse a Retry-After header given either as seconds or an HTTP date"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class AsyncBookAPI:
+    # Default per-provider limits: (concurrent requests, requests per second)
+    PROVIDER_LIMITS = {
+        'google': (10, 10.0),
+        'open_library': (5, 5.0),
+    }
+
+    def __init__(self, google_books_base: str = "https://www.googleapis.com/books/v1/volumes",
+                 open_library_base: str = "https://openlibrary.org",
+                 provider_limits: Dict = None, timeout: float = 10, max_retries: int = 3,
+                 lookup_budget: float = 12):
+        self.google_books_base = google_books_base
+        self.open_library_base = open_library_base
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.lookup_budget = lookup_budget
+        self.limits = dict(self.PROVIDER_LIMITS, **(provider_limits or {}))
+        self.semaphores = {name: asyncio.Semaphore(conc) for name, (conc, _) in self.limits.items()}
+        self.buckets = {name: TokenBucket(rate) for name, (_, rate) in self.limits.items()}
+        self.health = {name: ProviderHealth(name) for name in self.limits}
+        self.session = None
+        self._isbn_cache = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        """Create the shared keep-alive session"""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=sum(conc for conc, _ in self.limits.values()),
+                                             keepalive_timeout=30)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': 'Library Management System/1.0'}
+            )
+
+    async def close(self):
+        """Close the session and its pooled connections"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _get_json(self, provider: str, url: str, timeout: float = None) -> Optional[Dict]:
+        """GET a JSON document under the provider's concurrency and rate limits"""
+        await self.open()
+        bucket = self.buckets[provider]
+        health = self.health[provider]
+        async with self.semaphores[provider]:
+            for attempt in range(self.max_retries + 1):
+                if not health.breaker.allow_request():
+                    raise ProviderUnavailable(f"{provider} circuit is open")
+                await bucket.acquire()
+                start = time.monotonic()
+                try:
+                    async with self.session.get(url, timeout=aiohttp.ClientTimeout(
+                            total=timeout or self.timeout)) as response:
+                        if response.status == 429 or response.status == 503:
+                            # Throttling is not a health failure, just back off
+                            health.record(time.monotonic() - start, True)
+                            delay = parse_retry_after(response.headers.get('Retry-After'), 2.0 ** attempt)
+                            bucket.pause(delay)
+                            continue
+                        if response.status == 404:
+                            health.record(time.monotonic() - start, True)
+                            return None
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+                except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                    health.record(time.monotonic() - start, False, hard=True)
+                    raise
+                except Exception:
+                    health.record(time.monotonic() - start, False)
+                    raise
+                health.record(time.monotonic() - start, True)
+                return data
+        raise aiohttp.ClientError(f"{provider} still throttled after {self.max_retries} retries")
+
+    async def search_google_books(self, query: str, max_results: int = 10) -> List[Dict]:
+        """Search Google Books API"""
+        try:
+            url = f"{self.google_books_base}?q={quote(query)}&maxResults={max_results}"
+            data = await self._get_json('google', url) or {}
+            books = []
+            for item in data.get('items', []):
+                book_info = BookAPI._parse_google_book(item)
+                if book_info:
+                    books.append(book_info)
+            return books
+        except Exception as e:
+            print(f"Error searching Google Books: {e}")
+            return []
+
+    async def get_book_by_isbn(self, isbn: str, timeout: float = None) -> Optional[Dict]:
+        """Get book information by ISBN from Google Books"""
+        try:
+            url = f"{self.google_books_base}?q=isbn:{clean_isbn(isbn)}"
+            data = await self._get_json('google', url, timeout) or {}
+            if data.get('totalItems', 0) > 0:
+                return BookAPI._parse_google_book(data['items'][0])
+            return None
+        except Exception as e:
+            print(f"Error fetching book by ISBN from Google Books: {e}")
+            return None
+
+    async def search_open_library(self, query: str, max_results: int = 10) -> List[Dict]:
+        """Search Open Library API"""
+        try:
+            url = f"{self.open_library_base}/search.json?q={quote(query)}&limit={max_results}"
+            data = await self._get_json('open_library', url) or {}
+            books = []
+            for doc in data.get('docs', []):
+                book_info = BookAPI._parse_open_library_book(doc)
+                if book_info:
+                    books.append(book_info)
+            return books
+        except Exception as e:
+            print(f"Error searching Open Library: {e}")
+            return []
+
+    async def get_book_by_isbn_open_library(self, isbn: str, timeout: float = None) -> Optional[Dict]:
+        """Get book information by ISBN from Open Library"""
+        try:
+            url = f"{self.open_library_base}/isbn/{clean_isbn(isbn)}.json"
+            data = await self._get_json('open_library', url, timeout)
+            return BookAPI._parse_open_library_book(data) if data else None
+        except Exception as e:
+            print(f"Error fetching book by ISBN from Open Library: {e}")
+            return None
+
+    async def get_author_info(self, author_name: str) -> Optional[Dict]:
+        """Get author information from Open Library"""
+        try:
+            url = f"{self.open_library_base}/search/authors.json?q={quote(author_name)}&limit=1"
+            data = await self._get_json('open_library', url) or {}
+            if data.get('numFound', 0) > 0:
+                author_doc = data['docs'][0]
+                return {
+                    'name': author_doc.get('name', ''),
+                    'ol_key': author_doc.get('key', ''),
+                    'birth_date': author_doc.get('birth_date', ''),
+                    'death_date': author_doc.get('death_date', ''),
+                    'top_work': author_doc.get('top_work', ''),
+                    'work_count': author_doc.get('work_count', 0)
+                }
+            return None
+        except Exception as e:
+            print(f"Error fetching author info: {e}")
+            return None
+
+    async def fetch_book_data(self, isbn: str) -> Optional[Dict]:
+        """Try to fetch book data from multiple sources"""
+        key = isbn_key(isbn)
+        if key in self._isbn_cache:
+            return self._isbn_cache[key]
+
+        lookups = {
+            'google': self.get_book_by_isbn,
+            'open_library': self.get_book_by_isbn_open_library,
+        }
+        deadline = time.monotonic() + self.lookup_budget
+        book_data = None
+        for provider in order_providers(self.health, list(lookups), self.timeout):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            book_data = await lookups[provider](isbn, timeout=min(self.timeout, remaining))
+            if book_data and book_data.get('title'):
+                break
+
+        if book_data:
+            self._isbn_cache[key] = book_data
+        return book_data
+
+    def get_provider_stats(self) -> List[Dict]:
+        """Circuit state, p95 latency and success rate per provider"""
+        return [health.stats() for health in self.health.values()]
+
+    async def fetch_many(self, isbns: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """Look up many ISBNs concurrently; the provider limits bound what is in flight"""
+        isbns = list(isbns)
+        results = await asyncio.gather(*(self.fetch_book_data(isbn) for isbn in isbns))
+        return dict(zip(isbns, results))
+
+
+def fetch_books(isbns: Iterable[str], **kwargs) -> Dict[str, Optional[Dict]]:
+    """Blocking helper for callers outside an event loop (e.g. a worker thread)"""
+    async def run():
+        async with AsyncBookAPI(**kwargs) as api:
+            return await api.fetch_many(isbns)
+    return asyncio.run(run())
@@ -0,0 +1,75 @@
+"""
+Author Utilities Module
+Splits the comma-joined books.author field into names and builds the
+normalized keys used to look authors up
+"""
+import re
+import unicodedata
+from typing import List
+
+# Placeholders the book API parsers store when a record has no author
+PLACEHOLDER_AUTHORS = {'unknown', 'unknown author', 'anonymous'}
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def author_key(name: str) -> str:
+    """Case-, accent- and punctuation-insensitive key, e.g.
+    'J.R.R. Tolkien' and 'j r r  tolkien' -> 'j r r tolkien'"""
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', stripped).strip()
+
+
+def split_authors(author_field: str) -> List[str]:
+    """Individual author names from a books.author value ('A, B' as written
+    by the book API parsers), without placeholders or duplicates"""
+    names, seen = [], set()
+    for name in (author_field or '').split(','):
+        name = ' '.join(name.split())
+        key = author_key(name)
+        if not key or key in PLACEHOLDER_AUTHORS or key in seen:
+            continue
+        seen.add(key)
+        names.append(name)
+    return names
+
+
+def name_tokens(key: str) -> List[str]:
+    """Distinct words of an author key, for word-prefix search"""
+    return list(dict.fromkeys(key.split()))
+
+
+def ensure_author(cursor, name: str, known: dict = None) -> int:
+    """author_id for a name, inserting the author (and its search tokens) if new.
+    `known` optionally memoizes key -> id across calls, e.g. during a backfill."""
+    key = author_key(name)
+    if known is not None and key in known:
+        return known[key]
+    cursor.execute("SELECT author_id FROM authors WHERE name_key = ?", (key,))
+    row = cursor.fetchone()
+    if row:
+        author_id = row[0]
+    else:
+        cursor.execute("INSERT INTO authors (name, name_key) VALUES (?, ?)", (name, key))
+        author_id = cursor.lastrowid
+        cursor.executemany("INSERT OR IGNORE INTO author_tokens (token, author_id) VALUES (?, ?)",
+                           [(token, author_id) for token in name_tokens(key)])
+    if known is not None:
+        known[key] = author_id
+    return author_id
+
+
+def link_book_authors(cursor, book_id: int, author_field: str, known: dict = None) -> List[int]:
+    """Replace a book's book_authors rows with the authors named in
+    `author_field`; the caller commits. Returns the author ids in order."""
+    cursor.execute("DELETE FROM book_authors WHERE book_id = ?", (book_id,))
+    author_ids = []
+    for position, name in enumerate(split_authors(author_field)):
+        author_id = ensure_author(cursor, name, known)
+        cursor.execute("INSERT OR IGNORE INTO book_authors (book_id, author_id, position) VALUES (?, ?, ?)",
+                       (book_id, author_id, position))
+        author_ids.append(author_id)
+    return author_ids
@@ -0,0 +1,231 @@
+"""
+Backup Manager Module
+Online backups of the library database using the SQLite backup API, with
+throttled copying, rotating verified snapshots, scheduling and restore
+
+Usage: python backup_manager.py backup | list | verify <file> | restore <file> | schedule --interval 3600
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from urllib.request import pathname2url
+
+
+class BackupManager:
+    def __init__(self, db_name: str = "library.db", backup_dir: str = "backups", keep: int = 7,
+                 pages: int = 256, step_pause: float = 0.01, max_restarts: int = 10,
+                 max_backoff: float = 5.0):
+        self.db_name = db_name
+        self.backup_dir = backup_dir
+        self.keep = keep
+        # Pages copied per step; the source is only read-locked during a step
+        self.pages = pages
+        # Sleep after each step so desk writers (issue_book etc.) get the lock
+        self.step_pause = step_pause
+        # Outside WAL mode, writes from other connections restart the copy.
+        # Each restart doubles the pause before copying again (up to
+        # max_backoff) so a burst of desk writes can pass, and after
+        # max_restarts the backup gives up rather than lock the database
+        # for one long step
+        self.max_restarts = max_restarts
+        self.max_backoff = max_backoff
+        os.makedirs(backup_dir, exist_ok=True)
+
+    def _snapshot_name(self, db_name: str = None) -> str:
+        base = os.path.splitext(os.path.basename(db_name or self.db_name))[0]
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        return os.path.join(self.backup_dir, f"{base}-{stamp}.db")
+
+    def _copy(self, source_path: str, target_path: str, progress: Callable = None,
+              source_readonly: bool = False) -> Dict:
+        """Copy one database into another with the online backup API.
+
+        With source_readonly the source is opened read-only, so a missing
+        source raises instead of being created as an empty database.
+        A WAL-mode source is copied from one read transaction, which pins
+        its snapshot without blocking writers, so the copy never restarts.
+        """
+        stats = {'steps': 0, 'restarts': 0, 'read_snapshot': False}
+        last_remaining = [None]
+
+        def on_step(status, remaining, total):
+            stats['steps'] += 1
+            pause = self.step_pause
+            if last_remaining[0] is not None and remaining > last_remaining[0]:
+                stats['restarts'] += 1
+                if stats['restarts'] > self.max_restarts:
+                    raise RuntimeError(f"Backup of {source_path} restarted {self.max_restarts} times "
+                                       f"by concurrent writes; try again when the desks are quieter")
+                pause = min(max(self.step_pause, 0.01) * 2 ** stats['restarts'], self.max_backoff)
+            last_remaining[0] = remaining
+            if progress:
+                progress(total - remaining, total)
+            if pause:
+                time.sleep(pause)
+
+        if source_readonly:
+            source = sqlite3.connect(f"file:{pathname2url(os.path.abspath(source_path))}?mode=ro", uri=True)
+        else:
+            source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                stats['read_snapshot'] = True
+            source.backup(target, pages=self.pages, progress=on_step)
+        finally:
+            target.close()
+            source.close()
+        return stats
+
+    def verify(self, path: str, full: bool = False) -> bool:
+        """Run quick_check (or the slower integrity_check) on a snapshot"""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot not found: {path}")
+        conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+        try:
+            pragma = "integrity_check" if full else "quick_check"
+            rows = conn.execute(f"PRAGMA {pragma}").fetchall()
+            return len(rows) == 1 and rows[0][0] == 'ok'
+        finally:
+            conn.close()
+
+    def backup(self, progress: Callable = None, full_check: bool = False, rotate: bool = True,
+               source: str = None) -> Dict:
+        """Take a verified snapshot of `source` (by default the managed
+        database), then (unless rotate is false) rotate old ones"""
+        source = source or self.db_name
+        path = self._snapshot_name(source)
+        partial = path + ".partial"
+        start = time.perf_counter()
+        try:
+            stats = self._copy(source, partial, progress)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        elapsed = time.perf_counter() - start
+        # A copy of a WAL database is itself in WAL mode; make the snapshot
+        # one self-contained file
+        conn = sqlite3.connect(partial)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+        if not self.verify(partial, full_check):
+            os.remove(partial)
+            raise RuntimeError(f"Backup of {source} failed integrity verification")
+        os.replace(partial, path)
+
+        removed = self.rotate() if rotate else []
+        return dict(stats, path=path, seconds=round(elapsed, 3), size=os.path.getsize(path), rotated=removed)
+
+    def list_snapshots(self) -> List[str]:
+        """Snapshots of this database, newest first"""
+        base = os.path.splitext(os.path.basename(self.db_name))[0]
+        names = [n for n in os.listdir(self.backup_dir) if n.startswith(base + "-") and n.endswith(".db")]
+        return [os.path.join(self.backup_dir, n) for n in sorted(names, reverse=True)]
+
+    def rotate(self) -> List[str]:
+        """Delete all but the newest `keep` snapshots"""
+        removed = []
+        for path in self.list_snapshots()[self.keep:]:
+            os.remove(path)
+            removed.append(path)
+        return removed
+
+    def restore(self, snapshot: str, target: str = None) -> Optional[str]:
+        """Verify a snapshot and copy it over the live database.
+
+        The file being overwritten is snapshotted first; its path is returned so
+        the restore itself can be undone.
+        """
+        target = target or self.db_name
+        if not self.verify(snapshot, full=True):
+            raise ValueError(f"Snapshot {snapshot} failed integrity verification")
+        safety = None
+        if os.path.exists(target):
+            # No rotation here: it could delete the snapshot being restored
+            safety = self.backup(rotate=False, source=target)['path']
+        # Copying through the backup API keeps open connections valid
+        try:
+            self._copy(snapshot, target, source_readonly=True)
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Cannot read snapshot {snapshot}: {e}") from e
+        return safety
+
+
+class BackupScheduler:
+    """Takes a snapshot every `interval` seconds on a background thread"""
+
+    def __init__(self, manager: BackupManager, interval: float = 3600, on_result: Callable = None):
+        self.manager = manager
+        self.interval = interval
+        self.on_result = on_result
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = self.manager.backup()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                print(f"Error running scheduled backup: {e}")
+            if self.on_result:
+                self.on_result(self.last_result, self.last_error)
+
+    def start(self) -> "BackupScheduler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore the library database")
+    parser.add_argument("command", choices=["backup", "list", "verify", "restore", "schedule"])
+    parser.add_argument("snapshot", nargs="?", help="snapshot file for verify/restore")
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--dir", default="backups")
+    parser.add_argument("--keep", type=int, default=7)
+    parser.add_argument("--pages", type=int, default=256, help="pages copied per step")
+    parser.add_argument("--pause", type=float, default=0.01, help="seconds to sleep between steps")
+    parser.add_argument("--interval", type=float, default=3600, help="seconds between scheduled backups")
+    parser.add_argument("--full-check", action="store_true", help="use integrity_check instead of quick_check")
+    args = parser.parse_args()
+
+    manager = BackupManager(args.db, args.dir, args.keep, args.pages, args.pause)
+    if args.command == "backup":
+        result = manager.backup(lambda done, total: print(f"\r{done}/{total} pages", end="", flush=True),
+                                args.full_check)
+        print(f"\nSnapshot {result['path']} ({result['size']} bytes) in {result['seconds']}s, "
+              f"{result['restarts']} restarts")
+    elif args.command == "list":
+        for path in manager.list_snapshots():
+            print(path)
+    elif args.command == "verify":
+        print("ok" if manager.verify(args.snapshot, args.full_check) else "CORRUPT")
+    elif args.command == "restore":
+        safety = manager.restore(args.snapshot)
+        print(f"Restored {args.snapshot} to {args.db}" + (f" (previous state saved to {safety})" if safety else ""))
+    elif args.command == "schedule":
+        scheduler = BackupScheduler(manager, args.interval,
+                                    lambda result, error: print(result or error)).start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Book API Benchmark
+Compares blocking BookAPI lookups with AsyncBookAPI against the local fake
+provider server, which adds latency and throttles with 429 + Retry-After
+
+Usage: python benchmarks/bench_async_api.py [--lookups 300] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from async_book_api import AsyncBookAPI  # noqa: E402
+from book_api import BookAPI  # noqa: E402
+from fake_provider_server import FakeProviderConfig, FakeProviderServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blocking vs asyncio book lookups")
+    parser.add_argument("--lookups", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake provider latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of injected 500s")
+    parser.add_argument("--rate", type=float, default=100.0, help="client requests per second")
+    parser.add_argument("--server-limit", type=int, default=120, help="provider requests per second before 429")
+    args = parser.parse_args()
+
+    config = FakeProviderConfig(latency=args.latency, error_rate=args.error_rate,
+                                rate_limit=args.server_limit, seed=1)
+    isbns = [f"978{i:010d}" for i in range(args.lookups)]
+
+    with FakeProviderServer(config=config) as server:
+        urls = {'google_books_base': server.google_books_base, 'open_library_base': server.open_library_base}
+
+        sync_count = min(args.lookups, 50)
+        api = BookAPI(**urls)
+        start = time.perf_counter()
+        for isbn in isbns[:sync_count]:
+            api.fetch_book_data(isbn)
+        sync_rate = sync_count / (time.perf_counter() - start)
+
+        # Second pass is served from the ISBN cache
+        start = time.perf_counter()
+        for isbn in isbns[:sync_count]:
+            api.fetch_book_data(isbn)
+        cached_rate = sync_count / (time.perf_counter() - start)
+
+        throttled_before = server.stats['throttled']
+
+        async def run_async():
+            async with AsyncBookAPI(provider_limits={'google': (50, args.rate), 'open_library': (20, args.rate)},
+                                    **urls) as async_api:
+                return await async_api.fetch_many(isbns)
+
+        start = time.perf_counter()
+        results = asyncio.run(run_async())
+        async_elapsed = time.perf_counter() - start
+
+    found = sum(1 for r in results.values() if r)
+    print(f"blocking BookAPI : {sync_rate:10.1f} lookups/s ({sync_count} lookups)")
+    print(f"  cached         : {cached_rate:10.1f} lookups/s")
+    print(f"AsyncBookAPI     : {args.lookups / async_elapsed:10.1f} lookups/s "
+          f"({found}/{args.lookups} found, {server.stats['throttled'] - throttled_before} throttled responses)")
+
+
+if __name__ == "__main__":
+    main()
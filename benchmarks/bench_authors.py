@@ -0,0 +1,78 @@
+"""
+Author Search Benchmark
+Author search as the old LIKE '%term%' scan over books.author versus the
+author_tokens / book_authors index lookup, plus the cost of an author page
+(an author's books) both ways, on a catalogue with realistic author names
+and co-authored books
+
+Usage: python benchmarks/bench_authors.py [--books 100000] [--queries 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_manager import DatabaseManager  # noqa: E402
+
+FIRST_NAMES = ["Ama", "Bongani", "Chinua", "Doris", "Elena", "Farah", "Gabriel", "Hana", "Ivan", "Jorge",
+               "Karin", "Lindiwe", "Mariam", "Nadine", "Olu", "Pieter", "Qiu", "Rosa", "Sipho", "Toni",
+               "Ursula", "Vikram", "Wole", "Xolani", "Yaa", "Zadie"]
+LAST_NAMES = ["Achebe", "Brink", "Coetzee", "Dangarembga", "Emecheta", "Fugard", "Gordimer", "Head",
+              "Ishiguro", "Jansen", "Kundera", "Lessing", "Mda", "Ngugi", "Okri", "Paton", "Quammen",
+              "Roy", "Smith", "Tolkien", "Ulitskaya", "Vladislavic", "Wicomb", "Xaba", "Yourcenar", "Zola"]
+
+
+def catalogue(rng: random.Random, count: int, authors: list):
+    for i in range(count):
+        names = rng.sample(authors, 2 if rng.random() < 0.15 else 1)
+        yield (f"978{i:010d}", f"Book {i}", ', '.join(names), 1, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark author search")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--authors", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    authors = sorted({f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}-{rng.randrange(10 ** 4)}"
+                      for _ in range(args.authors)})
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "authors.db"))
+        start = time.perf_counter()
+        db.bulk_insert('books', ('isbn', 'title', 'author', 'total_copies', 'available_copies'),
+                       list(catalogue(rng, args.books, authors)))
+        print(f"loaded {args.books} books with author links in {time.perf_counter() - start:.1f}s")
+
+        queries = [rng.choice(authors) for _ in range(args.queries)]
+        prefixes = [name.split()[1][:5] for name in queries]
+
+        def timed(label, fn, terms):
+            start = time.perf_counter()
+            found = sum(len(fn(term)) for term in terms)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>30}  {elapsed / len(terms) * 1e3:8.3f} ms/query  {found / len(terms):7.1f} books")
+
+        def like_scan(term):
+            return db._fetch_all("SELECT * FROM books WHERE author LIKE ?", (f"%{term}%",))
+
+        def author_page_index(name):
+            author = db.find_author(name)
+            return db.get_author_books(author['author_id']) if author else []
+
+        timed("full name, LIKE scan", like_scan, queries)
+        timed("full name, token lookup", lambda term: db.search_books(term, "author"), queries)
+        timed("surname prefix, LIKE scan", like_scan, prefixes)
+        timed("surname prefix, token lookup", lambda term: db.search_books(term, "author"), prefixes)
+        timed("author page, LIKE scan", like_scan, queries)
+        timed("author page, index", author_page_index, queries)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
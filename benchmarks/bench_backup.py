@@ -0,0 +1,83 @@
+"""
+Backup Benchmark
+Measures online backup time and its effect on issue_book latency at a desk
+
+Usage: python benchmarks/bench_backup.py [--transactions 1000000] [--pages 256 1024 -1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backup_manager import BackupManager  # noqa: E402
+from db_manager import DatabaseManager  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+
+def desk_latencies(db_name: str, stop: threading.Event, out: list):
+    """Issue and return books continuously, recording issue_book latency"""
+    db = DatabaseManager(db_name)
+    db.conn.execute("PRAGMA busy_timeout = 5000")
+    book_id = 1
+    while not stop.is_set():
+        start = time.perf_counter()
+        txn_id = db.issue_book(1, book_id)
+        out.append(time.perf_counter() - start)
+        db.return_book(txn_id)
+        book_id = book_id % 100 + 1
+        time.sleep(0.005)
+    db.close()
+
+
+def summarize(latencies: list) -> str:
+    if not latencies:
+        return "no samples"
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95)]
+    return (f"p50 {statistics.median(ordered) * 1000:6.2f}ms  p95 {p95 * 1000:6.2f}ms  "
+            f"max {ordered[-1] * 1000:7.2f}ms  ({len(ordered)} issues)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark online backups")
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[256, 4096, -1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = seed_database(os.path.join(tmp, "bench.db"), books=args.transactions // 10,
+                                members=args.transactions // 50, transactions=args.transactions,
+                                reviews=args.transactions // 10)
+        print(f"database size: {os.path.getsize(db_name) / 1e6:.1f} MB")
+
+        baseline = []
+        stop = threading.Event()
+        desk = threading.Thread(target=desk_latencies, args=(db_name, stop, baseline))
+        desk.start()
+        time.sleep(2)
+        stop.set()
+        desk.join()
+        print(f"{'no backup':>12}: {summarize(baseline)}")
+
+        for pages in args.pages:
+            manager = BackupManager(db_name, os.path.join(tmp, "backups"), keep=1, pages=pages,
+                                    step_pause=0.01 if pages > 0 else 0)
+            latencies = []
+            stop = threading.Event()
+            desk = threading.Thread(target=desk_latencies, args=(db_name, stop, latencies))
+            desk.start()
+            result = manager.backup()
+            stop.set()
+            desk.join()
+            mode = "read snapshot" if result['read_snapshot'] else f"{result['restarts']} restarts"
+            print(f"{'pages=' + str(pages):>12}: backup {result['seconds']:6.2f}s ({mode}); "
+                  f"desk {summarize(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
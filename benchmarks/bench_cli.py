@@ -0,0 +1,82 @@
+"""
+Batch CLI Benchmark
+Loading books one INSERT + commit at a time (as the old interactive menu
+did) versus library_cli's batched single writer, in-process and with
+worker processes for parsing and validation
+
+Usage: python benchmarks/bench_cli.py [--books 100000] [--workers 2 4]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import library_cli  # noqa: E402
+from db_manager import DatabaseManager  # noqa: E402
+
+
+def write_books(filename: str, count: int):
+    rng = random.Random(3)
+    with open(filename, 'w', encoding='utf-8') as out:
+        for i in range(count):
+            out.write(json.dumps({
+                'isbn': f"978{rng.randrange(10 ** 9, 10 ** 10)}", 'title': f"Title {i}",
+                'author': f"Author {i % 997}", 'publication_year': 1900 + i % 120,
+                'category': rng.choice(['Fiction', 'Science', 'History']), 'total_copies': rng.randint(1, 5),
+                'description': 'A book. ' * rng.randint(5, 40),
+            }) + '\n')
+
+
+def per_row_commits(db_name: str, filename: str, limit: int) -> int:
+    """One validated INSERT and commit per record"""
+    db = DatabaseManager(db_name)
+    columns = library_cli.load_columns('books')
+    sql = f"INSERT INTO books ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    count = 0
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            values = library_cli.validate_record('books', json.loads(line))
+            db.cursor.execute(sql, tuple(values[c] for c in columns))
+            db.conn.commit()
+            count += 1
+            if count >= limit:
+                break
+    db.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk loading")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--per-row-sample", type=int, default=2000,
+                        help="records loaded with per-row commits (extrapolated)")
+    args = parser.parse_args()
+    print(f"CPUs: {os.cpu_count()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "books.jsonl")
+        write_books(source, args.books)
+
+        start = time.perf_counter()
+        count = per_row_commits(os.path.join(tmp, "per-row.db"), source, args.per_row_sample)
+        rate = count / (time.perf_counter() - start)
+        print(f"{'per-row commit':>22}  {rate:9.0f} records/s  (sample of {count})")
+
+        for workers in [0] + args.workers:
+            db_name = os.path.join(tmp, f"cli-{workers}.db")
+            DatabaseManager(db_name).close()
+            start = time.perf_counter()
+            library_cli.main(["--db", db_name, "load", "books", source, "--workers", str(workers)])
+            elapsed = time.perf_counter() - start
+            label = f"cli, {workers} workers" if workers else "cli, in-process"
+            print(f"{label:>22}  {args.books / elapsed:9.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Copy Inventory Benchmark
+Time to explode total_copies counts into copy rows (the migration), the
+latency of scanner checkouts and returns by copy barcode, and the time the
+reconciliation job takes to check every book's counters against its copies
+
+Usage: python benchmarks/bench_copies.py [--books 100000] [--scans 2000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_manager import DatabaseManager  # noqa: E402
+from migrations import add_copies  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-copy inventory")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--transactions", type=int, default=50000)
+    parser.add_argument("--scans", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = seed_database(os.path.join(tmp, "copies.db"), books=args.books, members=args.members,
+                                transactions=args.transactions, reviews=0)
+
+        # Re-run the explode as the migration would on a counts-only database
+        conn = sqlite3.connect(db_name)
+        conn.execute("DROP TABLE copies")
+        conn.execute("UPDATE transactions SET copy_id = NULL")
+        conn.commit()
+        start = time.perf_counter()
+        add_copies(conn)
+        conn.commit()
+        elapsed = time.perf_counter() - start
+        copies = conn.execute("SELECT COUNT(*) FROM copies").fetchone()[0]
+        conn.close()
+        print(f"migration: {copies} copies for {args.books} books in {elapsed:.2f}s")
+
+        db = DatabaseManager(db_name)
+        rng = random.Random(3)
+        db.cursor.execute("SELECT barcode FROM copies WHERE status = 'Available'")
+        barcodes = rng.sample([row[0] for row in db.cursor.fetchall()], args.scans)
+        member_ids = [rng.randrange(1, args.members + 1) for _ in barcodes]
+
+        start = time.perf_counter()
+        for member_id, barcode in zip(member_ids, barcodes):
+            db.issue_book(member_id, barcode=barcode)
+        issue = (time.perf_counter() - start) / args.scans
+
+        start = time.perf_counter()
+        for barcode in barcodes:
+            db.return_book(db.get_loan_by_barcode(barcode)['transaction_id'])
+        scan_return = (time.perf_counter() - start) / args.scans
+        print(f"checkout by barcode: {issue * 1e3:.3f} ms, return by barcode: {scan_return * 1e3:.3f} ms")
+
+        start = time.perf_counter()
+        report = db.reconcile_copies()
+        print(f"reconciliation: {len(report['mismatched'])} mismatched books, "
+              f"{report['unlinked_loans']} unlinked loans in {time.perf_counter() - start:.2f}s")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Duplicate Detection Benchmark
+Candidate lookup latency (the check made before add_book) and recall of
+the near-duplicate index on a synthetic catalogue with planted variants
+(punctuation, articles, '&', typos, author name order), plus the time the
+clustering job takes over the whole catalogue
+
+Usage: python benchmarks/bench_duplicates.py [--books 200000] [--lookups 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_manager import DatabaseManager  # noqa: E402
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "shi", "ten", "vo", "ne", "bu", "dra", "el", "gon", "qua", "th", "or",
+             "zi", "pe", "mun", "ya", "sel"]
+
+
+def word(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def variant(rng: random.Random, title: str, author: str):
+    """The same book as a cataloguer might re-enter it"""
+    kind = rng.randrange(4)
+    if kind == 0:
+        title = f"The {title}" if not title.startswith("The ") else title[4:]
+    elif kind == 1:
+        title = title.replace(" and ", " & ") if " and " in title else title.upper()
+    elif kind == 2:
+        i = rng.randrange(len(title))
+        title = title[:i] + title[i + 1:]
+    else:
+        first, last = author.split(' ', 1)
+        author = f"{last}, {first[0]}."
+    return title, author
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate detection")
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--duplicates", type=float, default=0.01, help="fraction of planted variants")
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    vocabulary = [word(rng) for _ in range(5000)]
+    authors = [f"{word(rng).title()} {word(rng).title()}" for _ in range(args.books // 10 + 1)]
+    originals, rows, planted = [], [], []
+    for i in range(args.books):
+        words = rng.sample(vocabulary, rng.randint(1, 5))
+        if len(words) > 2 and rng.random() < 0.3:
+            words.insert(len(words) // 2, "and")
+        title, author = ' '.join(words).title(), rng.choice(authors)
+        if originals and rng.random() < args.duplicates:
+            original = rng.randrange(len(originals))
+            title, author = variant(rng, *originals[original])
+            planted.append((i + 1, original + 1))
+        originals.append((title, author))
+        rows.append((title, author, 1, 1))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "duplicates.db"))
+        start = time.perf_counter()
+        for offset in range(0, len(rows), 50000):
+            db.bulk_insert('books', ('title', 'author', 'total_copies', 'available_copies'),
+                           rows[offset:offset + 50000])
+        print(f"loaded and indexed {args.books} books in {time.perf_counter() - start:.1f}s")
+
+        probes = [rng.choice(planted) for _ in range(min(args.lookups, len(planted)))]
+        latencies, found = [], 0
+        for copy_id, original_id in probes:
+            title, author = rows[copy_id - 1][:2]
+            start = time.perf_counter()
+            matches = db.find_similar_books(title, author, exclude=copy_id)
+            latencies.append(time.perf_counter() - start)
+            found += any(book['book_id'] == original_id for book in matches)
+        latencies.sort()
+        print(f"lookup before add_book: median {latencies[len(latencies) // 2] * 1e3:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.2f} ms, "
+              f"recall {found / len(probes):.3f} on {len(probes)} planted variants")
+
+        start = time.perf_counter()
+        clusters = list(db.get_duplicate_clusters())
+        elapsed = time.perf_counter() - start
+        grouped = {book['book_id']: n for n, cluster in enumerate(clusters) for book in cluster}
+        recovered = sum(1 for copy_id, original_id in planted
+                        if copy_id in grouped and grouped[copy_id] == grouped.get(original_id))
+        print(f"clustering job: {len(clusters)} groups in {elapsed:.1f}s, "
+              f"{recovered}/{len(planted)} planted pairs grouped")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Federation Benchmark
+Scaling of federated queries with the number of branches, with the
+branches queried one after another versus in parallel
+
+Usage: python benchmarks/bench_federation.py [--branches 1 2 4 8] [--books 20000] [--transactions 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from federation import BranchFederation  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+QUERIES = {
+    'search_books': lambda f: f.search_books("Title 1", "all"),
+    'get_statistics': lambda f: f.get_statistics(),
+    'get_overdue_books': lambda f: f.get_overdue_books(),
+    'get_popular_books': lambda f: f.get_popular_books(10),
+}
+
+
+def best_time(query, federation: BranchFederation, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query(federation)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark federated branch queries")
+    parser.add_argument("--branches", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for i in range(max(args.branches)):
+            paths[f"branch{i}"] = seed_database(os.path.join(tmp, f"branch{i}.db"), books=args.books,
+                                                members=args.books // 10, transactions=args.transactions,
+                                                reviews=0, seed=i)
+
+        print(f"{'query':>18}  {'branches':>8}  {'sequential':>10}  {'parallel':>9}  {'speedup':>7}")
+        for count in args.branches:
+            branches = dict(list(paths.items())[:count])
+            sequential = BranchFederation(branches, parallel=False)
+            parallel = BranchFederation(branches, parallel=True)
+            for name, query in QUERIES.items():
+                seq_time = best_time(query, sequential, args.repeat)
+                par_time = best_time(query, parallel, args.repeat)
+                print(f"{name:>18}  {count:>8}  {seq_time * 1000:8.1f}ms  {par_time * 1000:7.1f}ms  "
+                      f"{seq_time / par_time:6.2f}x")
+            sequential.close()
+            parallel.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Hold Queue Benchmark
+Cost of return_book handing the copy to the next hold, and of the expiry
+sweep, as one bestseller's queue grows; with the partial queue and expiry
+indexes both should stay flat
+
+Usage: python benchmarks/bench_holds.py [--queues 1000 10000 100000] [--returns 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_manager import DatabaseManager  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hold allocation")
+    parser.add_argument("--queues", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--returns", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'queue':>8}  {'return + allocate':>17}  {'expiry sweep':>12}")
+    for queue in args.queues:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_name = seed_database(os.path.join(tmp, "holds.db"), books=100, members=queue + 1,
+                                    transactions=0, reviews=0)
+            db = DatabaseManager(db_name)
+            book_id = 1
+            db.update_book(book_id, {'total_copies': 1})
+            txn = db.issue_book(1, book_id)
+            db.cursor.executemany("INSERT INTO reservations (book_id, member_id) VALUES (?, ?)",
+                                  ((book_id, member_id) for member_id in range(2, queue + 2)))
+            db.conn.commit()
+
+            # Each return readies the next hold, whose member borrows the copy again
+            elapsed = 0.0
+            for _ in range(args.returns):
+                start = time.perf_counter()
+                reservation_id = db.return_book(txn, '2026-01-01')
+                elapsed += time.perf_counter() - start
+                txn = db.issue_book(db.get_reservation(reservation_id)['member_id'], book_id)
+            allocate = elapsed / args.returns
+
+            # The last copy sits on the hold shelf; let it lapse repeatedly
+            db.return_book(txn, '2026-01-01')
+            start = time.perf_counter()
+            for day in range(args.returns):
+                db.expire_reservations(f"2027-{1 + day // 28 % 12:02d}-{1 + day % 28:02d}")
+            sweep = (time.perf_counter() - start) / args.returns
+            print(f"{queue:8d}  {allocate * 1e3:14.3f} ms  {sweep * 1e3:9.3f} ms")
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Maintenance Benchmark
+File size, freelist and read-workload timings of a churned database before
+and after a maintenance pass (every task, including the optional reindex),
+the same workload under each performance profile, and issue_book latency
+at a desk while the pass runs
+
+Usage: python benchmarks/bench_maintenance.py [--transactions 300000] [--wal]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from archive_manager import ArchiveManager  # noqa: E402
+from db_manager import PERFORMANCE_PROFILES, DatabaseManager  # noqa: E402
+from maintenance import ALL_TASKS, MaintenanceManager, format_statistics  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+
+def workload(db_name: str, profile: str, rounds: int, members: int) -> float:
+    """Mean time of one round of desk reads, on a fresh connection"""
+    db = DatabaseManager(db_name, profile=profile)
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        db.search_books(f"Title {rng.randint(1, 999)}")
+        db.search_books("smith", "author")
+        db.get_member_borrowing_history(rng.randint(1, members))
+        db.get_overdue_books()
+        db.get_recent_transactions()
+        db.get_top_rated_books()
+        db.get_statistics()
+    elapsed = (time.perf_counter() - start) / rounds
+    db.close()
+    return elapsed
+
+
+def desk_latencies(db_name: str, stop: threading.Event, out: list):
+    """Issue and return books continuously, recording issue_book latency"""
+    db = DatabaseManager(db_name)
+    book_id = 1
+    while not stop.is_set():
+        start = time.perf_counter()
+        txn_id = db.issue_book(1, book_id)
+        out.append(time.perf_counter() - start)
+        db.return_book(txn_id)
+        book_id = book_id % 100 + 1
+        time.sleep(0.005)
+    db.close()
+
+
+def summarize(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95)]
+    return (f"p50 {statistics.median(ordered) * 1000:6.2f}ms  p95 {p95 * 1000:6.2f}ms  "
+            f"max {ordered[-1] * 1000:7.2f}ms  ({len(ordered)} issues)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database maintenance")
+    parser.add_argument("--transactions", type=int, default=300000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--wal", action="store_true", help="run the database in WAL mode")
+    args = parser.parse_args()
+
+    members = args.transactions // 50
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = seed_database(os.path.join(tmp, "maintenance.db"), books=args.transactions // 10,
+                                members=members, transactions=args.transactions,
+                                reviews=args.transactions // 5)
+        db = DatabaseManager(db_name)
+        if args.wal:
+            db.conn.execute("PRAGMA journal_mode = WAL")
+        # Churn: the change feed is consumed and compacted, old loans are
+        # archived and reviews are updated in bulk
+        db.ack_changes("bench", db.get_last_change_seq())
+        db.compact_change_log()
+        db.bulk_update('book_reviews', 'review_id', [
+            {'review_id': review_id, 'review_text': "Edited review text"}
+            for review_id in range(1, args.transactions // 5, 3)])
+        db.close()
+        archiver = ArchiveManager(db_name, horizon_days=365, batch_size=5000, pause=0)
+        archiver.run()
+        archiver.close()
+
+        workload(db_name, 'default', 1, members)  # warm the OS page cache
+        before = workload(db_name, 'default', args.rounds, members)
+        manager = MaintenanceManager(db_name)
+        print(f"before: {format_statistics(manager.get_statistics())}")
+
+        latencies = []
+        stop = threading.Event()
+        desk = threading.Thread(target=desk_latencies, args=(db_name, stop, latencies))
+        desk.start()
+        time.sleep(1)
+        idle = len(latencies)
+        chunks = {}
+        result = manager.run(ALL_TASKS, progress=lambda task, _: chunks.update({task: chunks.get(task, 0) + 1}))
+        stop.set()
+        desk.join()
+        manager.close()
+        print(f"after:  {format_statistics(result['after'])}")
+        print(f"pass: {result['chunks']} chunks ({chunks}) in {result['seconds']}s")
+        print(f"desk issue_book, no maintenance:     {summarize(latencies[:idle])}")
+        print(f"desk issue_book, during maintenance: {summarize(latencies[idle:])}")
+
+        print(f"desk read round, default profile, before maintenance: {before * 1e3:8.2f} ms")
+        for profile in PERFORMANCE_PROFILES:
+            elapsed = workload(db_name, profile, args.rounds, members)
+            print(f"desk read round, {profile} profile, after maintenance: {elapsed * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
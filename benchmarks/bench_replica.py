@@ -0,0 +1,71 @@
+"""
+Desk Replica Benchmark
+Time for a desk's first snapshot of the primary, how quickly it catches up
+on changes made at other desks, and what a forwarded checkout costs over
+a direct one (the write plus the sync that pulls it back)
+
+Both files are local here; on a network share the primary's side of every
+figure grows with the round trip, while reads from the replica do not.
+
+Usage: python benchmarks/bench_replica.py [--books 100000] [--changes 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_manager import DatabaseManager  # noqa: E402
+from replica import ReplicaDatabase  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the desk replica")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--changes", type=int, default=20000)
+    parser.add_argument("--checkouts", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = seed_database(os.path.join(tmp, "primary.db"), books=args.books, members=args.members,
+                                transactions=0, reviews=0)
+        replica = ReplicaDatabase(db_name, os.path.join(tmp, "replica.db"), consumer="bench")
+        start = time.perf_counter()
+        rows = replica.snapshot()
+        print(f"snapshot: {rows} rows in {time.perf_counter() - start:.2f}s")
+
+        # Another desk edits books and members in the meantime
+        other = DatabaseManager(db_name)
+        for n in range(args.changes):
+            if n % 2:
+                other.update_book(rng.randint(1, args.books), {'title': f"Edited Title {n}"})
+            else:
+                other.update_member(rng.randint(1, args.members), {'phone': f"555-{n:04d}"})
+        start = time.perf_counter()
+        rows = replica.sync()
+        elapsed = time.perf_counter() - start
+        print(f"catch-up: {args.changes} changes ({rows} rows) in {elapsed:.2f}s, "
+              f"{args.changes / elapsed:,.0f} changes/s")
+
+        books = rng.sample(range(1, args.books + 1), args.checkouts * 2)
+        start = time.perf_counter()
+        for book_id in books[:args.checkouts]:
+            other.issue_book(rng.randint(1, args.members), book_id)
+        direct = (time.perf_counter() - start) / args.checkouts
+        start = time.perf_counter()
+        for book_id in books[args.checkouts:]:
+            replica.issue_book(rng.randint(1, args.members), book_id)
+        forwarded = (time.perf_counter() - start) / args.checkouts
+        print(f"checkout: direct {direct * 1e3:.3f} ms, forwarded and synced back {forwarded * 1e3:.3f} ms")
+        other.close()
+        replica.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Review Aggregates Benchmark
+What the book details window and a "highest rated in category" ranking
+cost computed from book_reviews on every request versus read from the
+book_ratings aggregates maintained on write, and what maintaining them
+costs a bulk load and a single review
+
+Usage: python benchmarks/bench_reviews.py [--books 20000] [--reviews 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_manager import DatabaseManager  # noqa: E402
+from seed import CATEGORIES, seed_database  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark review aggregates")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--reviews", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = seed_database(os.path.join(tmp, "reviews.db"), books=args.books, members=1000,
+                                transactions=0, reviews=0)
+        # A few bestsellers collect most of the reviews
+        rows = [(min(int(rng.paretovariate(0.8)), args.books), rng.randint(1, 1000), rng.randint(1, 5),
+                 "Synthetic review text", "2026-01-01") for _ in range(args.reviews)]
+        db = DatabaseManager(db_name)
+        start = time.perf_counter()
+        for offset in range(0, len(rows), 50000):
+            db.bulk_insert('book_reviews', ('book_id', 'member_id', 'rating', 'review_text', 'review_date'),
+                           rows[offset:offset + 50000])
+        print(f"bulk load of {args.reviews} reviews, aggregates folded per batch: "
+              f"{time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        for book_id, member_id, rating, text, _ in rows[:500]:
+            db.add_review(book_id, member_id, rating, text)
+        print(f"add_review with aggregate update: {(time.perf_counter() - start) / 500 * 1e3:.3f} ms")
+
+        bestsellers = [1, 2, 3, 10, 100]
+        categories = [rng.choice(CATEGORIES) for _ in range(args.queries)]
+
+        def timed(label, fn, items):
+            start = time.perf_counter()
+            for item in items:
+                fn(item)
+            print(f"{label:>44}  {(time.perf_counter() - start) / len(items) * 1e3:9.3f} ms")
+
+        def details_scan(book_id):
+            reviews = db.get_book_reviews(book_id)
+            histogram = [sum(1 for r in reviews if r['rating'] == n) for n in range(1, 6)]
+            return sum(r['rating'] for r in reviews) / max(len(reviews), 1), histogram, reviews[:3]
+
+        def details_aggregate(book_id):
+            return db.get_book_rating(book_id), db.get_book_reviews(book_id, limit=3)
+
+        def top_scan(category):
+            return db._fetch_all("""
+                SELECT b.*, AVG(r.rating) AS average, COUNT(*) AS review_count
+                FROM book_reviews r JOIN books b ON b.book_id = r.book_id
+                WHERE b.category = ? GROUP BY b.book_id
+                ORDER BY average DESC, review_count DESC LIMIT 10
+            """, (category,))
+
+        for book_id in bestsellers:
+            count = db.get_book_rating(book_id)['review_count']
+            timed(f"details, book with {count} reviews: all reviews", details_scan, [book_id] * 5)
+            timed(f"details, book with {count} reviews: aggregates", details_aggregate, [book_id] * 50)
+        timed("top 10 in category: GROUP BY over reviews", top_scan, categories[:20])
+        timed("top 10 in category: book_ratings index", lambda c: db.get_top_rated_books(c), categories)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Row Materialization Benchmark
+Per-row cost and peak memory of get_all_transactions with Records versus
+the previous sqlite3.Row -> dict path
+
+Usage: python benchmarks/bench_rows.py [--transactions 50000 200000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_manager import DatabaseManager  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+TRANSACTIONS_QUERY = """
+    SELECT t.*, b.title as book_title, b.author,
+           m.first_name || ' ' || m.last_name as member_name, m.email
+    FROM transactions t
+    JOIN books b ON t.book_id = b.book_id
+    JOIN members m ON t.member_id = m.member_id
+    ORDER BY t.issue_date DESC
+"""
+
+
+def dict_rows(db: DatabaseManager) -> list:
+    """The materialization get_all_transactions used before Records"""
+    db.cursor.execute(TRANSACTIONS_QUERY)
+    rows = db.cursor.fetchall()
+    return [dict(row) for row in rows]
+
+
+def measure(fetch, db: DatabaseManager, repeat: int) -> tuple:
+    """Best wall time over `repeat` runs, then peak traced memory of one run"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fetch(db)
+        best = min(best, time.perf_counter() - start)
+        del rows
+    tracemalloc.start()
+    rows = fetch(db)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark result row materialization")
+    parser.add_argument("--transactions", type=int, nargs="+", default=[50000, 200000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'path':>7}  {'total':>8}  {'per row':>9}  {'peak memory':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.transactions:
+            db_name = seed_database(os.path.join(tmp, f"rows-{size}.db"), books=size // 10,
+                                    members=size // 50, transactions=size, reviews=0)
+            db = DatabaseManager(db_name)
+            for label, fetch in (("dict", dict_rows), ("record", DatabaseManager.get_all_transactions)):
+                seconds, peak, count = measure(fetch, db, args.repeat)
+                print(f"{count:>9}  {label:>7}  {seconds:7.3f}s  {seconds / count * 1e6:7.2f}us  "
+                      f"{peak / 1e6:9.1f} MB")
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
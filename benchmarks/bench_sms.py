@@ -0,0 +1,59 @@
+"""
+Bulk SMS Benchmark
+Delivery throughput through HTTPSMSProvider against the fake SMS gateway,
+by bulk batch size and concurrency, plus a failure-injection run
+
+Usage: python benchmarks/bench_sms.py [--messages 5000] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bulk_notifier import BulkNotifier  # noqa: E402
+from fake_sms_gateway import FakeSMSConfig, FakeSMSGateway  # noqa: E402
+from sms_providers import HTTPSMSProvider  # noqa: E402
+
+SCENARIOS = [
+    # (label, max_batch, concurrency, rate, gateway config)
+    ("one per request", 1, 1, 1000.0, {}),
+    ("batch 100", 100, 1, 1000.0, {}),
+    ("batch 100 x4", 100, 4, 1000.0, {}),
+    ("batch 100 x4, 20 req/s", 100, 4, 20.0, {}),
+    ("faults: 10% 500s, 1% rejects, 429s", 100, 4, 1000.0,
+     {'error_rate': 0.1, 'reject_rate': 0.01, 'rate_limit': 30}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk SMS delivery")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05, help="gateway seconds per request")
+    args = parser.parse_args()
+
+    print(f"{'scenario':>36}  {'seconds':>8}  {'msg/s':>8}  {'requests':>8}  result")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, (label, max_batch, concurrency, rate, faults) in enumerate(SCENARIOS):
+            messages = args.messages if max_batch > 1 else min(args.messages, 200)
+            config = FakeSMSConfig(latency=args.latency, seed=index, **faults)
+            with FakeSMSGateway(config=config) as gateway:
+                provider = HTTPSMSProvider(gateway.url, max_batch=max_batch, concurrency=concurrency,
+                                           rate=rate, max_retries=5)
+                notifier = BulkNotifier(os.path.join(tmp, f"sms-{index}.db"), sms_provider=provider)
+                for i in range(messages):
+                    notifier.enqueue(None, 'sms', f"+2771{i:07d}", f"Reminder {i}", kind='due', commit=False)
+                notifier.db.conn.commit()
+
+                start = time.perf_counter()
+                stats = notifier.dispatch()
+                elapsed = time.perf_counter() - start
+                notifier.close()
+                print(f"{label:>36}  {elapsed:8.2f}  {messages / elapsed:8.0f}  "
+                      f"{gateway.stats['requests']:8d}  {stats.get('sms')}")
+
+
+if __name__ == "__main__":
+    main()
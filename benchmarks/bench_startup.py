@@ -0,0 +1,75 @@
+"""
+Startup Benchmark
+Measures time to first paint of main.py for growing database sizes
+
+Usage: python benchmarks/bench_startup.py [--sizes 1000 10000 100000]
+Requires a display (run under xvfb-run on headless machines).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from seed import seed_database  # noqa: E402
+
+
+def measure_startup(db_name: str, build_all_tabs: bool = False) -> dict:
+    """Time module import, window construction and first paint"""
+    t0 = time.perf_counter()
+    import main
+    t_import = time.perf_counter()
+
+    app = main.LibraryManagementSystem(db_name)
+    t_init = time.perf_counter()
+
+    painted = []
+    app.bind("<Expose>", lambda e: painted or painted.append(time.perf_counter()), add="+")
+    while not painted:
+        app.update()
+    t_paint = painted[0]
+
+    # Let the deferred dashboard build run, as the user would see it
+    app.update()
+    t_dashboard = time.perf_counter()
+
+    t_all = None
+    if build_all_tabs:
+        for tab in app.notebook.tabs():
+            app.notebook.select(tab)
+            app.update()
+        t_all = time.perf_counter()
+
+    app.destroy()
+    app.db.close()
+    return {
+        'import': t_import - t0,
+        'init': t_init - t_import,
+        'first_paint': t_paint - t0,
+        'dashboard_ready': t_dashboard - t0,
+        'all_tabs': (t_all - t0) if t_all else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark main.py startup time")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="number of transactions to seed (books/members scale with it)")
+    parser.add_argument("--all-tabs", action="store_true", help="also time building every tab")
+    args = parser.parse_args()
+
+    print(f"{'transactions':>12} {'first paint':>12} {'dashboard':>12} {'all tabs':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_name = seed_database(os.path.join(tmp, "bench.db"), books=size // 5, members=size // 20,
+                                    transactions=size, reviews=size // 5)
+            result = measure_startup(db_name, args.all_tabs)
+            all_tabs = f"{result['all_tabs'] * 1000:10.1f}ms" if result['all_tabs'] else f"{'-':>12}"
+            print(f"{size:>12} {result['first_paint'] * 1000:10.1f}ms "
+                  f"{result['dashboard_ready'] * 1000:10.1f}ms {all_tabs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Notification Rendering Benchmark
+Per-message cost of the old f-string + MIMEMultipart path versus compiled
+templates, and peak memory of a streamed new-book announcement by member
+count (sending stubbed out, so only rendering and queueing are measured)
+
+Usage: python benchmarks/bench_templates.py [--messages 20000] [--members 5000 20000 80000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bulk_notifier import BulkNotifier  # noqa: E402
+from notifications import NotificationManager  # noqa: E402
+from seed import seed_database  # noqa: E402
+from sms_providers import SMSProvider  # noqa: E402
+
+
+class NullSMSProvider(SMSProvider):
+    max_batch = 1000
+    rate = 1e6
+
+    async def send_batch(self, messages):
+        return [{'ref': m['ref'], 'status': 'sent', 'message_id': None, 'error': None} for m in messages]
+
+
+def legacy_message(member_name: str, book_title: str, author: str, recipient: str):
+    """How send_new_book_notification built each message before templates"""
+    body = f"""
+Dear {member_name},
+
+We're excited to inform you that a new book has arrived at the library:
+
+Title: {book_title}
+Author: {author}
+
+Visit the library to check it out!
+
+Thank you,
+Library Management System
+    """.strip()
+    msg = MIMEMultipart()
+    msg['From'] = 'library@example.org'
+    msg['To'] = recipient
+    msg['Subject'] = "New Book Arrival"
+    msg.attach(MIMEText(body, 'plain'))
+    return msg.as_bytes()
+
+
+def bench_rendering(count: int):
+    notifications = NotificationManager()
+    notifications.email_config['sender_email'] = 'library@example.org'
+    store = notifications.templates
+    bound = store.get('new_book').bind(book_title='The Power of One', author='Bryce Courtenay')
+
+    def per_message_template(i):
+        m = store.render('new_book', {'member_name': f"Member {i}", 'book_title': 'The Power of One',
+                                      'author': 'Bryce Courtenay'})
+        return notifications.build_email(f"m{i}@example.org", m['subject'], m['text'], m['html']).as_bytes()
+
+    def bound_template(i):
+        m = bound.render({'member_name': f"Member {i}"})
+        return notifications.build_email(f"m{i}@example.org", m['subject'], m['text'], m['html']).as_bytes()
+
+    def render_only(i):
+        return bound.render({'member_name': f"Member {i}"})
+
+    print(f"{'path':>34}  {'per message':>11}")
+    for label, fn in (
+        ("f-string + MIMEMultipart (text)", lambda i: legacy_message(f"Member {i}", 'The Power of One',
+                                                                    'Bryce Courtenay', f"m{i}@example.org")),
+        ("template + MIME (text + html)", per_message_template),
+        ("bound template + MIME (text + html)", bound_template),
+        ("bound template, render only", render_only),
+    ):
+        start = time.perf_counter()
+        for i in range(count):
+            fn(i)
+        print(f"{label:>34}  {(time.perf_counter() - start) / count * 1e6:9.1f}us")
+
+
+def bench_announcement(tmp: str, members: int, chunk_size: int):
+    db_name = seed_database(os.path.join(tmp, f"announce-{members}.db"), books=10, members=members,
+                            transactions=0, reviews=0)
+    notifications = NotificationManager()
+    notifications.send_email = lambda recipient, subject, body, html=None: True
+    notifier = BulkNotifier(db_name, notifications, sms_provider=NullSMSProvider(), chunk_size=chunk_size)
+    notifier.db.cursor.execute("""
+        UPDATE members SET notify_preference = CASE member_id % 3
+            WHEN 0 THEN 'email' WHEN 1 THEN 'sms' ELSE 'both' END
+    """)
+    notifier.db.conn.commit()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    stats = asyncio.run(notifier.announce_new_book_async(1))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    notifier.close()
+    print(f"{members:>9}  {stats['queued']:>9}  {elapsed:8.2f}s  {peak / 1e6:9.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark notification rendering")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--members", type=int, nargs="+", default=[5000, 20000, 80000])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    bench_rendering(args.messages)
+    print(f"\n{'members':>9}  {'messages':>9}  {'time':>9}  {'peak memory':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for members in args.members:
+            bench_announcement(tmp, members, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark Data Seeding
+Builds synthetic library databases of a given size for the benchmark scripts
+"""
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from author_utils import link_book_authors
+from db_manager import DatabaseManager
+from duplicate_index import index_book
+from migrations import fold_ratings, insert_copies
+
+CATEGORIES = ["Fiction", "Science", "History", "Children", "Biography", "Computers", "Art", "Travel"]
+MEMBERSHIP_TYPES = ["Standard", "Premium", "Student", "Senior"]
+
+
+def seed_database(db_name: str, books: int = 1000, members: int = 200,
+                  transactions: int = 5000, reviews: int = 1000, seed: int = 42) -> str:
+    """Create (or extend) a library database with synthetic rows"""
+    rng = random.Random(seed)
+    DatabaseManager(db_name).close()  # make sure the schema exists
+
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    first_new_book = cursor.execute("SELECT COALESCE(MAX(book_id), 0) FROM books").fetchone()[0]
+    last_review = cursor.execute("SELECT COALESCE(MAX(review_id), 0) FROM book_reviews").fetchone()[0]
+    cursor.executemany("""
+        INSERT INTO books (
+            isbn, title, author, publisher, publication_year, category,
+            description, cover_image_url, page_count, language,
+            total_copies, available_copies, shelf_location
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (f"978{i:010d}", f"Book Title {i}", f"Author {i % 997}", "Bench Press",
+         1950 + i % 70, rng.choice(CATEGORIES), "Synthetic benchmark book", "",
+         100 + i % 500, "en", 3, 3, f"S{i % 50}")
+        for i in range(books)
+    ))
+    known_authors = {}
+    for book_id, title, author in cursor.execute("SELECT book_id, title, author FROM books WHERE book_id > ?",
+                                                 (first_new_book,)).fetchall():
+        link_book_authors(cursor, book_id, author, known_authors)
+        index_book(cursor, book_id, title, author)
+    insert_copies(cursor, first_new_book)
+    cursor.executemany("""
+        INSERT INTO members (
+            membership_number, first_name, last_name, email, phone,
+            address, join_date, membership_type, status
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (f"M{i:08d}", f"First{i}", f"Last{i}", f"member{i}@example.com", f"555{i:07d}",
+         f"{i} Library Lane", "2020-01-01", rng.choice(MEMBERSHIP_TYPES), "Active")
+        for i in range(members)
+    ))
+
+    start = date.today() - timedelta(days=5 * 365)
+    book_ids = [r[0] for r in cursor.execute("SELECT book_id FROM books")]
+    member_ids = [r[0] for r in cursor.execute("SELECT member_id FROM members")]
+
+    def txn_rows():
+        for _ in range(transactions):
+            issue = start + timedelta(days=rng.randrange(5 * 365))
+            due = issue + timedelta(days=14)
+            if due < date.today() and rng.random() < 0.95:
+                returned = issue + timedelta(days=rng.randrange(1, 30))
+                fine = max(0, (returned - due).days) * 1.0
+                yield (rng.choice(member_ids), rng.choice(book_ids), issue.isoformat(),
+                       due.isoformat(), returned.isoformat(), fine, "Returned")
+            else:
+                yield (rng.choice(member_ids), rng.choice(book_ids), issue.isoformat(),
+                       due.isoformat(), None, 0, "Issued")
+
+    cursor.executemany("""
+        INSERT INTO transactions (member_id, book_id, issue_date, due_date, return_date, fine_amount, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, txn_rows())
+    cursor.executemany("""
+        INSERT INTO book_reviews (book_id, member_id, rating, review_text, review_date)
+        VALUES (?, ?, ?, ?, ?)
+    """, (
+        (rng.choice(book_ids), rng.choice(member_ids), rng.randint(1, 5), "Synthetic review text",
+         (start + timedelta(days=rng.randrange(5 * 365))).isoformat())
+        for _ in range(reviews)
+    ))
+    fold_ratings(cursor, last_review)
+    conn.commit()
+    conn.close()
+    return db_name
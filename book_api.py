@@ -4,26 +4,80 @@ Handles Google Books API and Open Library API integration
 """
 import requests
 import json
+import time
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from urllib.parse import quote
 
+from isbn_utils import clean_isbn, isbn_key
+from provider_health import ProviderHealth, ProviderUnavailable, order_providers
+
+# How long get_author_info trusts author details stored in the database
+AUTHOR_INFO_TTL = timedelta(days=30)
+AUTHOR_MISSING_TTL = timedelta(days=7)
+
+
+def _stored_author_info(author) -> Dict:
+    """get_author_info's result shape from an authors row"""
+    return {
+        'name': author['name'],
+        'ol_key': author['ol_key'] or '',
+        'birth_date': author['birth_date'] or '',
+        'death_date': author['death_date'] or '',
+        'top_work': author['top_work'] or '',
+        'work_count': author['work_count'] or 0
+    }
+
 
 class BookAPI:
-    def __init__(self):
-        self.google_books_base = "https://www.googleapis.com/books/v1/volumes"
-        self.open_library_base = "https://openlibrary.org"
+    def __init__(self, google_books_base: str = "https://www.googleapis.com/books/v1/volumes",
+                 open_library_base: str = "https://openlibrary.org",
+                 timeout: float = 10, lookup_budget: float = 12):
+        self.timeout = timeout
+        # Upper bound on the total time fetch_book_data may spend across providers
+        self.lookup_budget = lookup_budget
+        self.health = {
+            'google': ProviderHealth('google'),
+            'open_library': ProviderHealth('open_library'),
+        }
+        self.google_books_base = google_books_base
+        self.open_library_base = open_library_base
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Library Management System/1.0'
         })
+        # fetch_book_data results keyed by canonical ISBN-13
+        self._isbn_cache = {}
+
+    def _get_json(self, provider: str, url: str, timeout: float = None) -> Optional[Dict]:
+        """GET a JSON document, tracking provider health; None on 404"""
+        health = self.health[provider]
+        if not health.breaker.allow_request():
+            raise ProviderUnavailable(f"{provider} circuit is open")
+
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=timeout or self.timeout)
+            if response.status_code == 404:
+                health.record(time.monotonic() - start, True)
+                return None
+            response.raise_for_status()
+            data = response.json()
+        except (requests.Timeout, requests.ConnectionError):
+            # One timeout is enough to stop sending every other book the same way
+            health.record(time.monotonic() - start, False, hard=True)
+            raise
+        except Exception:
+            health.record(time.monotonic() - start, False)
+            raise
+        health.record(time.monotonic() - start, True)
+        return data
 
     def search_google_books(self, query: str, max_results: int = 10) -> List[Dict]:
         """Search Google Books API"""
         try:
             url = f"{self.google_books_base}?q={quote(query)}&maxResults={max_results}"
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json('google', url) or {}
             
             books = []
             for item in data.get('items', []):
@@ -35,15 +89,11 @@ class BookAPI:
             print(f"Error searching Google Books: {e}")
             return []
 
-    def get_book_by_isbn(self, isbn: str) -> Optional[Dict]:
+    def get_book_by_isbn(self, isbn: str, timeout: float = None) -> Optional[Dict]:
         """Get book information by ISBN from Google Books"""
         try:
-            # Remove hyphens and spaces from ISBN
-            clean_isbn = isbn.replace('-', '').replace(' ', '')
-            url = f"{self.google_books_base}?q=isbn:{clean_isbn}"
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            url = f"{self.google_books_base}?q=isbn:{clean_isbn(isbn)}"
+            data = self._get_json('google', url, timeout) or {}
             
             if data.get('totalItems', 0) > 0:
                 return self._parse_google_book(data['items'][0])
@@ -52,7 +102,8 @@ class BookAPI:
             print(f"Error fetching book by ISBN from Google Books: {e}")
             return None
 
-    def _parse_google_book(self, item: Dict) -> Optional[Dict]:
+    @staticmethod
+    def _parse_google_book(item: Dict) -> Optional[Dict]:
         """Parse Google Books API response"""
         try:
             volume_info = item.get('volumeInfo', {})
@@ -123,9 +174,7 @@ class BookAPI:
         """Search Open Library API"""
         try:
             url = f"{self.open_library_base}/search.json?q={quote(query)}&limit={max_results}"
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json('open_library', url) or {}
             
             books = []
             for doc in data.get('docs', []):
@@ -137,20 +186,18 @@ class BookAPI:
             print(f"Error searching Open Library: {e}")
             return []
 
-    def get_book_by_isbn_open_library(self, isbn: str) -> Optional[Dict]:
+    def get_book_by_isbn_open_library(self, isbn: str, timeout: float = None) -> Optional[Dict]:
         """Get book information by ISBN from Open Library"""
         try:
-            clean_isbn = isbn.replace('-', '').replace(' ', '')
-            url = f"{self.open_library_base}/isbn/{clean_isbn}.json"
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return self._parse_open_library_book(data)
+            url = f"{self.open_library_base}/isbn/{clean_isbn(isbn)}.json"
+            data = self._get_json('open_library', url, timeout)
+            return self._parse_open_library_book(data) if data else None
         except Exception as e:
             print(f"Error fetching book by ISBN from Open Library: {e}")
             return None
 
-    def _parse_open_library_book(self, doc: Dict) -> Optional[Dict]:
+    @staticmethod
+    def _parse_open_library_book(doc: Dict) -> Optional[Dict]:
         """Parse Open Library API response"""
         try:
             # Extract ISBN
@@ -199,27 +246,47 @@ class BookAPI:
             print(f"Error parsing Open Library data: {e}")
             return None
 
-    def get_author_info(self, author_name: str) -> Optional[Dict]:
-        """Get author information from Open Library"""
+    def _fetch_author_info(self, author_name: str) -> Optional[Dict]:
+        """Look an author up on Open Library; None if not found, raises on errors"""
+        url = f"{self.open_library_base}/search/authors.json?q={quote(author_name)}&limit=1"
+        data = self._get_json('open_library', url) or {}
+        if data.get('numFound', 0) > 0:
+            author_doc = data['docs'][0]
+            return {
+                'name': author_doc.get('name', ''),
+                'ol_key': author_doc.get('key', ''),
+                'birth_date': author_doc.get('birth_date', ''),
+                'death_date': author_doc.get('death_date', ''),
+                'top_work': author_doc.get('top_work', ''),
+                'work_count': author_doc.get('work_count', 0)
+            }
+        return None
+
+    def get_author_info(self, author_name: str, db=None) -> Optional[Dict]:
+        """Get author information from Open Library.
+
+        Given a DatabaseManager, authors already in the catalogue are answered
+        from the authors table while the stored result is fresh (AUTHOR_INFO_TTL
+        after a hit, AUTHOR_MISSING_TTL after a miss); a failed refresh falls
+        back to the stored details.
+        """
+        author = db.find_author(author_name) if db is not None else None
+        if author and author['info_fetched_at']:
+            age = datetime.now() - datetime.fromisoformat(author['info_fetched_at'])
+            if author['info_status'] == 'found' and age < AUTHOR_INFO_TTL:
+                return _stored_author_info(author)
+            if author['info_status'] == 'missing' and age < AUTHOR_MISSING_TTL:
+                return None
         try:
-            url = f"{self.open_library_base}/search/authors.json?q={quote(author_name)}&limit=1"
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('numFound', 0) > 0:
-                author_doc = data['docs'][0]
-                return {
-                    'name': author_doc.get('name', ''),
-                    'birth_date': author_doc.get('birth_date', ''),
-                    'death_date': author_doc.get('death_date', ''),
-                    'top_work': author_doc.get('top_work', ''),
-                    'work_count': author_doc.get('work_count', 0)
-                }
-            return None
+            info = self._fetch_author_info(author_name)
         except Exception as e:
             print(f"Error fetching author info: {e}")
+            if author and author['info_status'] == 'found':
+                return _stored_author_info(author)
             return None
+        if author:
+            db.save_author_info(author['author_id'], info)
+        return info
 
     def get_related_books(self, book_title: str, author: str = None) -> List[Dict]:
         """Get related/recommended books"""
@@ -235,12 +302,29 @@ class BookAPI:
 
     def fetch_book_data(self, isbn: str) -> Optional[Dict]:
         """Try to fetch book data from multiple sources"""
-        # Try Google Books first
-        book_data = self.get_book_by_isbn(isbn)
-        if book_data and book_data.get('title'):
-            return book_data
-        
-        # Try Open Library as fallback
-        book_data = self.get_book_by_isbn_open_library(isbn)
+        key = isbn_key(isbn)
+        if key in self._isbn_cache:
+            return self._isbn_cache[key]
+
+        # Healthiest provider first, all within one latency budget
+        lookups = {
+            'google': self.get_book_by_isbn,
+            'open_library': self.get_book_by_isbn_open_library,
+        }
+        deadline = time.monotonic() + self.lookup_budget
+        book_data = None
+        for provider in order_providers(self.health, list(lookups), self.timeout):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            book_data = lookups[provider](isbn, timeout=min(self.timeout, remaining))
+            if book_data and book_data.get('title'):
+                break
+
+        if book_data:
+            self._isbn_cache[key] = book_data
         return book_data
 
+    def get_provider_stats(self) -> List[Dict]:
+        """Circuit state, p95 latency and success rate per provider"""
+        return [health.stats() for health in self.health.values()]
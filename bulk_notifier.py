@@ -0,0 +1,366 @@
+"""
+Bulk Notifier Module
+Queues reminders per member preference (email, SMS or both), persists
+their delivery state, and sends them concurrently: SMS in provider-sized
+bulk batches under the provider's rate limit, email over a small pool of
+SMTP workers
+
+Work is done in chunks of `chunk_size` deliveries, so memory stays flat
+however many members there are. New-book announcements stream members
+from the database, render and queue one chunk while the previous chunk is
+being sent.
+
+Delivery is at least once: a crash between sending and recording the
+result leaves rows in 'sending', which requeue_stale() puts back.
+
+Usage: python bulk_notifier.py overdue | holds | dispatch | stats | announce --book-id 12 [--db library.db]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from db_manager import DatabaseManager
+from message_templates import DEFAULT_LOCALE
+from notifications import NotificationManager
+from sms_providers import SMSProvider
+
+CHANNELS_BY_PREFERENCE = {
+    'email': ('email',),
+    'sms': ('sms',),
+    'both': ('email', 'sms'),
+    'none': (),
+}
+
+
+class BulkNotifier:
+    def __init__(self, db_name: str = "library.db", notifications: NotificationManager = None,
+                 sms_provider: SMSProvider = None, email_concurrency: int = 4, max_attempts: int = 3,
+                 chunk_size: int = 1000):
+        self.db = DatabaseManager(db_name)
+        self.notifications = notifications or NotificationManager()
+        self.sms_provider = sms_provider or self.notifications.get_sms_provider()
+        self.email_concurrency = email_concurrency
+        self.max_attempts = max_attempts
+        self.chunk_size = chunk_size
+
+    # ========== QUEUEING ==========
+    def enqueue(self, member_id: int, channel: str, recipient: str, body: str,
+                subject: str = None, kind: str = None, commit: bool = True, html: str = None) -> int:
+        """Queue one message for delivery"""
+        self.db.cursor.execute("""
+            INSERT INTO notification_deliveries (member_id, channel, recipient, kind, subject, body, body_html)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (member_id, channel, recipient, kind, subject, body, html))
+        if commit:
+            self.db.conn.commit()
+        return self.db.cursor.lastrowid
+
+    @staticmethod
+    def recipients(preference: str, email: str, phone: str) -> List[Tuple[str, str]]:
+        """(channel, address) pairs for a member's notification preference.
+
+        Members who prefer SMS but have no phone number get email instead.
+        """
+        channels = CHANNELS_BY_PREFERENCE.get(preference or 'email', ('email',))
+        if channels == ('sms',) and not phone:
+            channels = ('email',)
+        return [(channel, phone if channel == 'sms' else email) for channel in channels
+                if (phone if channel == 'sms' else email)]
+
+    def _enqueue_message(self, member_id: int, preference: str, email: str, phone: str,
+                         message: Dict, kind: str) -> int:
+        """Queue a rendered message on each of a member's channels; returns the count"""
+        queued = 0
+        for channel, recipient in self.recipients(preference, email, phone):
+            if channel == 'sms':
+                if not message['sms']:
+                    continue
+                self.enqueue(member_id, 'sms', recipient, message['sms'], kind=kind, commit=False)
+            else:
+                self.enqueue(member_id, 'email', recipient, message['text'], subject=message['subject'],
+                             kind=kind, commit=False, html=message['html'])
+            queued += 1
+        return queued
+
+    def enqueue_reminders(self, loans: List[Dict]) -> int:
+        """Queue due/overdue reminders on each member's preferred channels.
+        Returns the number of messages queued."""
+        queued = 0
+        for loan in loans:
+            message = self.notifications.compose_reminder(loan)
+            queued += self._enqueue_message(loan.get('member_id'), loan.get('notify_preference'),
+                                            loan.get('email'), loan.get('phone'), message, message['kind'])
+        self.db.conn.commit()
+        return queued
+
+    def requeue_stale(self) -> int:
+        """Put deliveries left in 'sending' by an interrupted run back in the queue"""
+        self.db.cursor.execute("UPDATE notification_deliveries SET status = 'queued' WHERE status = 'sending'")
+        self.db.conn.commit()
+        return self.db.cursor.rowcount
+
+    def _claim(self, channel: str, after_id: int = 0) -> List[Dict]:
+        """Mark the next chunk of queued deliveries on a channel (ids above
+        `after_id`) as 'sending' and return them"""
+        rows = self.db._fetch_all("""
+            SELECT delivery_id, recipient, subject, body, body_html FROM notification_deliveries
+            WHERE status = 'queued' AND channel = ? AND delivery_id > ?
+            ORDER BY delivery_id
+            LIMIT ?
+        """, (channel, after_id, self.chunk_size))
+        if rows:
+            self.db.cursor.execute("""
+                UPDATE notification_deliveries SET status = 'sending', attempts = attempts + 1
+                WHERE status = 'queued' AND channel = ? AND delivery_id BETWEEN ? AND ?
+            """, (channel, rows[0]['delivery_id'], rows[-1]['delivery_id']))
+            self.db.conn.commit()
+        return rows
+
+    def _record(self, results: List[Dict]):
+        """Persist one batch of delivery results"""
+        for result in results:
+            if result['status'] == 'sent':
+                self.db.cursor.execute("""
+                    UPDATE notification_deliveries
+                    SET status = 'sent', provider_message_id = ?, error = NULL, sent_at = datetime('now')
+                    WHERE delivery_id = ?
+                """, (result.get('message_id'), result['ref']))
+            else:
+                # Retryable failures go back to the queue until attempts run out
+                self.db.cursor.execute("""
+                    UPDATE notification_deliveries
+                    SET status = CASE WHEN ? = 'retry' AND attempts < ? THEN 'queued' ELSE 'failed' END,
+                        error = ?
+                    WHERE delivery_id = ?
+                """, (result['status'], self.max_attempts, result.get('error'), result['ref']))
+        self.db.conn.commit()
+
+    # ========== SENDING ==========
+    async def _send_sms(self, rows: List[Dict]):
+        provider = self.sms_provider
+        semaphore = asyncio.Semaphore(provider.concurrency)
+
+        async def send(batch):
+            async with semaphore:
+                try:
+                    results = await provider.send_batch(
+                        [{'ref': r['delivery_id'], 'to': r['recipient'], 'body': r['body']} for r in batch])
+                except Exception as e:
+                    results = [{'ref': r['delivery_id'], 'status': 'retry', 'error': str(e)} for r in batch]
+            # Runs on the event loop thread, which owns the database connection
+            self._record(results)
+
+        batches = [rows[i:i + provider.max_batch] for i in range(0, len(rows), provider.max_batch)]
+        await asyncio.gather(*(send(batch) for batch in batches))
+
+    async def _send_email(self, rows: List[Dict], pool: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+
+        async def send(row):
+            sent = await loop.run_in_executor(pool, self.notifications.send_email, row['recipient'],
+                                              row['subject'] or '', row['body'], row['body_html'])
+            return {'ref': row['delivery_id'], 'status': 'sent' if sent else 'retry',
+                    'error': None if sent else 'email not sent'}
+
+        # One commit per chunk rather than per message
+        if rows:
+            self._record(await asyncio.gather(*(send(row) for row in rows)))
+
+    async def _send_claimed(self, positions: Dict[str, int], pool: ThreadPoolExecutor) -> int:
+        """Claim and send one chunk per channel past `positions`, advancing
+        them; returns the number of deliveries attempted"""
+        sms, email = self._claim('sms', positions['sms']), self._claim('email', positions['email'])
+        if sms:
+            positions['sms'] = sms[-1]['delivery_id']
+        if email:
+            positions['email'] = email[-1]['delivery_id']
+        await asyncio.gather(self._send_sms(sms), self._send_email(email, pool))
+        return len(sms) + len(email)
+
+    async def _dispatch_rounds(self, rounds: int, pool: ThreadPoolExecutor):
+        for _ in range(rounds):
+            # One pass over the queue; retryable failures wait for the next round
+            positions = {'sms': 0, 'email': 0}
+            attempted = 0
+            while True:
+                sent = await self._send_claimed(positions, pool)
+                if not sent:
+                    break
+                attempted += sent
+            if not attempted:
+                break
+
+    async def dispatch_async(self, rounds: int = None) -> Dict:
+        """Send everything queued, re-sending retryable failures up to max_attempts"""
+        try:
+            with ThreadPoolExecutor(max_workers=self.email_concurrency) as pool:
+                await self._dispatch_rounds(rounds or self.max_attempts, pool)
+        finally:
+            await self.sms_provider.close()
+        return self.get_delivery_stats()
+
+    def dispatch(self, rounds: int = None) -> Dict:
+        """Blocking wrapper around dispatch_async"""
+        return asyncio.run(self.dispatch_async(rounds))
+
+    def _next_delivery_id(self) -> int:
+        """Id the next queued delivery will get, to report on one run"""
+        self.db.cursor.execute("SELECT COALESCE(MAX(delivery_id), 0) FROM notification_deliveries")
+        return self.db.cursor.fetchone()[0] + 1
+
+    def send_reminders(self, loans: List[Dict]) -> Dict:
+        """Queue reminders for the given loans, deliver them and return this run's counts"""
+        first_id = self._next_delivery_id()
+        queued = self.enqueue_reminders(loans)
+        self.dispatch()
+        return dict(self.get_delivery_stats(first_id), queued=queued)
+
+    # ========== ANNOUNCEMENTS ==========
+    async def announce_new_book_async(self, book_id: int) -> Dict:
+        """Tell every active member about a new book, on their preferred channels.
+
+        A producer streams members a chunk at a time, renders and queues
+        their messages; a consumer sends each chunk as it lands. The queue
+        between them holds two chunks, so at most a few chunks of members
+        and messages are in memory at once.
+        """
+        book = self.db.get_book(book_id)
+        if not book:
+            raise ValueError("Book not found")
+        self.db.cursor.execute("SELECT COALESCE(MAX(delivery_id), 0) FROM notification_deliveries")
+        start_id = self.db.cursor.fetchone()[0]
+        # Book fields are filled in once per locale, not once per member
+        shared = {'book_title': book['title'], 'author': book['author']}
+        templates = {}
+        chunks = asyncio.Queue(maxsize=2)
+        totals = {'queued': 0}
+
+        async def produce():
+            try:
+                for members in self.db.iter_members(self.chunk_size):
+                    for member in members:
+                        locale = member.get('locale') or DEFAULT_LOCALE
+                        template = templates.get(locale)
+                        if template is None:
+                            template = templates[locale] = \
+                                self.notifications.templates.get('new_book', locale).bind(**shared)
+                        message = template.render({
+                            'member_name': f"{member['first_name']} {member['last_name']}".strip()})
+                        totals['queued'] += self._enqueue_message(
+                            member['member_id'], member.get('notify_preference'),
+                            member['email'], member['phone'], message, 'new_book')
+                    self.db.conn.commit()
+                    await chunks.put(len(members))
+            finally:
+                await chunks.put(None)
+
+        async def consume(pool):
+            positions = {'sms': start_id, 'email': start_id}
+            while await chunks.get() is not None:
+                while await self._send_claimed(positions, pool):
+                    pass
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.email_concurrency) as pool:
+                await asyncio.gather(produce(), consume(pool))
+                # Retry whatever failed transiently on the first pass
+                await self._dispatch_rounds(self.max_attempts - 1, pool)
+        finally:
+            await self.sms_provider.close()
+        return dict(self.get_delivery_stats(start_id + 1), queued=totals['queued'])
+
+    def announce_new_book(self, book_id: int) -> Dict:
+        """Blocking wrapper around announce_new_book_async"""
+        return asyncio.run(self.announce_new_book_async(book_id))
+
+    # ========== HOLDS ==========
+    def enqueue_hold_notices(self) -> int:
+        """Queue a 'ready for collection' message for every ready hold not yet
+        notified, marking each chunk notified in the same transaction as its
+        messages. Returns the number of messages queued."""
+        queued = 0
+        last_id = 0
+        while True:
+            holds = self.db._fetch_all("""
+                SELECT r.reservation_id, r.member_id, r.expires_at, b.title as book_title,
+                       m.first_name, m.last_name, m.email, m.phone, m.notify_preference, m.locale
+                FROM reservations r
+                JOIN books b ON r.book_id = b.book_id
+                JOIN members m ON r.member_id = m.member_id
+                WHERE r.status = 'Ready' AND r.notified_at IS NULL AND r.reservation_id > ?
+                ORDER BY r.reservation_id
+                LIMIT ?
+            """, (last_id, self.chunk_size))
+            if not holds:
+                break
+            for hold in holds:
+                message = self.notifications.templates.render('hold_ready', {
+                    'member_name': f"{hold['first_name']} {hold['last_name']}".strip(),
+                    'book_title': hold['book_title'],
+                    'expires_on': hold['expires_at'],
+                }, hold['locale'])
+                queued += self._enqueue_message(hold['member_id'], hold['notify_preference'], hold['email'],
+                                                hold['phone'], message, 'hold_ready')
+            self.db.cursor.executemany(
+                "UPDATE reservations SET notified_at = datetime('now') WHERE reservation_id = ?",
+                [(hold['reservation_id'],) for hold in holds])
+            self.db.conn.commit()
+            last_id = holds[-1]['reservation_id']
+        return queued
+
+    def send_hold_notices(self, expire: bool = True) -> Dict:
+        """Lapse uncollected holds (passing their copies down the queue), tell
+        members whose holds are ready, and return this run's counts"""
+        expired = self.db.expire_reservations() if expire else 0
+        first_id = self._next_delivery_id()
+        queued = self.enqueue_hold_notices()
+        self.dispatch()
+        return dict(self.get_delivery_stats(first_id), queued=queued, expired=expired)
+
+    # ========== REPORTING ==========
+    def get_delivery_stats(self, since_id: int = 0) -> Dict:
+        """Delivery counts by channel and status, e.g. {'sms': {'sent': 10}}"""
+        self.db.cursor.execute("""
+            SELECT channel, status, COUNT(*) FROM notification_deliveries
+            WHERE delivery_id >= ?
+            GROUP BY channel, status
+        """, (since_id,))
+        stats: Dict[str, Dict[str, int]] = {}
+        for channel, status, count in self.db.cursor.fetchall():
+            stats.setdefault(channel, {})[status] = count
+        return stats
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue and deliver member notifications")
+    parser.add_argument("command", choices=["overdue", "holds", "dispatch", "stats", "announce"])
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--book-id", type=int, help="book to announce")
+    args = parser.parse_args()
+
+    notifier = BulkNotifier(args.db)
+    try:
+        if args.command == "overdue":
+            print(f"Queued {notifier.enqueue_reminders(notifier.db.get_overdue_books())} reminders")
+            print(notifier.dispatch())
+        elif args.command == "holds":
+            print(notifier.send_hold_notices())
+        elif args.command == "dispatch":
+            print(f"Requeued {notifier.requeue_stale()} interrupted deliveries")
+            print(notifier.dispatch())
+        elif args.command == "announce":
+            if args.book_id is None:
+                parser.error("announce needs --book-id")
+            print(notifier.announce_new_book(args.book_id))
+        else:
+            print(notifier.get_delivery_stats())
+    finally:
+        notifier.close()
+
+
+if __name__ == "__main__":
+    main()
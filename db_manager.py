@@ -3,87 +3,213 @@ Database Manager Module
 Handles all database operations for the Library Management System
 """
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+
+from author_utils import author_key, link_book_authors, name_tokens
+from duplicate_index import DEFAULT_THRESHOLD, cluster_duplicates, find_candidates, index_book, unindex_book
+from entity_cache import MISSING, LRUCache
+from isbn_utils import clean_isbn, to_isbn13
+from migrations import BARCODE_FORMAT, fold_ratings, insert_copies, migrate
+
+# The application issues around 60 distinct statements (more with the
+# migrations); leave headroom so the prepared-statement cache never evicts
+# the hot read queries
+STATEMENT_CACHE_SIZE = 256
+# Days a member has to collect a copy held for them before the hold lapses
+HOLD_PICKUP_DAYS = 3
+# Connection tunables by name, for DatabaseManager(profile=...); an empty
+# profile keeps SQLite's defaults. cache_size is in KiB when negative.
+PERFORMANCE_PROFILES = {
+    'default': {},
+    # A desk terminal with the database on its own disk. NORMAL skips the
+    # fsync after each journal write; a power cut can lose the last commit.
+    'desk': {'cache_size': -16000, 'mmap_size': 64 * 2**20, 'temp_store': 'MEMORY', 'synchronous': 'NORMAL'},
+    # library.db on a shared drive: memory-mapped I/O is not safe over
+    # network filesystems, and each page read is a round trip worth caching
+    'network': {'cache_size': -32000, 'mmap_size': 0, 'temp_store': 'MEMORY', 'synchronous': 'FULL'},
+    # Imports, migrations and maintenance jobs: room to sort indexes in memory
+    'maintenance': {'cache_size': -128000, 'mmap_size': 256 * 2**20, 'temp_store': 'MEMORY',
+                    'synchronous': 'NORMAL'},
+}
+# Rows sampled per index when statistics are refreshed on close
+OPTIMIZE_ANALYSIS_LIMIT = 400
+
+
+class Record(tuple):
+    """A result row: a plain tuple plus a column index shared by every row of
+    the same query, readable like the dicts returned previously
+    (row['title'], row.get('status'), dict(row), **row).
+
+    Unlike those dicts a Record is immutable, iterating it yields values
+    rather than column names, json.dumps writes it as a list, and it
+    compares equal to a tuple, never to a dict; use dict(row) for any of
+    those. Records pickle, so they can cross process boundaries.
+    """
+    __slots__ = ()
+    _columns: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default=None):
+        position = self._index.get(key)
+        return default if position is None else tuple.__getitem__(self, position)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self) -> tuple:
+        return tuple(self[key] for key in self._index)
+
+    def items(self):
+        return ((key, self[key]) for key in self._index)
+
+    def __repr__(self) -> str:
+        return f"Record({dict(self.items())!r})"
+
+    def __reduce__(self):
+        # The per-shape classes are built at run time and cannot be imported
+        # by name, so a pickled row is rebuilt from its columns and values
+        return _make_record, (self._columns, tuple(self))
+
+
+@lru_cache(maxsize=None)
+def record_class(columns: Tuple[str, ...]) -> type:
+    """The Record subclass for one result shape; duplicate names resolve to
+    the last column, as dict(sqlite3.Row) did"""
+    index = {name: position for position, name in enumerate(columns)}
+    return type('Record', (Record,), {'__slots__': (), '_columns': columns, '_index': index})
+
+
+def _make_record(columns: Tuple[str, ...], values: tuple) -> Record:
+    return record_class(columns)(values)
 
 
 class DatabaseManager:
-    def __init__(self, db_name: str = "library.db"):
+    def __init__(self, db_name: str = "library.db", cache_size: int = 1024, coordinate_cache: bool = True,
+                 cache_check_interval: float = 0.0, profile: str = None):
         self.db_name = db_name
-        self.conn = sqlite3.connect(db_name)
+        self.conn = sqlite3.connect(db_name, cached_statements=STATEMENT_CACHE_SIZE)
+        if profile:
+            self.apply_profile(profile)
         self.conn.row_factory = sqlite3.Row  # Enable column access by name
         self.cursor = self.conn.cursor()
+        # Read queries skip sqlite3.Row and build Records straight from tuples
+        self.reader = self.conn.cursor()
+        self.reader.row_factory = None
+        # get_book/get_member results, invalidated by this manager's own
+        # writes; with coordinate_cache, flushed whenever another connection
+        # (in this or another process) has committed, per PRAGMA data_version.
+        # The check reads the file header, so it can be limited to once per
+        # cache_check_interval seconds where slightly stale reads are fine.
+        self.book_cache = LRUCache(cache_size)
+        self.member_cache = LRUCache(cache_size)
+        self.coordinate_cache = coordinate_cache
+        self.cache_check_interval = cache_check_interval
+        self._data_version = None
+        self._data_version_checked = 0.0
         self.create_tables()
 
-    def create_tables(self):
-        """Create all required tables if they don't exist"""
-        # Books Table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS books (
-                book_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                isbn TEXT UNIQUE,
-                title TEXT NOT NULL,
-                author TEXT NOT NULL,
-                publisher TEXT,
-                publication_year INTEGER,
-                category TEXT,
-                description TEXT,
-                cover_image_url TEXT,
-                page_count INTEGER,
-                language TEXT,
-                total_copies INTEGER DEFAULT 1,
-                available_copies INTEGER DEFAULT 1,
-                shelf_location TEXT
-            )
-        """)
+    def _fetch_all(self, query: str, params: tuple = ()) -> List[Record]:
+        self.reader.execute(query, params)
+        make = record_class(tuple(d[0] for d in self.reader.description))
+        # Build Records as rows are fetched, without an intermediate tuple list
+        self.reader.row_factory = lambda cursor, row: make(row)
+        try:
+            return self.reader.fetchall()
+        finally:
+            self.reader.row_factory = None
 
-        # Members Table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS members (
-                member_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                membership_number TEXT UNIQUE,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                email TEXT UNIQUE,
-                phone TEXT,
-                address TEXT,
-                join_date DATE,
-                membership_type TEXT,
-                status TEXT DEFAULT 'Active'
-            )
-        """)
+    def _fetch_one(self, query: str, params: tuple = ()) -> Optional[Record]:
+        self.reader.execute(query, params)
+        row = self.reader.fetchone()
+        return record_class(tuple(d[0] for d in self.reader.description))(row) if row else None
 
-        # Transactions Table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                member_id INTEGER,
-                book_id INTEGER,
-                issue_date DATE,
-                due_date DATE,
-                return_date DATE,
-                fine_amount REAL DEFAULT 0,
-                status TEXT DEFAULT 'Issued',
-                FOREIGN KEY(member_id) REFERENCES members(member_id),
-                FOREIGN KEY(book_id) REFERENCES books(book_id)
-            )
-        """)
+    def _sync_caches(self):
+        """Flush the entity caches if another connection committed since the last read"""
+        if not self.coordinate_cache:
+            return
+        if self.cache_check_interval:
+            now = time.monotonic()
+            if now - self._data_version_checked < self.cache_check_interval:
+                return
+            self._data_version_checked = now
+        self.reader.execute("PRAGMA data_version")
+        version = self.reader.fetchone()[0]
+        if version != self._data_version:
+            self.book_cache.clear()
+            self.member_cache.clear()
+            self._data_version = version
+
+    def _cached_get(self, cache: LRUCache, query: str, key: int) -> Optional[Record]:
+        self._sync_caches()
+        row = cache.get(key)
+        if row is MISSING:
+            row = self._fetch_one(query, (key,))
+            # Misses are not cached: an id that does not exist yet may be added
+            if row is not None:
+                cache.put(key, row)
+        return row
+
+    def get_cache_stats(self) -> Dict[str, Dict]:
+        """Hit rate and size of the book and member caches"""
+        return {'books': self.book_cache.stats(), 'members': self.member_cache.stats()}
+
+    def apply_profile(self, name: str):
+        """Set this connection's tunables from PERFORMANCE_PROFILES[name]"""
+        if name not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown performance profile {name!r}; choose from {', '.join(PERFORMANCE_PROFILES)}")
+        for pragma, value in PERFORMANCE_PROFILES[name].items():
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+
+    def get_pragmas(self) -> Dict:
+        """The connection's current values of the profile tunables, and the journal mode"""
+        pragmas = {}
+        for pragma in ('cache_size', 'mmap_size', 'temp_store', 'synchronous', 'journal_mode'):
+            row = self.conn.execute(f"PRAGMA {pragma}").fetchone()
+            pragmas[pragma] = row[0] if row else None
+        return pragmas
 
-        # Book Reviews Table
+    def create_tables(self):
+        """Bring the schema up to date by applying any pending migrations"""
+        migrate(self.conn)
+        self.refresh_history_view()
+        self.conn.commit()
+
+    def refresh_history_view(self):
+        """(Re)build transactions_history over the hot table and any yearly archives"""
+        self.cursor.execute("PRAGMA table_info(transactions)")
+        columns = [row[1] for row in self.cursor.fetchall()]
         self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS book_reviews (
-                review_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                book_id INTEGER,
-                member_id INTEGER,
-                rating INTEGER NOT NULL CHECK(rating >= 1 AND rating <= 5),
-                review_text TEXT,
-                review_date DATE,
-                FOREIGN KEY(book_id) REFERENCES books(book_id),
-                FOREIGN KEY(member_id) REFERENCES members(member_id)
-            )
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name LIKE 'transactions_archive_%'
+            ORDER BY name
         """)
+        tables = ['transactions'] + [row[0] for row in self.cursor.fetchall()]
+        selects = []
+        for table in tables:
+            self.cursor.execute(f"PRAGMA table_info({table})")
+            present = {row[1] for row in self.cursor.fetchall()}
+            # An archive written before a column was added reads it as NULL
+            selects.append(f"SELECT {', '.join(c if c in present else f'NULL AS {c}' for c in columns)} FROM {table}")
+        select = '\n UNION ALL '.join(selects)
+        view_sql = f"CREATE VIEW transactions_history AS {select}"
 
-        self.conn.commit()
+        # Only touch the schema when the definition actually changed
+        self.cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'transactions_history'")
+        row = self.cursor.fetchone()
+        if not row or row[0] != view_sql:
+            self.cursor.execute("DROP VIEW IF EXISTS transactions_history")
+            self.cursor.execute(view_sql)
 
     # ========== BOOK OPERATIONS ==========
     def add_book(self, book_data: Dict) -> int:
@@ -93,8 +219,8 @@ class DatabaseManager:
                 INSERT INTO books (
                     isbn, title, author, publisher, publication_year, category,
                     description, cover_image_url, page_count, language,
-                    total_copies, available_copies, shelf_location
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    total_copies, available_copies, shelf_location, isbn13
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 book_data.get('isbn'),
                 book_data.get('title', ''),
@@ -108,15 +234,36 @@ class DatabaseManager:
                 book_data.get('language', ''),
                 book_data.get('total_copies', 1),
                 book_data.get('available_copies', book_data.get('total_copies', 1)),
-                book_data.get('shelf_location', '')
+                book_data.get('shelf_location', ''),
+                to_isbn13(book_data.get('isbn')) or ''
             ))
+            book_id = self.cursor.lastrowid
+            link_book_authors(self.cursor, book_id, book_data.get('author', ''))
+            index_book(self.cursor, book_id, book_data.get('title', ''), book_data.get('author', ''))
+            insert_copies(self.cursor, book_id - 1)
             self.conn.commit()
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError:
-            raise ValueError("Book with this ISBN already exists")
+            return book_id
+        except sqlite3.IntegrityError as e:
+            self.conn.rollback()
+            if 'copies.barcode' in str(e):
+                # A copy added by hand took a barcode in the generated format
+                raise ValueError("A barcode generated for this book's copies is already in use; "
+                                 "add the book with no copies and add them with their own barcodes")
+            elif 'isbn' in str(e):
+                raise ValueError("Book with this ISBN already exists")
+            raise ValueError(f"Could not add book: {e}")
 
     def update_book(self, book_id: int, book_data: Dict):
-        """Update book information"""
+        """Update book information. A new total_copies adds shelf copies or
+        withdraws copies from the shelf; available_copies always follows the
+        copies and cannot be set directly."""
+        if book_data.get('isbn') is not None:
+            book_data = dict(book_data, isbn13=to_isbn13(book_data['isbn']) or '')
+        total_copies = book_data.get('total_copies')
+        book_data = {key: value for key, value in book_data.items()
+                     if key not in ('total_copies', 'available_copies')}
+        if total_copies is not None:
+            self._resize_copies(book_id, total_copies)
         fields = []
         values = []
         for key, value in book_data.items():
@@ -126,45 +273,90 @@ class DatabaseManager:
         values.append(book_id)
         
         if fields:
+            reindex = book_data.get('title') is not None or book_data.get('author') is not None
+            if reindex:
+                self.cursor.execute("SELECT title, author FROM books WHERE book_id = ?", (book_id,))
+                old = self.cursor.fetchone()
             query = f"UPDATE books SET {', '.join(fields)} WHERE book_id = ?"
             self.cursor.execute(query, values)
-            self.conn.commit()
+            if book_data.get('author') is not None:
+                link_book_authors(self.cursor, book_id, book_data['author'])
+            if reindex and old:
+                self._reindex_title(book_id, old[0], old[1], book_data)
+            if book_data.get('category') is not None:
+                self.cursor.execute("UPDATE book_ratings SET category = ? WHERE book_id = ?",
+                                    (book_data['category'], book_id))
+        self.conn.commit()
+        self.book_cache.invalidate(book_id)
 
     def get_book(self, book_id: int) -> Optional[Dict]:
         """Get book by ID"""
-        self.cursor.execute("SELECT * FROM books WHERE book_id = ?", (book_id,))
-        row = self.cursor.fetchone()
-        return dict(row) if row else None
+        return self._cached_get(self.book_cache, "SELECT * FROM books WHERE book_id = ?", book_id)
+
+    def get_book_by_isbn(self, isbn: str) -> Optional[Dict]:
+        """Get book by ISBN-10 or ISBN-13 (in any formatting)"""
+        isbn13 = to_isbn13(isbn)
+        if isbn13:
+            return self._fetch_one("SELECT * FROM books WHERE isbn13 = ? AND isbn13 != ''", (isbn13,))
+        return self._fetch_one("SELECT * FROM books WHERE isbn = ?", (clean_isbn(isbn) or isbn,))
 
     def search_books(self, search_term: str = "", search_by: str = "title") -> List[Dict]:
         """Search books by title, author, ISBN, or category"""
         if search_by == "title":
             query = "SELECT * FROM books WHERE title LIKE ?"
         elif search_by == "author":
-            query = "SELECT * FROM books WHERE author LIKE ?"
+            return self._search_by_author(search_term)
         elif search_by == "isbn":
+            # A complete ISBN resolves through the isbn13 index
+            book = self.get_book_by_isbn(search_term) if to_isbn13(search_term) else None
+            if book:
+                return [book]
             query = "SELECT * FROM books WHERE isbn LIKE ?"
         elif search_by == "category":
             query = "SELECT * FROM books WHERE category LIKE ?"
         else:
             query = "SELECT * FROM books WHERE title LIKE ? OR author LIKE ? OR isbn LIKE ?"
-            self.cursor.execute(query, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-            rows = self.cursor.fetchall()
-            return [dict(row) for row in rows]
+            return self._fetch_all(query, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
         
-        self.cursor.execute(query, (f"%{search_term}%",))
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+        return self._fetch_all(query, (f"%{search_term}%",))
 
     def get_all_books(self) -> List[Dict]:
         """Get all books"""
-        self.cursor.execute("SELECT * FROM books")
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+        return self._fetch_all("SELECT * FROM books")
+
+    def find_similar_books(self, title: str, author: str = "", threshold: float = DEFAULT_THRESHOLD,
+                           limit: int = 5, exclude: int = None) -> List[Dict]:
+        """Likely duplicates of a title and author (e.g. before adding a book
+        without an ISBN), each with its 'similarity' (0-1), most similar first"""
+        matches = find_candidates(self.reader, title, author, threshold, limit, exclude)
+        books = []
+        for book_id, score in matches:
+            book = self.get_book(book_id)
+            if book:
+                books.append(dict(book, similarity=score))
+        return books
+
+    def get_duplicate_clusters(self, threshold: float = DEFAULT_THRESHOLD) -> Iterator[List[Dict]]:
+        """Groups of books that look like the same title catalogued more than
+        once, for review; each book carries its similarity to the group's first"""
+        for cluster in cluster_duplicates(self.conn, threshold):
+            books = []
+            for book_id, score in cluster:
+                book = self._fetch_one("SELECT * FROM books WHERE book_id = ?", (book_id,))
+                if book:
+                    books.append(dict(book, similarity=score))
+            yield books
+
+    def _reindex_title(self, book_id: int, old_title: str, old_author: str, changes: Dict):
+        """Move a book's near-duplicate buckets after its title or author changed"""
+        title = changes['title'] if changes.get('title') is not None else old_title
+        author = changes['author'] if changes.get('author') is not None else old_author
+        unindex_book(self.cursor, book_id, old_title, old_author)
+        index_book(self.cursor, book_id, title, author)
 
     def get_popular_books(self, limit: int = 5) -> List[Dict]:
         """Get most borrowed books"""
-        self.cursor.execute("""
+        return self._fetch_all("""
             SELECT b.*, COUNT(t.transaction_id) as borrow_count
             FROM books b
             LEFT JOIN transactions t ON b.book_id = t.book_id
@@ -172,8 +364,66 @@ class DatabaseManager:
             ORDER BY borrow_count DESC
             LIMIT ?
         """, (limit,))
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+
+    # ========== AUTHORS ==========
+    def _search_by_author(self, search_term: str) -> List[Dict]:
+        """Books by authors having a name word starting with each word of the
+        search term ('tolk' or 'j tolkien' find 'J.R.R. Tolkien'), resolved
+        through author_tokens and book_authors rather than a LIKE scan"""
+        tokens = name_tokens(author_key(search_term))
+        if not tokens:
+            return self.get_all_books()
+        # '\uffff' sorts after any character a key can hold, bounding the prefix range
+        matches = " INTERSECT ".join(
+            "SELECT author_id FROM author_tokens WHERE token >= ? AND token < ?" for _ in tokens)
+        params = tuple(bound for token in tokens for bound in (token, token + '\uffff'))
+        return self._fetch_all(f"""
+            SELECT * FROM books WHERE book_id IN (
+                SELECT book_id FROM book_authors WHERE author_id IN ({matches})
+            )
+        """, params)
+
+    def find_author(self, name: str) -> Optional[Dict]:
+        """Author by name, ignoring case, accents and punctuation"""
+        key = author_key(name)
+        return self._fetch_one("SELECT * FROM authors WHERE name_key = ?", (key,)) if key else None
+
+    def get_author(self, author_id: int) -> Optional[Dict]:
+        return self._fetch_one("SELECT * FROM authors WHERE author_id = ?", (author_id,))
+
+    def get_book_authors(self, book_id: int) -> List[Dict]:
+        """A book's authors in credited order"""
+        return self._fetch_all("""
+            SELECT a.* FROM book_authors ba
+            JOIN authors a ON a.author_id = ba.author_id
+            WHERE ba.book_id = ?
+            ORDER BY ba.position
+        """, (book_id,))
+
+    def get_author_books(self, author_id: int) -> List[Dict]:
+        """Every book credited to an author"""
+        return self._fetch_all("""
+            SELECT b.* FROM book_authors ba
+            JOIN books b ON b.book_id = ba.book_id
+            WHERE ba.author_id = ?
+            ORDER BY b.publication_year, b.title
+        """, (author_id,))
+
+    def save_author_info(self, author_id: int, info: Optional[Dict]):
+        """Store looked-up author details, or record that the lookup found nothing"""
+        fetched_at = datetime.now().isoformat(timespec='seconds')
+        if info:
+            self.cursor.execute("""
+                UPDATE authors SET ol_key = ?, birth_date = ?, death_date = ?, top_work = ?,
+                    work_count = ?, info_status = 'found', info_fetched_at = ?
+                WHERE author_id = ?
+            """, (info.get('ol_key', ''), info.get('birth_date', ''), info.get('death_date', ''),
+                  info.get('top_work', ''), info.get('work_count', 0), fetched_at, author_id))
+        else:
+            self.cursor.execute("""
+                UPDATE authors SET info_status = 'missing', info_fetched_at = ? WHERE author_id = ?
+            """, (fetched_at, author_id))
+        self.conn.commit()
 
     # ========== MEMBER OPERATIONS ==========
     def add_member(self, member_data: Dict) -> int:
@@ -182,8 +432,8 @@ class DatabaseManager:
             self.cursor.execute("""
                 INSERT INTO members (
                     membership_number, first_name, last_name, email, phone,
-                    address, join_date, membership_type, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    address, join_date, membership_type, status, notify_preference, locale
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 member_data.get('membership_number'),
                 member_data.get('first_name', ''),
@@ -193,7 +443,9 @@ class DatabaseManager:
                 member_data.get('address', ''),
                 member_data.get('join_date', datetime.now().date().isoformat()),
                 member_data.get('membership_type', 'Standard'),
-                member_data.get('status', 'Active')
+                member_data.get('status', 'Active'),
+                member_data.get('notify_preference', 'email'),
+                member_data.get('locale', 'en')
             ))
             self.conn.commit()
             return self.cursor.lastrowid
@@ -218,67 +470,121 @@ class DatabaseManager:
             query = f"UPDATE members SET {', '.join(fields)} WHERE member_id = ?"
             self.cursor.execute(query, values)
             self.conn.commit()
+            self.member_cache.invalidate(member_id)
 
     def get_member(self, member_id: int) -> Optional[Dict]:
         """Get member by ID"""
-        self.cursor.execute("SELECT * FROM members WHERE member_id = ?", (member_id,))
-        row = self.cursor.fetchone()
-        return dict(row) if row else None
+        return self._cached_get(self.member_cache, "SELECT * FROM members WHERE member_id = ?", member_id)
 
     def get_member_by_email(self, email: str) -> Optional[Dict]:
         """Get member by email"""
-        self.cursor.execute("SELECT * FROM members WHERE email = ?", (email,))
-        row = self.cursor.fetchone()
-        return dict(row) if row else None
+        return self._fetch_one("SELECT * FROM members WHERE email = ?", (email,))
 
     def get_all_members(self) -> List[Dict]:
         """Get all members"""
-        self.cursor.execute("SELECT * FROM members")
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+        return self._fetch_all("SELECT * FROM members")
+
+    def iter_members(self, batch_size: int = 500, status: str = 'Active') -> Iterator[List[Dict]]:
+        """Members in member_id order, one batch at a time, so bulk jobs hold
+        at most `batch_size` rows whatever the member count"""
+        last_id = 0
+        while True:
+            batch = self._fetch_all("""
+                SELECT * FROM members
+                WHERE member_id > ? AND (? IS NULL OR status = ?)
+                ORDER BY member_id
+                LIMIT ?
+            """, (last_id, status, status, batch_size))
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1]['member_id']
 
     def get_member_borrowing_history(self, member_id: int) -> List[Dict]:
-        """Get borrowing history for a member"""
-        self.cursor.execute("""
+        """Get borrowing history for a member, including archived loans"""
+        return self._fetch_all("""
             SELECT t.*, b.title, b.author, b.isbn
-            FROM transactions t
+            FROM transactions_history t
             JOIN books b ON t.book_id = b.book_id
             WHERE t.member_id = ?
             ORDER BY t.issue_date DESC
         """, (member_id,))
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
 
     # ========== TRANSACTION OPERATIONS ==========
-    def issue_book(self, member_id: int, book_id: int, issue_date: str = None, due_date: str = None) -> int:
-        """Issue a book to a member"""
+    def issue_book(self, member_id: int, book_id: int = None, issue_date: str = None, due_date: str = None,
+                   barcode: str = None) -> int:
+        """Issue a book to a member: the scanned copy (`barcode`), else the
+        copy held for the member, else any copy on the shelf"""
         if issue_date is None:
             issue_date = datetime.now().date().isoformat()
         if due_date is None:
             due_date = (datetime.now().date() + timedelta(days=14)).isoformat()
-        
-        # Check if book is available
-        book = self.get_book(book_id)
-        if not book or book['available_copies'] <= 0:
-            raise ValueError("Book is not available")
-        
+
+        copy = None
+        if barcode is not None:
+            copy = self._copy_by_barcode(barcode)
+            if book_id is not None and copy['book_id'] != book_id:
+                raise ValueError("This copy belongs to a different book")
+            book_id = copy['book_id']
+        elif book_id is None:
+            raise ValueError("Give a book or a copy barcode")
+
+        self.cursor.execute("""
+            SELECT reservation_id, copy_id FROM reservations
+            WHERE member_id = ? AND book_id = ? AND status = 'Ready'
+        """, (member_id, book_id))
+        hold = self.cursor.fetchone()
+        if hold:
+            self.cursor.execute("UPDATE reservations SET status = 'Fulfilled' WHERE reservation_id = ?",
+                                (hold[0],))
+        if hold and (copy is None or copy['copy_id'] == hold[1]):
+            # The copy set aside for this member was taken off the shelf
+            # count when the hold became ready
+            copy_id = hold[1]
+            self.cursor.execute("UPDATE copies SET status = 'On Loan' WHERE copy_id = ?", (copy_id,))
+        else:
+            copy_id = self._take_copy(book_id, copy)
+            if hold:
+                # Another copy was scanned; the one on the hold shelf moves on
+                self._allocate_copy(book_id, hold[1], issue_date)
+
         # Create transaction
         self.cursor.execute("""
-            INSERT INTO transactions (member_id, book_id, issue_date, due_date, status)
-            VALUES (?, ?, ?, ?, 'Issued')
-        """, (member_id, book_id, issue_date, due_date))
-        
-        # Update available copies
+            INSERT INTO transactions (member_id, book_id, issue_date, due_date, status, copy_id)
+            VALUES (?, ?, ?, ?, 'Issued', ?)
+        """, (member_id, book_id, issue_date, due_date, copy_id))
+        transaction_id = self.cursor.lastrowid
+
+        self.conn.commit()
+        self.book_cache.invalidate(book_id)
+        return transaction_id
+
+    def _take_copy(self, book_id: int, copy: Optional[Dict] = None) -> int:
+        """Mark the given (or any) shelf copy of a book as on loan; rolls back
+        and raises if none is on the shelf. Returns its copy_id."""
+        # Availability is checked in the UPDATEs themselves rather than
+        # against a (possibly cached) earlier read
+        if copy is not None:
+            copy_id = copy['copy_id']
+        else:
+            self.cursor.execute("SELECT copy_id FROM copies WHERE book_id = ? AND status = 'Available' LIMIT 1",
+                                (book_id,))
+            row = self.cursor.fetchone()
+            copy_id = row[0] if row else None
+        if copy_id is not None:
+            self.cursor.execute("UPDATE copies SET status = 'On Loan' WHERE copy_id = ? AND status = 'Available'",
+                                (copy_id,))
+        if copy_id is None or self.cursor.rowcount == 0:
+            self.conn.rollback()
+            raise ValueError("Copy is not available" if copy is not None else "Book is not available")
         self.cursor.execute("""
-            UPDATE books SET available_copies = available_copies - 1
-            WHERE book_id = ?
+            UPDATE books SET available_copies = MAX(available_copies - 1, 0) WHERE book_id = ?
         """, (book_id,))
-        
-        self.conn.commit()
-        return self.cursor.lastrowid
+        return copy_id
 
-    def return_book(self, transaction_id: int, return_date: str = None, fine_amount: float = 0):
-        """Return a book and calculate fine"""
+    def return_book(self, transaction_id: int, return_date: str = None, fine_amount: float = 0) -> Optional[int]:
+        """Return a book and calculate fine. The copy goes to the book's next
+        waiting hold if there is one; returns that reservation's id, or None"""
         if return_date is None:
             return_date = datetime.now().date().isoformat()
         
@@ -290,24 +596,38 @@ class DatabaseManager:
         
         txn_dict = dict(txn)
         
-        # Update transaction
+        # Update transaction; a loan already returned (e.g. at another desk)
+        # must not free its copy twice
         self.cursor.execute("""
             UPDATE transactions
             SET return_date = ?, fine_amount = ?, status = 'Returned'
-            WHERE transaction_id = ?
+            WHERE transaction_id = ? AND (return_date IS NULL OR return_date = '')
         """, (return_date, fine_amount, transaction_id))
-        
-        # Update available copies
-        self.cursor.execute("""
-            UPDATE books SET available_copies = available_copies + 1
-            WHERE book_id = ?
-        """, (txn_dict['book_id'],))
-        
+        if self.cursor.rowcount == 0:
+            self.conn.rollback()
+            raise ValueError("Book already returned")
+
+        # Hand the copy to the next hold, or back to the shelf
+        reservation_id = self._allocate_copy(txn_dict['book_id'], txn_dict.get('copy_id'), return_date)
+
         self.conn.commit()
+        self.book_cache.invalidate(txn_dict['book_id'])
+        return reservation_id
+
+    def get_loan_by_barcode(self, barcode: str) -> Optional[Dict]:
+        """The open loan of a scanned copy, with book title and member name"""
+        copy = self._copy_by_barcode(barcode)
+        return self._fetch_one("""
+            SELECT t.*, b.title as book_title, m.first_name || ' ' || m.last_name as member_name
+            FROM transactions t
+            JOIN books b ON t.book_id = b.book_id
+            JOIN members m ON t.member_id = m.member_id
+            WHERE t.copy_id = ? AND t.return_date IS NULL
+        """, (copy['copy_id'],))
 
     def get_all_transactions(self) -> List[Dict]:
         """Get all transactions with book and member details"""
-        self.cursor.execute("""
+        return self._fetch_all("""
             SELECT t.*, b.title as book_title, b.author,
                    m.first_name || ' ' || m.last_name as member_name, m.email
             FROM transactions t
@@ -315,26 +635,23 @@ class DatabaseManager:
             JOIN members m ON t.member_id = m.member_id
             ORDER BY t.issue_date DESC
         """)
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
 
     def get_overdue_books(self) -> List[Dict]:
         """Get all overdue books"""
         today = datetime.now().date().isoformat()
-        self.cursor.execute("""
+        return self._fetch_all("""
             SELECT t.*, b.title as book_title, b.author,
-                   m.first_name || ' ' || m.last_name as member_name, m.email, m.phone
+                   m.first_name || ' ' || m.last_name as member_name, m.email, m.phone,
+                   m.notify_preference, m.locale
             FROM transactions t
             JOIN books b ON t.book_id = b.book_id
             JOIN members m ON t.member_id = m.member_id
             WHERE t.status = 'Issued' AND t.due_date < ? AND t.return_date IS NULL
         """, (today,))
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
 
     def get_recent_transactions(self, limit: int = 10) -> List[Dict]:
         """Get recent transactions"""
-        self.cursor.execute("""
+        return self._fetch_all("""
             SELECT t.*, b.title as book_title,
                    m.first_name || ' ' || m.last_name as member_name
             FROM transactions t
@@ -343,30 +660,362 @@ class DatabaseManager:
             ORDER BY t.issue_date DESC
             LIMIT ?
         """, (limit,))
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+
+    # ========== COPIES ==========
+    def _copy_by_barcode(self, barcode: str) -> Dict:
+        copy = self._fetch_one("SELECT * FROM copies WHERE barcode = ?", ((barcode or '').strip(),))
+        if not copy:
+            raise ValueError("No copy with this barcode")
+        return copy
+
+    def get_copy(self, barcode: str) -> Optional[Dict]:
+        """A copy by barcode, with its book's title"""
+        return self._fetch_one("""
+            SELECT c.*, b.title as book_title FROM copies c
+            JOIN books b ON c.book_id = b.book_id
+            WHERE c.barcode = ?
+        """, ((barcode or '').strip(),))
+
+    def get_book_copies(self, book_id: int) -> List[Dict]:
+        return self._fetch_all("SELECT * FROM copies WHERE book_id = ? ORDER BY copy_id", (book_id,))
+
+    def add_copy(self, book_id: int, barcode: str = None, shelf_location: str = None) -> str:
+        """Add one shelf copy (with a generated barcode unless one is given); returns the barcode"""
+        book = self.get_book(book_id)
+        if not book:
+            raise ValueError("Book not found")
+        try:
+            barcode = self._insert_copy(book_id, barcode, shelf_location or book['shelf_location'])
+            self.cursor.execute("""
+                UPDATE books SET total_copies = total_copies + 1, available_copies = available_copies + 1
+                WHERE book_id = ?
+            """, (book_id,))
+            self.conn.commit()
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            raise ValueError("A copy with this barcode already exists")
+        self.book_cache.invalidate(book_id)
+        return barcode
+
+    def withdraw_copy(self, barcode: str, status: str = 'Withdrawn'):
+        """Take a copy out of stock as 'Withdrawn' or 'Lost'"""
+        if status not in ('Withdrawn', 'Lost'):
+            raise ValueError("Status must be 'Withdrawn' or 'Lost'")
+        copy = self._copy_by_barcode(barcode)
+        if copy['status'] in ('Withdrawn', 'Lost'):
+            raise ValueError("Copy is already out of stock")
+        if copy['status'] == 'On Hold':
+            raise ValueError("Copy is on the hold shelf; cancel the hold first")
+        on_shelf = copy['status'] == 'Available'
+        self.cursor.execute("UPDATE copies SET status = ? WHERE copy_id = ?", (status, copy['copy_id']))
+        self.cursor.execute("""
+            UPDATE books SET total_copies = MAX(total_copies - 1, 0),
+                available_copies = MAX(available_copies - ?, 0)
+            WHERE book_id = ?
+        """, (1 if on_shelf else 0, copy['book_id']))
+        self.conn.commit()
+        self.book_cache.invalidate(copy['book_id'])
+
+    def _insert_copy(self, book_id: int, barcode: str, shelf_location: str) -> str:
+        if not barcode:
+            self.cursor.execute("SELECT COUNT(*) FROM copies WHERE book_id = ?", (book_id,))
+            number = self.cursor.fetchone()[0] + 1
+            while True:
+                barcode = BARCODE_FORMAT % (book_id, number)
+                self.cursor.execute("SELECT 1 FROM copies WHERE barcode = ?", (barcode,))
+                if self.cursor.fetchone() is None:
+                    break
+                number += 1
+        self.cursor.execute("INSERT INTO copies (barcode, book_id, shelf_location) VALUES (?, ?, ?)",
+                            (barcode, book_id, shelf_location))
+        return barcode
+
+    def _resize_copies(self, book_id: int, total_copies: int) -> bool:
+        """Add or withdraw shelf copies so the book has `total_copies` in
+        stock, updating both counters; the caller commits. False if there
+        is no such book."""
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM copies
+            WHERE book_id = ? AND status NOT IN ('Lost', 'Withdrawn')
+        """, (book_id,))
+        in_stock = self.cursor.fetchone()[0]
+        self.cursor.execute("SELECT shelf_location FROM books WHERE book_id = ?", (book_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return False
+        change = total_copies - in_stock
+        if change > 0:
+            for _ in range(change):
+                self._insert_copy(book_id, None, row[0])
+        elif change < 0:
+            self.cursor.execute("""
+                UPDATE copies SET status = 'Withdrawn'
+                WHERE copy_id IN (SELECT copy_id FROM copies WHERE book_id = ? AND status = 'Available'
+                                  ORDER BY copy_id DESC LIMIT ?)
+            """, (book_id, -change))
+            if self.cursor.rowcount < -change:
+                self.conn.rollback()
+                raise ValueError("Not enough copies on the shelf to withdraw; return some first")
+        self.cursor.execute("""
+            UPDATE books SET total_copies = ?,
+                available_copies = (SELECT COUNT(*) FROM copies WHERE book_id = ? AND status = 'Available')
+            WHERE book_id = ?
+        """, (total_copies, book_id, book_id))
+        return True
+
+    def reconcile_copies(self, fix: bool = False) -> Dict:
+        """Check the books counters against the copies table in one grouped
+        pass over the (book_id, status) index.
+
+        Returns the books whose total_copies or available_copies disagree
+        with their copies, and the number of open loans not pointing at an
+        on-loan copy. With fix, the counters are reset from the copies.
+        """
+        mismatched = self._fetch_all("""
+            SELECT b.book_id, b.title, b.total_copies, b.available_copies,
+                   COALESCE(c.in_stock, 0) AS copies_in_stock, COALESCE(c.on_shelf, 0) AS copies_on_shelf
+            FROM books b
+            LEFT JOIN (
+                SELECT book_id, SUM(status NOT IN ('Lost', 'Withdrawn')) AS in_stock,
+                       SUM(status = 'Available') AS on_shelf
+                FROM copies GROUP BY book_id
+            ) c ON c.book_id = b.book_id
+            WHERE b.total_copies IS NOT COALESCE(c.in_stock, 0)
+               OR b.available_copies IS NOT COALESCE(c.on_shelf, 0)
+        """)
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM transactions t
+            LEFT JOIN copies c ON c.copy_id = t.copy_id
+            WHERE t.return_date IS NULL AND t.status = 'Issued' AND (c.status IS NULL OR c.status != 'On Loan')
+        """)
+        unlinked_loans = self.cursor.fetchone()[0]
+        if fix and mismatched:
+            self.cursor.executemany("UPDATE books SET total_copies = ?, available_copies = ? WHERE book_id = ?",
+                                    [(row['copies_in_stock'], row['copies_on_shelf'], row['book_id'])
+                                     for row in mismatched])
+            self.conn.commit()
+            for row in mismatched:
+                self.book_cache.invalidate(row['book_id'])
+        return {'mismatched': mismatched, 'unlinked_loans': unlinked_loans}
+
+    # ========== RESERVATIONS ==========
+    def reserve_book(self, member_id: int, book_id: int) -> int:
+        """Put a member at the back of a book's hold queue"""
+        book = self.get_book(book_id)
+        if not book:
+            raise ValueError("Book not found")
+        if book['available_copies'] > 0:
+            raise ValueError("Book is available; issue it instead")
+        try:
+            self.cursor.execute("INSERT INTO reservations (book_id, member_id) VALUES (?, ?)",
+                                (book_id, member_id))
+            self.conn.commit()
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            raise ValueError("Member already has a hold on this book")
+        return self.cursor.lastrowid
+
+    def cancel_reservation(self, reservation_id: int):
+        """Cancel a hold; a copy already set aside passes to the next in line"""
+        reservation = self.get_reservation(reservation_id)
+        if not reservation or reservation['status'] not in ('Waiting', 'Ready'):
+            raise ValueError("No open hold with this ID")
+        self.cursor.execute("UPDATE reservations SET status = 'Cancelled' WHERE reservation_id = ?",
+                            (reservation_id,))
+        if reservation['status'] == 'Ready':
+            self._allocate_copy(reservation['book_id'], reservation['copy_id'])
+        self.conn.commit()
+        self.book_cache.invalidate(reservation['book_id'])
+
+    def _allocate_copy(self, book_id: int, copy_id: int = None, today: str = None) -> Optional[int]:
+        """Give a freed copy to the oldest waiting hold (one seek on the queue
+        index however long the queue), else put it back on the shelf; the
+        caller commits. Returns the reservation now ready, if any."""
+        self.cursor.execute("""
+            SELECT reservation_id FROM reservations
+            WHERE book_id = ? AND status = 'Waiting'
+            ORDER BY reservation_id
+            LIMIT 1
+        """, (book_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            if copy_id is not None:
+                self.cursor.execute("UPDATE copies SET status = 'Available' WHERE copy_id = ?", (copy_id,))
+            self.cursor.execute("UPDATE books SET available_copies = available_copies + 1 WHERE book_id = ?",
+                                (book_id,))
+            return None
+        ready = date.fromisoformat(today) if today else datetime.now().date()
+        if copy_id is not None:
+            self.cursor.execute("UPDATE copies SET status = 'On Hold' WHERE copy_id = ?", (copy_id,))
+        self.cursor.execute("""
+            UPDATE reservations SET status = 'Ready', ready_at = ?, expires_at = ?, copy_id = ?
+            WHERE reservation_id = ?
+        """, (ready.isoformat(), (ready + timedelta(days=HOLD_PICKUP_DAYS)).isoformat(), copy_id, row[0]))
+        return row[0]
+
+    def expire_reservations(self, today: str = None, batch_size: int = 500) -> int:
+        """Lapse ready holds not collected by their expiry date, passing each
+        copy on to the next hold; returns the number expired"""
+        today = today or datetime.now().date().isoformat()
+        expired = 0
+        while True:
+            self.cursor.execute("""
+                SELECT reservation_id, book_id, copy_id FROM reservations
+                WHERE status = 'Ready' AND expires_at < ?
+                ORDER BY expires_at
+                LIMIT ?
+            """, (today, batch_size))
+            rows = self.cursor.fetchall()
+            if not rows:
+                break
+            for reservation_id, book_id, copy_id in rows:
+                self.cursor.execute("UPDATE reservations SET status = 'Expired' WHERE reservation_id = ?",
+                                    (reservation_id,))
+                self._allocate_copy(book_id, copy_id, today)
+                self.book_cache.invalidate(book_id)
+            self.conn.commit()
+            expired += len(rows)
+        return expired
+
+    def get_reservation(self, reservation_id: int) -> Optional[Dict]:
+        return self._fetch_one("SELECT * FROM reservations WHERE reservation_id = ?", (reservation_id,))
+
+    def get_ready_reservation(self, member_id: int, book_id: int) -> Optional[Dict]:
+        """The copy of a book being held for a member, if any"""
+        return self._fetch_one("""
+            SELECT * FROM reservations WHERE member_id = ? AND book_id = ? AND status = 'Ready'
+        """, (member_id, book_id))
+
+    def get_book_holds(self, book_id: int) -> List[Dict]:
+        """Open holds on a book, ready ones first, then the queue in order"""
+        return self._fetch_all("""
+            SELECT r.*, m.first_name || ' ' || m.last_name as member_name
+            FROM reservations r
+            JOIN members m ON r.member_id = m.member_id
+            WHERE r.book_id = ? AND r.status IN ('Waiting', 'Ready')
+            ORDER BY r.status = 'Waiting', r.reservation_id
+        """, (book_id,))
+
+    def get_member_reservations(self, member_id: int) -> List[Dict]:
+        return self._fetch_all("""
+            SELECT r.*, b.title as book_title
+            FROM reservations r
+            JOIN books b ON r.book_id = b.book_id
+            WHERE r.member_id = ?
+            ORDER BY r.reservation_id DESC
+        """, (member_id,))
+
+    def get_queue_position(self, reservation_id: int) -> Optional[int]:
+        """1-based place of a waiting hold in its book's queue"""
+        reservation = self.get_reservation(reservation_id)
+        if not reservation or reservation['status'] != 'Waiting':
+            return None
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM reservations
+            WHERE book_id = ? AND status = 'Waiting' AND reservation_id <= ?
+        """, (reservation['book_id'], reservation_id))
+        return self.cursor.fetchone()[0]
 
     # ========== REVIEW OPERATIONS ==========
     def add_review(self, book_id: int, member_id: int, rating: int, review_text: str) -> int:
-        """Add a book review"""
+        """Add a book review and fold its rating into the book's aggregates"""
         self.cursor.execute("""
             INSERT INTO book_reviews (book_id, member_id, rating, review_text, review_date)
             VALUES (?, ?, ?, ?, ?)
         """, (book_id, member_id, rating, review_text, datetime.now().date().isoformat()))
+        review_id = self.cursor.lastrowid
+        fold_ratings(self.cursor, review_id - 1)
         self.conn.commit()
-        return self.cursor.lastrowid
+        return review_id
 
-    def get_book_reviews(self, book_id: int) -> List[Dict]:
-        """Get all reviews for a book"""
-        self.cursor.execute("""
+    def get_book_reviews(self, book_id: int, limit: int = None, before: int = None) -> List[Dict]:
+        """Reviews for a book, newest first. With a limit, one page: pass the
+        last review_id of a page as `before` to get the next one (a seek on
+        the book's review index, however many reviews it has)."""
+        query = """
             SELECT r.*, m.first_name || ' ' || m.last_name as member_name
             FROM book_reviews r
             JOIN members m ON r.member_id = m.member_id
             WHERE r.book_id = ?
-            ORDER BY r.review_date DESC
-        """, (book_id,))
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+        """
+        params = [book_id]
+        if before is not None:
+            query += " AND r.review_id < ?"
+            params.append(before)
+        query += " ORDER BY r.review_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._fetch_all(query, tuple(params))
+
+    def _rated_books(self, rows: List[Dict], key: str) -> set:
+        """Books of the reviews in `rows` whose rating or book changes"""
+        review_ids = [row[key] for row in rows if 'rating' in row or 'book_id' in row]
+        books = set()
+        for offset in range(0, len(review_ids), 500):
+            batch = review_ids[offset:offset + 500]
+            self.cursor.execute(f"SELECT DISTINCT book_id FROM book_reviews "
+                                f"WHERE review_id IN ({', '.join('?' * len(batch))})", batch)
+            books.update(row[0] for row in self.cursor.fetchall())
+        return books
+
+    def _refresh_ratings(self, book_ids: set):
+        """Recount the aggregates of these books from their reviews; the caller commits"""
+        stars = ', '.join(f"SUM(r.rating = {n})" for n in range(1, 6))
+        book_ids = list(book_ids)
+        for offset in range(0, len(book_ids), 500):
+            batch = book_ids[offset:offset + 500]
+            marks = ', '.join('?' * len(batch))
+            self.cursor.execute(f"DELETE FROM book_ratings WHERE book_id IN ({marks})", batch)
+            self.cursor.execute(f"""
+                INSERT INTO book_ratings (book_id, category, review_count, rating_sum,
+                                          stars_1, stars_2, stars_3, stars_4, stars_5, average)
+                SELECT r.book_id, b.category, COUNT(*), SUM(r.rating), {stars}, AVG(r.rating)
+                FROM book_reviews r LEFT JOIN books b ON b.book_id = r.book_id
+                WHERE r.book_id IN ({marks})
+                GROUP BY r.book_id
+            """, batch)
+
+    def get_book_rating(self, book_id: int) -> Dict:
+        """Review count, average rating and star histogram (index 0 = 1 star) of a book"""
+        row = self._fetch_one("SELECT * FROM book_ratings WHERE book_id = ?", (book_id,))
+        if not row or not row['review_count']:
+            return {'review_count': 0, 'average': None, 'histogram': [0] * 5}
+        return {'review_count': row['review_count'], 'average': round(row['average'], 2),
+                'histogram': [row[f'stars_{n}'] for n in range(1, 6)]}
+
+    def get_top_rated_books(self, category: str = None, limit: int = 10, min_reviews: int = 1) -> List[Dict]:
+        """Highest average rating first (more reviews breaking ties), optionally
+        within one category; read in order off the book_ratings indexes"""
+        query = """
+            SELECT b.*, r.average, r.review_count
+            FROM book_ratings r
+            JOIN books b ON b.book_id = r.book_id
+            WHERE r.review_count >= ?
+        """
+        params = [min_reviews]
+        if category is not None:
+            query += " AND r.category = ?"
+            params.append(category)
+        query += " ORDER BY r.average DESC, r.review_count DESC LIMIT ?"
+        params.append(limit)
+        return self._fetch_all(query, tuple(params))
+
+    def get_all_reviews(self, book_id: int = None) -> List[Dict]:
+        """Get all reviews with book titles, optionally for a single book"""
+        query = """
+            SELECT r.*, b.title as book_title,
+                   m.first_name || ' ' || m.last_name as member_name
+            FROM book_reviews r
+            JOIN books b ON r.book_id = b.book_id
+            JOIN members m ON r.member_id = m.member_id
+        """
+        params = ()
+        if book_id is not None:
+            query += " WHERE r.book_id = ?"
+            params = (book_id,)
+        query += " ORDER BY r.book_id, r.review_date DESC"
+        return self._fetch_all(query, params)
 
     # ========== STATISTICS ==========
     def get_statistics(self) -> Dict:
@@ -399,7 +1048,266 @@ class DatabaseManager:
         
         return stats
 
+    # ========== BULK OPERATIONS ==========
+    def bulk_insert(self, table: str, columns: Tuple[str, ...], rows: List[tuple],
+                    ignore_conflicts: bool = False) -> int:
+        """Insert many rows in one transaction; returns the number inserted.
+
+        With ignore_conflicts, rows that violate a UNIQUE constraint are
+        skipped; otherwise the whole batch is rolled back and the error raised.
+
+        Loaded rows do not set copy state; the open loans do. Books get
+        total_copies shelf copies, and any available_copies given is
+        ignored. Each open loan loaded (for a new book, or in new
+        transactions) takes a shelf copy of its book, or a new copy if none
+        is left. The books' counters are then recounted from their copies.
+        """
+        verb = "INSERT OR IGNORE" if ignore_conflicts else "INSERT"
+        placeholders = ', '.join('?' * len(columns))
+        pk = {'books': 'book_id', 'book_reviews': 'review_id', 'transactions': 'transaction_id'}.get(table)
+        try:
+            if pk:
+                self.cursor.execute(f"SELECT COALESCE(MAX({pk}), 0) FROM {table}")
+                last_id = self.cursor.fetchone()[0]
+            self.cursor.executemany(
+                f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+            inserted = self.cursor.rowcount
+            lent = set()
+            if table == 'books':
+                self._index_new_books(last_id)
+                # insert_copies put exactly total_copies copies on the shelf
+                self.cursor.execute("""
+                    UPDATE books SET total_copies = MAX(COALESCE(total_copies, 0), 0),
+                                     available_copies = MAX(COALESCE(total_copies, 0), 0)
+                    WHERE book_id > ?
+                """, (last_id,))
+                lent = self._link_open_loans("book_id > ?", (last_id,))
+            elif table == 'transactions':
+                lent = self._link_open_loans("transaction_id > ?", (last_id,))
+            self._recount_copies("book_id = ?", [(book_id,) for book_id in lent])
+            if table == 'book_reviews':
+                # One grouped upsert for the whole batch
+                fold_ratings(self.cursor, last_id)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        for book_id in lent:
+            self.book_cache.invalidate(book_id)
+        return inserted
+
+    def _link_open_loans(self, condition: str, params: tuple) -> set:
+        """Give each open loan matching `condition` that has no copy yet a
+        copy of its book: a shelf copy if there is one, else a new copy, as
+        the add_copies migration did. Returns the books touched; the caller
+        recounts them and commits."""
+        self.cursor.execute(f"""
+            SELECT t.transaction_id, t.book_id, b.shelf_location FROM transactions t
+            JOIN books b ON b.book_id = t.book_id
+            WHERE t.copy_id IS NULL AND t.status = 'Issued' AND (t.return_date IS NULL OR t.return_date = '')
+              AND t.{condition}
+            ORDER BY t.transaction_id
+        """, params)
+        books = set()
+        for transaction_id, book_id, shelf_location in self.cursor.fetchall():
+            self.cursor.execute("SELECT copy_id FROM copies WHERE book_id = ? AND status = 'Available' LIMIT 1",
+                                (book_id,))
+            row = self.cursor.fetchone()
+            if row:
+                copy_id = row[0]
+            else:
+                self._insert_copy(book_id, None, shelf_location)
+                copy_id = self.cursor.lastrowid
+            self.cursor.execute("UPDATE copies SET status = 'On Loan' WHERE copy_id = ?", (copy_id,))
+            self.cursor.execute("UPDATE transactions SET copy_id = ? WHERE transaction_id = ?",
+                                (copy_id, transaction_id))
+            books.add(book_id)
+        return books
+
+    def _recount_copies(self, condition: str, params: Iterable[tuple]):
+        """Set total_copies and available_copies from the copies for the books
+        matching `condition` (once per parameter tuple); the caller commits"""
+        self.cursor.executemany(f"""
+            UPDATE books SET
+                total_copies = (SELECT COUNT(*) FROM copies
+                                WHERE copies.book_id = books.book_id AND status NOT IN ('Lost', 'Withdrawn')),
+                available_copies = (SELECT COUNT(*) FROM copies
+                                    WHERE copies.book_id = books.book_id AND status = 'Available')
+            WHERE {condition}
+        """, params)
+
+    def bulk_update(self, table: str, key: str, rows: List[Dict]) -> int:
+        """Update many rows by primary key in one transaction; each dict holds
+        the key plus the columns to change. Returns the number of rows matched.
+        As in update_book, books' total_copies resizes their copies and
+        available_copies is left to follow them."""
+        resize = {}
+        if table == 'books':
+            resize = {row[key]: row['total_copies'] for row in rows if row.get('total_copies') is not None}
+            rows = [{column: value for column, value in row.items()
+                     if column not in ('total_copies', 'available_copies')} for row in rows]
+        # One prepared statement per distinct set of columns
+        groups: Dict[tuple, list] = {}
+        for row in rows:
+            columns = tuple(sorted(column for column in row if column != key))
+            if columns:
+                groups.setdefault(columns, []).append(tuple(row[c] for c in columns) + (row[key],))
+        updated = 0
+        try:
+            # Titles and authors as they were, to move their near-duplicate buckets
+            old_titles = {}
+            rerated = set()
+            if table == 'book_reviews':
+                rerated = self._rated_books(rows, key)
+            if table == 'books':
+                for row in rows:
+                    if row.get('title') is not None or row.get('author') is not None:
+                        self.cursor.execute("SELECT title, author FROM books WHERE book_id = ?", (row[key],))
+                        old = self.cursor.fetchone()
+                        if old:
+                            old_titles[row[key]] = tuple(old)
+            for columns, params in groups.items():
+                assignments = ', '.join(f"{column} = ?" for column in columns)
+                self.cursor.executemany(f"UPDATE {table} SET {assignments} WHERE {key} = ?", params)
+                updated += self.cursor.rowcount
+            for row in rows:
+                if row[key] in resize and self._resize_copies(row[key], resize[row[key]]) and len(row) == 1:
+                    updated += 1
+            if rerated:
+                self._refresh_ratings(rerated | self._rated_books(rows, key))
+            if table == 'books':
+                known = {}
+                for row in rows:
+                    if row.get('category') is not None:
+                        self.cursor.execute("UPDATE book_ratings SET category = ? WHERE book_id = ?",
+                                            (row['category'], row[key]))
+                    if row.get('author') is not None:
+                        link_book_authors(self.cursor, row[key], row['author'], known)
+                    if row[key] in old_titles:
+                        self._reindex_title(row[key], *old_titles[row[key]], row)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        if table == 'books':
+            for row in rows:
+                self.book_cache.invalidate(row[key])
+        elif table == 'members':
+            for row in rows:
+                self.member_cache.invalidate(row[key])
+        return updated
+
+    def _index_new_books(self, after_id: int):
+        """Link the authors, index the titles and create the copies of books inserted with ids above `after_id`"""
+        known = {}
+        self.cursor.execute("SELECT book_id, title, author FROM books WHERE book_id > ?", (after_id,))
+        for book_id, title, author in self.cursor.fetchall():
+            link_book_authors(self.cursor, book_id, author, known)
+            index_book(self.cursor, book_id, title, author)
+        insert_copies(self.cursor, after_id)
+
+    def vacuum(self, into: str = None):
+        """Rebuild the database file (or write a compacted copy to `into`)"""
+        if self.conn.in_transaction:
+            self.conn.commit()
+        if into:
+            self.cursor.execute("VACUUM INTO ?", (into,))
+        else:
+            self.cursor.execute("VACUUM")
+
+    def reindex(self, name: str = None):
+        """Rebuild every index, or those of one table or index, then refresh planner statistics"""
+        self.cursor.execute(f"REINDEX {name}" if name else "REINDEX")
+        self.cursor.execute("ANALYZE")
+        self.conn.commit()
+
+    # ========== CHANGE FEED ==========
+    def get_last_change_seq(self) -> int:
+        """Newest sequence number ever issued by the change log (0 if none)"""
+        self.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, seq: int = 0, limit: int = 1000) -> List[Dict]:
+        """Change-log entries after `seq`, oldest first.
+
+        Entries carry the table, row id and operation; consumers read the
+        current row themselves and should treat insert and update alike,
+        since compaction keeps only the newest entry per row.
+        """
+        return self._fetch_all("""
+            SELECT seq, table_name, row_id, op, changed_at FROM change_log
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        """, (seq, limit))
+
+    def ack_changes(self, consumer: str, seq: int):
+        """Record that a consumer has processed every change up to `seq`"""
+        self.cursor.execute("""
+            INSERT INTO change_consumers (consumer, last_seq, updated_at)
+            VALUES (?, ?, datetime('now'))
+            ON CONFLICT(consumer) DO UPDATE SET
+                last_seq = MAX(last_seq, excluded.last_seq), updated_at = excluded.updated_at
+        """, (consumer, seq))
+        self.conn.commit()
+
+    def get_consumer_position(self, consumer: str) -> int:
+        """Last sequence number acknowledged by a consumer (0 if it never acknowledged)"""
+        self.cursor.execute("SELECT last_seq FROM change_consumers WHERE consumer = ?", (consumer,))
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
+    def compact_change_log(self, batch_size: int = 5000) -> int:
+        """Delete entries every registered consumer has acknowledged, and entries
+        superseded by a newer one for the same row; returns the number removed"""
+        # Short batches so desk writers are not locked out for long
+        removed = 0
+        self.cursor.execute("SELECT COALESCE(MIN(last_seq), 0) FROM change_consumers")
+        acknowledged = self.cursor.fetchone()[0]
+        while True:
+            self.cursor.execute("""
+                DELETE FROM change_log WHERE seq IN (
+                    SELECT seq FROM change_log WHERE seq <= ? ORDER BY seq LIMIT ?)
+            """, (acknowledged, batch_size))
+            self.conn.commit()
+            removed += self.cursor.rowcount
+            if self.cursor.rowcount < batch_size:
+                break
+        # Walk the rest in seq windows, so the entries kept are read once
+        # rather than rescanned by every batch; the newer entry for the same
+        # row is a seek on idx_change_log_row
+        last_seen = acknowledged
+        while True:
+            self.cursor.execute("""
+                SELECT MAX(seq) FROM (
+                    SELECT seq FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?)
+            """, (last_seen, batch_size))
+            upper = self.cursor.fetchone()[0]
+            if upper is None:
+                break
+            self.cursor.execute("""
+                DELETE FROM change_log
+                WHERE seq > ? AND seq <= ?
+                  AND EXISTS (SELECT 1 FROM change_log n
+                              WHERE n.table_name = change_log.table_name
+                                AND n.row_id = change_log.row_id
+                                AND n.seq > change_log.seq)
+            """, (last_seen, upper))
+            self.conn.commit()
+            removed += self.cursor.rowcount
+            last_seen = upper
+        return removed
+
     def close(self):
         """Close database connection"""
+        try:
+            # Refresh planner statistics for the tables this connection's
+            # queries found lacking, sampling rather than scanning whole indexes
+            self.conn.execute(f"PRAGMA analysis_limit = {OPTIMIZE_ANALYSIS_LIMIT}")
+            self.conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            # A read-only or locked database closes without it
+            pass
         self.conn.close()
 
@@ -0,0 +1,207 @@
+"""
+Duplicate Detection Module
+MinHash signatures over a book's normalized title and authors, stored as
+locality-sensitive hash buckets in book_minhash so that near-duplicate
+candidates (the same book catalogued under a slightly different title,
+or without an ISBN) are found by index lookups, never a pairwise scan
+"""
+import hashlib
+import re
+import unicodedata
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from author_utils import author_key, split_authors
+from entity_cache import MISSING, LRUCache
+
+# 12 bands of 4 16-bit minhashes: a pair shares at least one bucket with
+# probability 1 - (1 - J^4)^12, i.e. ~0.96 at Jaccard 0.7, ~0.81 at 0.6 and
+# under 0.02 at 0.2
+BANDS = 12
+ROWS_PER_BAND = 4
+DEFAULT_THRESHOLD = 0.6
+# Buckets larger than this (e.g. dozens of copies of one common title) are
+# only compared pairwise up to this many members by the clustering job, and
+# a lookup verifies at most this many candidates, those sharing most bands first
+MAX_BUCKET = 200
+# Shingle sets the clustering job keeps between buckets
+PROFILE_CACHE_SIZE = 100000
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_ARTICLES = {'the', 'a', 'an'}
+
+
+def title_key(title: str) -> str:
+    """Case-, accent- and punctuation-insensitive title without leading or
+    trailing articles ('The Hobbit' and 'Hobbit, The' -> 'hobbit')"""
+    decomposed = unicodedata.normalize('NFKD', (title or '').casefold().replace('&', ' and '))
+    words = _NON_ALNUM.sub(' ', ''.join(ch for ch in decomposed if not unicodedata.combining(ch))).split()
+    while len(words) > 1 and words[0] in _ARTICLES:
+        words.pop(0)
+    while len(words) > 1 and words[-1] in _ARTICLES:
+        words.pop()
+    return ' '.join(words)
+
+
+def shingles(title: str, author: str) -> Set[str]:
+    """Character trigrams of the title key's words, one '#n' per number in
+    it, and one '@word' per author name word (initials dropped, so
+    'J.R.R. Tolkien' and 'John Tolkien' agree)"""
+    words = title_key(title).split()
+    result = {'#' + word for word in words if word.isdigit()}
+    padded = f" {' '.join(word for word in words if not word.isdigit())} "
+    result.update(padded[i:i + 3] for i in range(len(padded) - 2) if padded.strip())
+    for name in split_authors(author):
+        result.update('@' + word for word in author_key(name).split() if len(word) > 1)
+    return result
+
+
+def minhash(shingle_set: Iterable[str]) -> Optional[array]:
+    """BANDS * ROWS_PER_BAND 16-bit minimums, one per hash function; each
+    shingle's digest supplies every hash function's value at once"""
+    size = BANDS * ROWS_PER_BAND
+    digests = [array('H', hashlib.shake_128(s.encode()).digest(2 * size)) for s in shingle_set]
+    if not digests:
+        return None
+    if len(digests) == 1:
+        return digests[0]
+    return array('H', map(min, *digests))
+
+
+def band_buckets(signature: array) -> List[Tuple[int, int]]:
+    """(band, bucket) pairs: each band's minhashes packed into one signed 64-bit integer"""
+    raw = signature.tobytes()
+    width = 2 * ROWS_PER_BAND
+    return [(band, int.from_bytes(raw[band * width:(band + 1) * width], 'little', signed=True))
+            for band in range(BANDS)]
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two shingle sets. Titles whose numbers differ
+    (volume 1 and 2, the 1998 and 2004 editions) are never alike, nor are
+    books that both name authors but share no author word."""
+    return _score(a, _marks(a), b, _marks(b))
+
+
+def _marks(shingle_set: Set[str]) -> Tuple[frozenset, frozenset]:
+    """The '#number' and '@author' shingles of a set"""
+    return (frozenset(s for s in shingle_set if s[0] == '#'),
+            frozenset(s for s in shingle_set if s[0] == '@'))
+
+
+def _score(a: Set[str], a_marks: tuple, b: Set[str], b_marks: tuple) -> float:
+    if not a or not b or a_marks[0] != b_marks[0]:
+        return 0.0
+    if a_marks[1] and b_marks[1] and a_marks[1].isdisjoint(b_marks[1]):
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def book_buckets(title: str, author: str) -> List[Tuple[int, int]]:
+    signature = minhash(shingles(title, author))
+    return band_buckets(signature) if signature is not None else []
+
+
+def index_book(cursor, book_id: int, title: str, author: str):
+    """Add a book's buckets; the caller commits"""
+    cursor.executemany("INSERT OR IGNORE INTO book_minhash (band, bucket, book_id) VALUES (?, ?, ?)",
+                       [(band, bucket, book_id) for band, bucket in book_buckets(title, author)])
+
+
+def unindex_book(cursor, book_id: int, title: str, author: str):
+    """Remove the buckets index_book added for this title and author"""
+    cursor.executemany("DELETE FROM book_minhash WHERE band = ? AND bucket = ? AND book_id = ?",
+                       [(band, bucket, book_id) for band, bucket in book_buckets(title, author)])
+
+
+def find_candidates(cursor, title: str, author: str, threshold: float = DEFAULT_THRESHOLD,
+                    limit: int = 10, exclude: int = None, max_candidates: int = MAX_BUCKET) -> List[Tuple[int, float]]:
+    """(book_id, similarity) of indexed books sharing a bucket with this
+    title and author and at least `threshold` similar, most similar first"""
+    target = shingles(title, author)
+    signature = minhash(target)
+    if signature is None:
+        return []
+    buckets = band_buckets(signature)
+    matches = " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+    cursor.execute(f"""
+        SELECT b.book_id, b.title, b.author FROM (
+            SELECT book_id, COUNT(*) AS shared FROM book_minhash WHERE {matches}
+            GROUP BY book_id ORDER BY shared DESC LIMIT ?
+        ) c JOIN books b ON b.book_id = c.book_id
+    """, tuple(value for pair in buckets for value in pair) + (max_candidates,))
+    scored = []
+    for book_id, other_title, other_author in cursor.fetchall():
+        if book_id == exclude:
+            continue
+        score = similarity(target, shingles(other_title, other_author))
+        if score >= threshold:
+            scored.append((book_id, round(score, 3)))
+    scored.sort(key=lambda item: -item[1])
+    return scored[:limit]
+
+
+def cluster_duplicates(conn, threshold: float = DEFAULT_THRESHOLD, max_bucket: int = MAX_BUCKET,
+                       cache_size: int = PROFILE_CACHE_SIZE) -> Iterator[List[Tuple[int, float]]]:
+    """Groups of likely duplicates across the catalogue, each a list of
+    (book_id, similarity to the group's first book) with the oldest first.
+
+    Only books sharing an LSH bucket are compared, streaming book_minhash in
+    index order, so the work grows with the number of near-duplicates rather
+    than with the square of the catalogue, and memory with `cache_size`
+    (shingle sets kept between buckets) plus the books found to be duplicates.
+    """
+    scan = conn.cursor()
+    scan.row_factory = None
+    lookup = conn.cursor()
+    lookup.row_factory = None
+    profiles = LRUCache(cache_size)
+    parent: Dict[int, int] = {}
+
+    def root(book_id):
+        while parent.get(book_id, book_id) != book_id:
+            parent[book_id] = parent.get(parent[book_id], parent[book_id])
+            book_id = parent[book_id]
+        return book_id
+
+    def compare(group):
+        missing = [book_id for book_id in group if profiles.get(book_id) is MISSING]
+        if missing:
+            lookup.execute(f"SELECT book_id, title, author FROM books "
+                           f"WHERE book_id IN ({', '.join('?' * len(missing))})", missing)
+            for book_id, title, author in lookup.fetchall():
+                shingle_set = shingles(title, author)
+                profiles.put(book_id, (shingle_set, _marks(shingle_set)))
+        members = [(book_id, profiles.get(book_id)) for book_id in group]
+        members = [(book_id, profile) for book_id, profile in members if profile is not MISSING]
+        for i, (a, (a_set, a_marks)) in enumerate(members):
+            for b, (b_set, b_marks) in members[i + 1:]:
+                ra, rb = root(a), root(b)
+                # Pairs recur in several bands; once joined there is nothing to score
+                if ra != rb and _score(a_set, a_marks, b_set, b_marks) >= threshold:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    group: List[int] = []
+    current = None
+    for band, bucket, book_id in scan.execute("SELECT band, bucket, book_id FROM book_minhash"):
+        if (band, bucket) != current:
+            if len(group) > 1:
+                compare(group)
+            group, current = [], (band, bucket)
+        if len(group) < max_bucket:
+            group.append(book_id)
+    if len(group) > 1:
+        compare(group)
+
+    clusters: Dict[int, List[int]] = {}
+    for book_id in sorted(parent):
+        first = root(book_id)
+        clusters.setdefault(first, [first]).append(book_id)
+    for first, members in sorted(clusters.items()):
+        lookup.execute(f"SELECT book_id, title, author FROM books WHERE book_id IN ({', '.join('?' * len(members))})",
+                       members)
+        found = {book_id: shingles(title, author) for book_id, title, author in lookup.fetchall()}
+        if first in found and len(found) > 1:
+            yield [(book_id, round(similarity(found[first], found[book_id]), 3))
+                   for book_id in sorted(found)]
@@ -0,0 +1,65 @@
+"""
+Entity Cache Module
+Small in-process LRU cache for point reads (a book or member by id), with
+hit-rate counters
+"""
+from collections import OrderedDict
+from typing import Dict, Hashable
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.flushes = 0
+
+    def get(self, key: Hashable):
+        """Cached value, or MISSING"""
+        value = self._entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if self._entries.pop(key, MISSING) is not MISSING:
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry (e.g. another connection changed the database)"""
+        if self._entries:
+            self._entries.clear()
+            self.flushes += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'flushes': self.flushes,
+        }
@@ -0,0 +1,212 @@
+"""
+Export Manager Module
+Streams library tables to CSV or JSON Lines, optionally compressed, in
+constant memory and on a background thread
+
+Usage: python export_manager.py transactions nightly.jsonl.gz --incremental
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from db_manager import DatabaseManager
+
+# Dataset name -> (table, primary key)
+DATASETS = {
+    'books': ('books', 'book_id'),
+    'members': ('members', 'member_id'),
+    'transactions': ('transactions', 'transaction_id'),
+    'reviews': ('book_reviews', 'review_id'),
+}
+
+FORMATS = ('csv', 'jsonl')
+
+COMPRESSORS = {
+    'none': open,
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+
+def detect_format(filename: str) -> tuple:
+    """Guess (format, compression) from a file name such as loans.jsonl.gz"""
+    name = filename.lower()
+    compression = 'none'
+    for suffix, codec in (('.gz', 'gzip'), ('.bz2', 'bz2'), ('.xz', 'xz')):
+        if name.endswith(suffix):
+            compression = codec
+            name = name[:-len(suffix)]
+    fmt = 'jsonl' if name.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+    return fmt, compression
+
+
+class ExportManager:
+    def __init__(self, db_name: str = "library.db", batch_size: int = 5000):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        # Make sure change tracking and the state table exist before exporting
+        DatabaseManager(db_name).close()
+        conn = sqlite3.connect(db_name)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS export_state (
+                dataset TEXT PRIMARY KEY,
+                watermark TEXT,
+                last_export_at TEXT,
+                last_file TEXT,
+                rows_exported INTEGER
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def get_watermark(self, dataset: str) -> Optional[str]:
+        """Newest updated_at in the table when the last export of a dataset began"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            row = conn.execute("SELECT watermark FROM export_state WHERE dataset = ?", (dataset,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def export(self, dataset: str, filename: str, fmt: str = None, compression: str = None,
+               incremental: bool = False, progress: Callable = None,
+               cancel_event: threading.Event = None) -> Dict:
+        """Stream one dataset to a file; returns a summary of the run"""
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        detected_fmt, detected_compression = detect_format(filename)
+        fmt = fmt or detected_fmt
+        compression = compression or detected_compression
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression: {compression}")
+
+        table, pk = DATASETS[dataset]
+        conditions, params = [], []
+        watermark = self.get_watermark(dataset) if incremental else None
+        if watermark:
+            # >= so rows touched in the same millisecond are never lost
+            conditions.append("updated_at >= ?")
+            params.append(watermark)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # A dedicated connection so the export can run off the Tk thread.
+        # Rows are read in short keyset-paginated batches rather than one
+        # long-lived cursor so desk writers are never locked out for long.
+        conn = sqlite3.connect(self.db_name)
+        try:
+            # The cutoff is taken before the first batch is read, in the same
+            # snapshot as the count. Batches are separate snapshots, so a row
+            # updated behind the keyset after its batch was read is missing
+            # from this file; its new updated_at is past the cutoff, so the
+            # next incremental export picks it up.
+            total, cutoff = conn.execute(f"SELECT COUNT(*), MAX(updated_at) FROM {table}{where}",
+                                         params).fetchone()
+            batch_sql = (f"SELECT * FROM {table} WHERE {' AND '.join(conditions + [f'{pk} > ?'])} "
+                         f"ORDER BY {pk} LIMIT {self.batch_size}")
+            cursor = conn.execute(f"SELECT * FROM {table} LIMIT 0")
+            columns = [d[0] for d in cursor.description]
+            pk_idx = columns.index(pk)
+
+            written = 0
+            last_key = 0
+            with COMPRESSORS[compression](filename, 'wt', encoding='utf-8', newline='') as out:
+                if fmt == 'csv':
+                    writer = csv.writer(out)
+                    writer.writerow(columns)
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise InterruptedError("Export cancelled")
+                    rows = conn.execute(batch_sql, params + [last_key]).fetchall()
+                    if not rows:
+                        break
+                    if fmt == 'csv':
+                        writer.writerows(rows)
+                    else:
+                        out.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+                    last_key = rows[-1][pk_idx]
+                    written += len(rows)
+                    if progress:
+                        progress(dataset, written, total)
+
+            exported_at = datetime.now().isoformat(timespec='seconds')
+            conn.execute("""
+                INSERT INTO export_state (dataset, watermark, last_export_at, last_file, rows_exported)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(dataset) DO UPDATE SET
+                    watermark = excluded.watermark, last_export_at = excluded.last_export_at,
+                    last_file = excluded.last_file, rows_exported = excluded.rows_exported
+            """, (dataset, cutoff or watermark, exported_at, filename, written))
+            conn.commit()
+        finally:
+            conn.close()
+
+        return {'dataset': dataset, 'file': filename, 'format': fmt, 'compression': compression,
+                'rows': written, 'incremental': bool(watermark)}
+
+
+class ExportJob:
+    """An export running on a background thread, polled for progress"""
+
+    def __init__(self, manager: ExportManager, dataset: str, filename: str, **kwargs):
+        self.dataset = dataset
+        self.filename = filename
+        self.rows_written = 0
+        self.total_rows = 0
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(manager, kwargs), daemon=True)
+
+    def _run(self, manager: ExportManager, kwargs: Dict):
+        try:
+            self.result = manager.export(self.dataset, self.filename, progress=self._progress,
+                                         cancel_event=self.cancel_event, **kwargs)
+        except Exception as e:
+            self.error = e
+
+    def _progress(self, dataset: str, written: int, total: int):
+        self.rows_written = written
+        self.total_rows = total
+
+    def start(self) -> "ExportJob":
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export library data")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("output", help="output file; .csv/.jsonl with optional .gz/.bz2/.xz")
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--compression", choices=sorted(COMPRESSORS))
+    parser.add_argument("--incremental", action="store_true", help="only rows changed since the last export")
+    args = parser.parse_args()
+
+    def report(dataset, written, total):
+        print(f"\r{dataset}: {written}/{total} rows", end="", flush=True)
+
+    result = ExportManager(args.db).export(args.dataset, args.output, args.format, args.compression,
+                                           args.incremental, progress=report)
+    print(f"\nExported {result['rows']} {result['dataset']} rows to {result['file']}")
+
+
+if __name__ == "__main__":
+    main()
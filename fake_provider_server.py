@@ -0,0 +1,277 @@
+"""
+Fake Book Provider Server
+Local stand-in for the Google Books and Open Library endpoints used by
+BookAPI, for offline and load testing
+
+Serves /books/v1/volumes, /isbn/{isbn}.json, /search.json and
+/search/authors.json with recorded or generated responses, and can add
+latency, random server errors and 429 throttling.
+
+Usage: python fake_provider_server.py --port 8081 --latency 0.05 --error-rate 0.01 --rate-limit 50
+Then:  BookAPI(google_books_base="http://127.0.0.1:8081/books/v1/volumes",
+               open_library_base="http://127.0.0.1:8081")
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from isbn_utils import clean_isbn
+
+CATEGORIES = ["Fiction", "Science", "History", "Children", "Biography", "Computers"]
+
+
+class FakeProviderConfig:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: int = 0, retry_after: int = 1, not_found_rate: float = 0.0,
+                 recordings: Dict = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Requests per second allowed before answering 429 (0 = unlimited)
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.not_found_rate = not_found_rate
+        # Recorded bodies keyed by request path including query string
+        self.recordings = recordings or {}
+        self.seed = seed
+
+
+def _rng(seed: int, key: str) -> random.Random:
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return random.Random(seed ^ int(digest[:12], 16))
+
+
+def _search_isbn(query: str, index: int, seed: int) -> str:
+    return f"978{_rng(seed, f'{query}:{index}').randrange(10 ** 10):010d}"
+
+
+def generate_google_volume(isbn: str, seed: int = 0) -> Dict:
+    """Deterministic Google Books volume for an ISBN"""
+    rng = _rng(seed, isbn)
+    return {'volumeInfo': {
+        'title': f"Generated Book {isbn[-6:]}",
+        'authors': [f"Author {rng.randint(1, 5000)}"],
+        'publisher': f"Publisher {rng.randint(1, 200)}",
+        'publishedDate': str(rng.randint(1900, 2024)),
+        'description': "Generated by the fake provider server.",
+        'industryIdentifiers': [{'type': 'ISBN_13', 'identifier': isbn}],
+        'pageCount': rng.randint(50, 900),
+        'categories': [rng.choice(CATEGORIES)],
+        'language': 'en',
+    }}
+
+
+def generate_open_library_doc(isbn: str, seed: int = 0) -> Dict:
+    """Deterministic Open Library document for an ISBN"""
+    rng = _rng(seed, isbn)
+    return {
+        'title': f"Generated Book {isbn[-6:]}",
+        'isbn': [isbn],
+        'author_name': [f"Author {rng.randint(1, 5000)}"],
+        'publisher': [f"Publisher {rng.randint(1, 200)}"],
+        'first_publish_year': rng.randint(1900, 2024),
+        'subject': [rng.choice(CATEGORIES)],
+        'number_of_pages_median': rng.randint(50, 900),
+        'language': ['eng'],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real providers
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        stats = server.stats
+
+        # Every draw from the shared Random and every counter update happens
+        # under the lock, so a seeded run injects the same faults and
+        # reports the same counts however requests interleave
+        with server.lock:
+            stats['requests'] += 1
+            throttled = False
+            if config.rate_limit:
+                now = time.monotonic()
+                if now - server.window_start >= 1:
+                    server.window_start, server.window_count = now, 0
+                server.window_count += 1
+                if server.window_count > config.rate_limit:
+                    stats['throttled'] += 1
+                    throttled = True
+            if not throttled:
+                roll = server.rng.random()
+                delay = 0.0
+                if config.latency or config.jitter:
+                    delay = max(0.0, config.latency + server.rng.uniform(-config.jitter, config.jitter))
+                if roll < config.error_rate:
+                    stats['errors'] += 1
+
+        if throttled:
+            return self._send(429, {'error': 'rate limited'}, {'Retry-After': str(config.retry_after)})
+
+        if delay:
+            time.sleep(delay)
+
+        if roll < config.error_rate:
+            return self._send(500, {'error': 'injected failure'})
+
+        if self.path in config.recordings:
+            return self._send(200, config.recordings[self.path])
+
+        body = self._generate(roll)
+        if body is None:
+            with server.lock:
+                stats['not_found'] += 1
+            return self._send(404, {'error': 'not found'})
+        return self._send(200, body)
+
+    def _generate(self, roll: float) -> Optional[Dict]:
+        config = self.server.config
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        missing = roll > 1 - config.not_found_rate
+
+        if parsed.path == '/books/v1/volumes':
+            q = query.get('q', '')
+            if q.startswith('isbn:'):
+                if missing:
+                    return {'totalItems': 0}
+                return {'totalItems': 1, 'items': [generate_google_volume(clean_isbn(q[5:]), config.seed)]}
+            count = int(query.get('maxResults', 10))
+            items = [generate_google_volume(_search_isbn(q, i, config.seed), config.seed)
+                     for i in range(count)]
+            return {'totalItems': count, 'items': items}
+
+        if parsed.path.startswith('/isbn/') and parsed.path.endswith('.json'):
+            if missing:
+                return None
+            return generate_open_library_doc(clean_isbn(parsed.path[6:-5]), config.seed)
+
+        if parsed.path == '/search.json':
+            q = query.get('q', '')
+            count = int(query.get('limit', 10))
+            docs = [generate_open_library_doc(_search_isbn(q, i, config.seed), config.seed)
+                    for i in range(count)]
+            return {'numFound': count, 'docs': docs}
+
+        if parsed.path == '/search/authors.json':
+            name = query.get('q', '')
+            rng = _rng(config.seed, name)
+            return {'numFound': 1, 'docs': [{
+                'name': name,
+                'birth_date': str(rng.randint(1850, 1990)),
+                'death_date': '',
+                'top_work': f"Best of {name}",
+                'work_count': rng.randint(1, 300),
+            }]}
+        return None
+
+    def _send(self, status: int, body: Dict, headers: Dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeProviderServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, config: FakeProviderConfig = None):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or FakeProviderConfig()
+        self.httpd.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'not_found': 0}
+        self.httpd.lock = threading.Lock()
+        self.httpd.rng = random.Random(self.httpd.config.seed)
+        self.httpd.window_start = time.monotonic()
+        self.httpd.window_count = 0
+        self._thread = None
+
+    @property
+    def config(self) -> FakeProviderConfig:
+        return self.httpd.config
+
+    @property
+    def stats(self) -> Dict:
+        return self.httpd.stats
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def google_books_base(self) -> str:
+        return f"{self.url}/books/v1/volumes"
+
+    @property
+    def open_library_base(self) -> str:
+        return self.url
+
+    def start(self) -> "FakeProviderServer":
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def load_recordings(path: str) -> Dict:
+    """Load recorded responses: a JSON object of {"/path?query": body}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Google Books / Open Library server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="fraction of ISBN lookups not found")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before 429 (0 = off)")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--recordings", help="JSON file of recorded responses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeProviderConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, retry_after=args.retry_after,
+        not_found_rate=args.not_found_rate,
+        recordings=load_recordings(args.recordings) if args.recordings else None,
+        seed=args.seed,
+    )
+    server = FakeProviderServer(args.host, args.port, config)
+    print(f"Fake providers on {server.url} (Google Books: {server.google_books_base})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Fake SMS Gateway
+Local stand-in for a bulk SMS provider, for offline throughput and
+failure-injection testing of HTTPSMSProvider
+
+Serves POST /messages/bulk and can add latency, whole-request server
+errors, per-message rejections and 429 throttling, and refuses batches
+larger than its bulk limit.
+
+Usage: python fake_sms_gateway.py --port 8082 --latency 0.05 --error-rate 0.02 --reject-rate 0.01 --rate-limit 20
+Then set sms_config.json: {"enabled": true, "base_url": "http://127.0.0.1:8082"}
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+
+class FakeSMSConfig:
+    def __init__(self, latency: float = 0.0, per_message_latency: float = 0.0, error_rate: float = 0.0,
+                 reject_rate: float = 0.0, rate_limit: int = 0, retry_after: int = 1,
+                 max_batch: int = 500, seed: int = 0):
+        self.latency = latency
+        self.per_message_latency = per_message_latency
+        # Fraction of requests answered with 500
+        self.error_rate = error_rate
+        # Fraction of messages rejected individually (e.g. invalid number)
+        self.reject_rate = reject_rate
+        # Requests per second allowed before answering 429 (0 = unlimited)
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.max_batch = max_batch
+        self.seed = seed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        config = server.config
+        stats = server.stats
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path.rstrip('/') != '/messages/bulk':
+            return self._send(404, {'error': 'not found'})
+
+        with server.lock:
+            stats['requests'] += 1
+            if config.rate_limit:
+                now = time.monotonic()
+                if now - server.window_start >= 1:
+                    server.window_start, server.window_count = now, 0
+                server.window_count += 1
+                if server.window_count > config.rate_limit:
+                    stats['throttled'] += 1
+                    return self._send(429, {'error': 'rate limited'}, {'Retry-After': str(config.retry_after)})
+            roll = server.rng.random()
+
+        try:
+            messages = json.loads(body).get('messages', [])
+        except ValueError:
+            return self._send(400, {'error': 'invalid JSON'})
+        if len(messages) > config.max_batch:
+            return self._send(413, {'error': f'at most {config.max_batch} messages per request'})
+
+        delay = config.latency + config.per_message_latency * len(messages)
+        if delay:
+            time.sleep(delay)
+        if roll < config.error_rate:
+            with server.lock:
+                stats['errors'] += 1
+            return self._send(500, {'error': 'injected failure'})
+
+        results = []
+        with server.lock:
+            for message in messages:
+                if server.rng.random() < config.reject_rate or not message.get('to'):
+                    stats['rejected'] += 1
+                    results.append({'client_ref': message.get('client_ref'), 'status': 'rejected',
+                                    'error': 'invalid destination'})
+                    continue
+                server.next_id += 1
+                stats['delivered'] += 1
+                server.outbox.append({'to': message['to'], 'body': message.get('body', '')})
+                results.append({'client_ref': message.get('client_ref'), 'status': 'accepted',
+                                'message_id': f"SM{server.next_id:010d}"})
+        return self._send(200, {'results': results})
+
+    def _send(self, status: int, body: Dict, headers: Dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeSMSGateway:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, config: FakeSMSConfig = None,
+                 outbox_size: int = 1000):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or FakeSMSConfig()
+        self.httpd.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'delivered': 0, 'rejected': 0}
+        self.httpd.lock = threading.Lock()
+        self.httpd.rng = random.Random(self.httpd.config.seed)
+        self.httpd.window_start = time.monotonic()
+        self.httpd.window_count = 0
+        self.httpd.next_id = 0
+        # Most recent delivered messages, for inspection in tests
+        self.httpd.outbox = deque(maxlen=outbox_size)
+        self._thread = None
+
+    @property
+    def config(self) -> FakeSMSConfig:
+        return self.httpd.config
+
+    @property
+    def stats(self) -> Dict:
+        return self.httpd.stats
+
+    @property
+    def outbox(self) -> deque:
+        return self.httpd.outbox
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSMSGateway":
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake bulk SMS gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--per-message-latency", type=float, default=0.0, help="seconds added per message")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="fraction of messages rejected")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before 429 (0 = off)")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--max-batch", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeSMSConfig(latency=args.latency, per_message_latency=args.per_message_latency,
+                           error_rate=args.error_rate, reject_rate=args.reject_rate,
+                           rate_limit=args.rate_limit, retry_after=args.retry_after,
+                           max_batch=args.max_batch, seed=args.seed)
+    gateway = FakeSMSGateway(args.host, args.port, config)
+    print(f"Fake SMS gateway on {gateway.url}")
+    try:
+        gateway.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Branch Federation Module
+Runs queries across several branch databases in parallel, merges and ranks
+the results, and records loans of one branch's books to another branch's
+members
+
+Each branch keeps its own DatabaseManager on a dedicated worker thread;
+SQLite releases the GIL while a query runs, so branches are searched
+concurrently.
+
+Usage: python federation.py --branch central=central.db --branch north=north.db search "dickens"
+"""
+import argparse
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from db_manager import DatabaseManager
+
+
+class Branch:
+    """One branch database, owned by a single worker thread"""
+
+    def __init__(self, name: str, db_name: str):
+        self.name = name
+        self.db_name = db_name
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"branch-{name}")
+        # Created on the worker thread, which is the only one that uses it
+        self.db = self.executor.submit(DatabaseManager, db_name).result()
+
+    def submit(self, method: str, *args):
+        return self.executor.submit(lambda: getattr(self.db, method)(*args))
+
+    def close(self):
+        self.executor.submit(self.db.close).result()
+        self.executor.shutdown()
+
+
+def _book_key(book) -> tuple:
+    """Identify the same title across branches: ISBN-13, raw ISBN, then title/author"""
+    if book.get('isbn13'):
+        return ('isbn13', book['isbn13'])
+    if book.get('isbn'):
+        return ('isbn', book['isbn'])
+    return ('title', (book.get('title') or '').lower(), (book.get('author') or '').lower())
+
+
+def _match_rank(book, term: str, search_by: str) -> int:
+    """0 = exact match, 1 = prefix match, 2 = match elsewhere in the field"""
+    field = search_by if search_by in ('title', 'author', 'isbn', 'category') else 'title'
+    value = str(book.get(field) or '').lower()
+    term = term.lower()
+    if value == term:
+        return 0
+    return 1 if value.startswith(term) else 2
+
+
+class BranchFederation:
+    def __init__(self, branches: Dict[str, str], parallel: bool = True, timeout: float = 10.0):
+        if not branches:
+            raise ValueError("At least one branch is required")
+        self.parallel = parallel
+        # Busy timeout for the cross-branch loan connections
+        self.timeout = timeout
+        self.branches = {name: Branch(name, db_name) for name, db_name in branches.items()}
+        self.last_errors: Dict[str, Exception] = {}
+
+    def _fan_out(self, method: str, *args) -> Dict[str, object]:
+        """Run a DatabaseManager method on every branch; failed branches are skipped"""
+        self.last_errors = {}
+        if self.parallel:
+            futures = {name: branch.submit(method, *args) for name, branch in self.branches.items()}
+        else:
+            futures = {}
+            for name, branch in self.branches.items():
+                futures[name] = branch.submit(method, *args)
+                futures[name].exception()  # wait before starting the next branch
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                self.last_errors[name] = e
+                print(f"Error querying branch {name}: {e}")
+        return results
+
+    # ========== FEDERATED QUERIES ==========
+    def search_books(self, search_term: str = "", search_by: str = "title") -> List[Dict]:
+        """Search every branch; one entry per title with per-branch holdings.
+
+        Ranked by match quality (exact, prefix, substring), then by copies
+        available across branches.
+        """
+        merged: Dict[tuple, Dict] = {}
+        for name, books in self._fan_out('search_books', search_term, search_by).items():
+            for book in books:
+                key = _book_key(book)
+                entry = merged.get(key)
+                if entry is None:
+                    entry = merged[key] = dict(book, total_copies=0, available_copies=0, holdings={})
+                entry['total_copies'] += book['total_copies'] or 0
+                entry['available_copies'] += book['available_copies'] or 0
+                entry['holdings'][name] = {
+                    'book_id': book['book_id'],
+                    'available_copies': book['available_copies'],
+                    'total_copies': book['total_copies'],
+                    'shelf_location': book['shelf_location'],
+                }
+        return sorted(merged.values(), key=lambda b: (_match_rank(b, search_term, search_by),
+                                                      -b['available_copies'], b['title'] or ''))
+
+    def get_statistics(self) -> Dict:
+        """Library-wide totals, plus each branch's own figures under 'branches'"""
+        per_branch = self._fan_out('get_statistics')
+        totals: Dict = {}
+        for stats in per_branch.values():
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        totals['branches'] = per_branch
+        return totals
+
+    def get_overdue_books(self) -> List[Dict]:
+        """Overdue loans from every branch, longest overdue first"""
+        overdue = [dict(row, branch=name)
+                   for name, rows in self._fan_out('get_overdue_books').items() for row in rows]
+        return sorted(overdue, key=lambda row: row['due_date'] or '')
+
+    def get_popular_books(self, limit: int = 5) -> List[Dict]:
+        """Most borrowed titles across branches, borrow counts summed per title.
+
+        Each branch first returns a short list of its own top titles. If a
+        title outside the merged top `limit` could still overtake it, the
+        branches are asked again for full counts (LIMIT -1), which costs the
+        same aggregate once more.
+        """
+        candidates = limit * 4
+        while True:
+            results = self._fan_out('get_popular_books', candidates)
+            merged: Dict[tuple, list] = {}  # key -> [first row seen, total count, per-branch counts]
+            cutoffs = {}  # lowest count returned by branches whose list was cut short
+            for name, books in results.items():
+                if candidates > 0 and len(books) == candidates:
+                    cutoffs[name] = books[-1]['borrow_count']
+                for book in books:
+                    entry = merged.setdefault(_book_key(book), [book, 0, {}])
+                    entry[1] += book['borrow_count']
+                    entry[2][name] = book['borrow_count']
+
+            ranked = sorted(merged.values(), key=lambda entry: -entry[1])
+            # Best case for any title outside the top `limit`: its known count
+            # plus the cutoff of every truncated branch it was not seen in
+            outside_best = max([sum(cutoffs.values())] + [
+                total + sum(c for n, c in cutoffs.items() if n not in counts)
+                for _, total, counts in ranked[limit:]
+            ]) if cutoffs else 0
+            if not cutoffs or (len(ranked) >= limit and ranked[limit - 1][1] >= outside_best):
+                return [dict(book, borrow_count=total, branches=counts) for book, total, counts in ranked[:limit]]
+            candidates = -1
+
+    def get_interbranch_loans(self, status: str = 'Issued') -> List[Dict]:
+        """Outgoing inter-branch loans recorded at every lending branch (status=None for all)"""
+        loans = []
+        for name, branch in self.branches.items():
+            conn = sqlite3.connect(branch.db_name, timeout=self.timeout)
+            conn.row_factory = sqlite3.Row
+            try:
+                rows = conn.execute("""
+                    SELECT * FROM interbranch_loans
+                    WHERE direction = 'out' AND (? IS NULL OR status = ?)
+                    ORDER BY due_date
+                """, (status, status)).fetchall()
+            finally:
+                conn.close()
+            loans.extend(dict(row, branch=name) for row in rows)
+        return loans
+
+    # ========== INTER-BRANCH LOANS ==========
+    def _connect_pair(self, branch: str, peer: str) -> DatabaseManager:
+        """A DatabaseManager on one branch with the other ATTACHed as `peer`;
+        unqualified table names (as in its copy methods) mean the first branch.
+
+        A transaction over both files commits atomically (in the default
+        rollback-journal mode; under WAL each file commits on its own).
+        """
+        for name in (branch, peer):
+            if name not in self.branches:
+                raise ValueError(f"Unknown branch: {name}")
+        if branch == peer:
+            raise ValueError("Use issue_book for loans within one branch")
+        db = DatabaseManager(self.branches[branch].db_name)
+        db.conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        db.cursor.execute("ATTACH DATABASE ? AS peer", (self.branches[peer].db_name,))
+        return db
+
+    def issue_interbranch(self, lending_branch: str, book_id: int, home_branch: str, member_id: int,
+                          issue_date: str = None, due_date: str = None) -> int:
+        """Lend a copy held at one branch to a member of another; returns the lending branch's loan id"""
+        if issue_date is None:
+            issue_date = datetime.now().date().isoformat()
+        if due_date is None:
+            due_date = (datetime.now().date() + timedelta(days=21)).isoformat()
+
+        db = self._connect_pair(lending_branch, home_branch)
+        cursor = db.cursor
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT isbn, title FROM main.books WHERE book_id = ?", (book_id,))
+            book = cursor.fetchone()
+            if not book:
+                raise ValueError("Book is not available")
+            cursor.execute("SELECT status FROM peer.members WHERE member_id = ?", (member_id,))
+            member = cursor.fetchone()
+            if not member:
+                raise ValueError(f"Member not found at branch {home_branch}")
+            if member[0] != 'Active':
+                raise ValueError("Member is not active")
+
+            # A shelf copy goes on loan, as for a loan within the branch
+            copy_id = db._take_copy(book_id)
+            cursor.execute("""
+                INSERT INTO main.interbranch_loans
+                    (direction, peer_branch, book_id, copy_id, isbn, title, member_id, issue_date, due_date)
+                VALUES ('out', ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (home_branch, book_id, copy_id, book[0], book[1], member_id, issue_date, due_date))
+            out_id = cursor.lastrowid
+            cursor.execute("""
+                INSERT INTO peer.interbranch_loans
+                    (direction, peer_branch, peer_loan_id, book_id, isbn, title, member_id, issue_date, due_date)
+                VALUES ('in', ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (lending_branch, out_id, book_id, book[0], book[1], member_id, issue_date, due_date))
+            cursor.execute("UPDATE main.interbranch_loans SET peer_loan_id = ? WHERE loan_id = ?",
+                           (cursor.lastrowid, out_id))
+            db.conn.commit()
+            return out_id
+        except Exception:
+            if db.conn.in_transaction:
+                db.conn.rollback()
+            raise
+        finally:
+            db.close()
+
+    def return_interbranch(self, lending_branch: str, loan_id: int, return_date: str = None,
+                           fine_amount: float = 0) -> Optional[int]:
+        """Return an inter-branch loan to the branch that lent it. The copy goes
+        to that branch's next waiting hold if there is one; returns that
+        reservation's id, or None"""
+        if return_date is None:
+            return_date = datetime.now().date().isoformat()
+        branch = self.branches.get(lending_branch)
+        if branch is None:
+            raise ValueError(f"Unknown branch: {lending_branch}")
+
+        lookup = sqlite3.connect(branch.db_name, timeout=self.timeout)
+        try:
+            loan = lookup.execute("""
+                SELECT peer_branch, peer_loan_id, book_id, status, copy_id FROM interbranch_loans
+                WHERE loan_id = ? AND direction = 'out'
+            """, (loan_id,)).fetchone()
+        finally:
+            lookup.close()
+        if not loan:
+            raise ValueError("Inter-branch loan not found")
+        if loan[3] == 'Returned':
+            raise ValueError("Inter-branch loan already returned")
+
+        db = self._connect_pair(lending_branch, loan[0])
+        cursor = db.cursor
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for schema, row_id in (('main', loan_id), ('peer', loan[1])):
+                cursor.execute(f"""
+                    UPDATE {schema}.interbranch_loans
+                    SET return_date = ?, fine_amount = ?, status = 'Returned'
+                    WHERE loan_id = ? AND status != 'Returned'
+                """, (return_date, fine_amount, row_id))
+                if schema == 'main' and cursor.rowcount == 0:
+                    # Returned by someone else since the lookup
+                    raise ValueError("Inter-branch loan already returned")
+            # Loans recorded before copies were tracked have no copy_id; the
+            # counter alone is restored for them, as in return_book
+            reservation_id = db._allocate_copy(loan[2], loan[4], return_date)
+            db.conn.commit()
+            return reservation_id
+        except Exception:
+            if db.conn.in_transaction:
+                db.conn.rollback()
+            raise
+        finally:
+            db.close()
+
+    def close(self):
+        for branch in self.branches.values():
+            branch.close()
+
+
+def _parse_branches(specs: List[str]) -> Dict[str, str]:
+    branches = {}
+    for spec in specs:
+        name, sep, path = spec.partition('=')
+        if not sep:
+            raise ValueError(f"Expected NAME=PATH, got {spec}")
+        branches[name] = path
+    return branches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query several branch databases at once")
+    parser.add_argument("--branch", action="append", required=True, help="NAME=PATH, repeatable")
+    parser.add_argument("command", choices=["search", "stats", "overdue", "popular", "loans"])
+    parser.add_argument("term", nargs="?", default="")
+    parser.add_argument("--by", default="title", choices=["title", "author", "isbn", "category", "all"])
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    federation = BranchFederation(_parse_branches(args.branch))
+    try:
+        if args.command == "search":
+            for book in federation.search_books(args.term, args.by)[:args.limit]:
+                holdings = ', '.join(f"{n}: {h['available_copies']}/{h['total_copies']}"
+                                     for n, h in book['holdings'].items())
+                print(f"{book['title']} - {book['author']} ({holdings})")
+        elif args.command == "stats":
+            stats = federation.get_statistics()
+            for name, branch_stats in stats.pop('branches').items():
+                print(f"{name}: {branch_stats}")
+            print(f"total: {stats}")
+        elif args.command == "overdue":
+            for row in federation.get_overdue_books():
+                print(f"[{row['branch']}] {row['due_date']} {row['book_title']} - {row['member_name']}")
+        elif args.command == "popular":
+            for book in federation.get_popular_books(args.limit):
+                print(f"{book['borrow_count']:6d}  {book['title']} {book['branches']}")
+        elif args.command == "loans":
+            for loan in federation.get_interbranch_loans():
+                print(f"[{loan['branch']} -> {loan['peer_branch']}] {loan['title']} due {loan['due_date']}")
+    finally:
+        federation.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+ISBN Utilities Module
+Validates ISBN-10/ISBN-13 checksums and converts between the two forms
+"""
+from typing import Optional
+
+
+def clean_isbn(isbn: str) -> str:
+    """Strip hyphens, spaces and other separators from an ISBN"""
+    if not isbn:
+        return ''
+    return ''.join(ch for ch in str(isbn).upper() if ch.isdigit() or ch == 'X')
+
+
+def _isbn10_check_digit(first_nine: str) -> str:
+    total = sum((10 - i) * int(d) for i, d in enumerate(first_nine))
+    check = (11 - total % 11) % 11
+    return 'X' if check == 10 else str(check)
+
+
+def _isbn13_check_digit(first_twelve: str) -> str:
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(first_twelve))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_isbn10(isbn: str) -> bool:
+    """Check an ISBN-10 (digits only, optional trailing X) against its checksum"""
+    isbn = clean_isbn(isbn)
+    if len(isbn) != 10 or not isbn[:9].isdigit():
+        return False
+    return _isbn10_check_digit(isbn[:9]) == isbn[9]
+
+
+def is_valid_isbn13(isbn: str) -> bool:
+    """Check an ISBN-13 against its checksum"""
+    isbn = clean_isbn(isbn)
+    if len(isbn) != 13 or not isbn.isdigit() or isbn[:3] not in ('978', '979'):
+        return False
+    return _isbn13_check_digit(isbn[:12]) == isbn[12]
+
+
+def isbn10_to_isbn13(isbn: str) -> Optional[str]:
+    """Convert a valid ISBN-10 to its 978-prefixed ISBN-13"""
+    isbn = clean_isbn(isbn)
+    if not is_valid_isbn10(isbn):
+        return None
+    core = '978' + isbn[:9]
+    return core + _isbn13_check_digit(core)
+
+
+def isbn13_to_isbn10(isbn: str) -> Optional[str]:
+    """Convert a valid 978-prefixed ISBN-13 to ISBN-10 (979 has no ISBN-10 form)"""
+    isbn = clean_isbn(isbn)
+    if not is_valid_isbn13(isbn) or not isbn.startswith('978'):
+        return None
+    core = isbn[3:12]
+    return core + _isbn10_check_digit(core)
+
+
+def to_isbn13(isbn: str) -> Optional[str]:
+    """Return the canonical ISBN-13 for any valid ISBN-10/13, or None if invalid"""
+    isbn = clean_isbn(isbn)
+    if len(isbn) == 13:
+        return isbn if is_valid_isbn13(isbn) else None
+    if len(isbn) == 10:
+        return isbn10_to_isbn13(isbn)
+    return None
+
+
+def isbn_key(isbn: str) -> str:
+    """Key for lookups and caches: the ISBN-13 if valid, else the cleaned input"""
+    return to_isbn13(isbn) or clean_isbn(isbn)
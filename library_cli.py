@@ -0,0 +1,473 @@
+"""
+Library CLI Module
+Non-interactive command line for batch work on the library database,
+replacing the input()-driven Library_Management.py menu
+
+  load    insert books/members/transactions/reviews from CSV or JSON Lines
+  update  change existing rows by primary key from CSV or JSON Lines
+  query   run a read-only SELECT and stream the rows as CSV or JSON Lines
+  export  write a whole dataset to a file (see export_manager.py)
+  vacuum  rebuild (or write a compacted copy of) the database file
+  reindex rebuild indexes and refresh planner statistics
+  duplicates  list groups of books that look catalogued more than once
+  reconcile   check the copy counters on books against the copies table
+
+Input is read from files or stdin ("-"), optionally compressed. Records are
+parsed and validated in chunks; with --workers N the chunks go to N worker
+processes while this process stays the single writer, committing one
+transaction per batch.
+
+Copy state follows the loans, not the counters in the input: loaded books
+get total_copies shelf copies (available_copies is ignored), each loaded
+open loan takes a copy of its book (a new one if none is on the shelf),
+and the counters are recounted from the copies, so reconcile finds
+nothing to fix afterwards.
+
+Usage: python library_cli.py load books new_books.csv --workers 4
+       cat members.jsonl | python library_cli.py load members - --format jsonl
+       python library_cli.py update books prices.csv
+       python library_cli.py query "SELECT * FROM books WHERE category = ?" --param Fiction
+       python library_cli.py duplicates --output review.jsonl
+       python library_cli.py reconcile --fix
+"""
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from db_manager import DatabaseManager
+from duplicate_index import DEFAULT_THRESHOLD
+from export_manager import COMPRESSORS, DATASETS, ExportManager, detect_format
+from isbn_utils import clean_isbn, to_isbn13
+
+# dataset -> [(column, type, required, default)]; load writes exactly these
+# columns, update accepts any subset of them
+FIELDS = {
+    'books': [
+        ('isbn', 'isbn', False, None),
+        ('title', 'text', True, None),
+        ('author', 'text', True, None),
+        ('publisher', 'text', False, ''),
+        ('publication_year', 'int', False, None),
+        ('category', 'text', False, ''),
+        ('description', 'text', False, ''),
+        ('cover_image_url', 'text', False, ''),
+        ('page_count', 'int', False, 0),
+        ('language', 'text', False, 'en'),
+        ('total_copies', 'int', False, 1),
+        ('available_copies', 'int', False, None),
+        ('shelf_location', 'text', False, ''),
+    ],
+    'members': [
+        ('membership_number', 'text', False, None),
+        ('first_name', 'text', True, None),
+        ('last_name', 'text', True, None),
+        ('email', 'text', False, None),
+        ('phone', 'text', False, ''),
+        ('address', 'text', False, ''),
+        ('join_date', 'date', False, None),
+        ('membership_type', 'text', False, 'Standard'),
+        ('status', 'text', False, 'Active'),
+        ('notify_preference', 'text', False, 'email'),
+        ('locale', 'text', False, 'en'),
+    ],
+    'transactions': [
+        ('member_id', 'int', True, None),
+        ('book_id', 'int', True, None),
+        ('issue_date', 'date', True, None),
+        ('due_date', 'date', True, None),
+        ('return_date', 'date', False, None),
+        ('fine_amount', 'float', False, 0.0),
+        ('status', 'text', False, None),
+    ],
+    'reviews': [
+        ('book_id', 'int', True, None),
+        ('member_id', 'int', True, None),
+        ('rating', 'int', True, None),
+        ('review_text', 'text', False, ''),
+        ('review_date', 'date', False, None),
+    ],
+}
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 2000
+
+
+# ========== PARSING AND VALIDATION (runs in worker processes) ==========
+def _convert(kind: str, value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None
+    if kind == 'int':
+        return int(value)
+    if kind == 'float':
+        return float(value)
+    if kind == 'date':
+        return date.fromisoformat(str(value)).isoformat()
+    if kind == 'isbn':
+        return clean_isbn(str(value)) or None
+    return str(value)
+
+
+def validate_record(dataset: str, record: Dict, mode: str = 'load') -> Dict:
+    """Typed, defaulted column values for one input record; raises ValueError"""
+    key = DATASETS[dataset][1]
+    values = {}
+    for column, kind, required, default in FIELDS[dataset]:
+        if mode == 'update' and column not in record:
+            continue
+        try:
+            value = _convert(kind, record.get(column))
+        except (TypeError, ValueError):
+            raise ValueError(f"{column}: invalid {kind} {record.get(column)!r}")
+        if value is None:
+            if mode == 'update':
+                # Blank cells leave the column unchanged
+                continue
+            if required:
+                raise ValueError(f"{column} is required")
+            value = default
+        values[column] = value
+
+    if mode == 'update':
+        try:
+            values[key] = int(record[key])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{key} is required for updates")
+        if len(values) == 1:
+            raise ValueError("nothing to update")
+    elif dataset == 'books' and values['available_copies'] is None:
+        values['available_copies'] = values['total_copies']
+    elif dataset == 'transactions' and values['status'] is None:
+        values['status'] = 'Returned' if values['return_date'] else 'Issued'
+
+    if dataset == 'books' and 'isbn' in values:
+        values['isbn13'] = to_isbn13(values['isbn']) or ''
+    if dataset == 'reviews' and values.get('rating') is not None and not 1 <= values['rating'] <= 5:
+        raise ValueError("rating must be between 1 and 5")
+    if dataset == 'members' and values.get('notify_preference') not in (None, 'email', 'sms', 'both', 'none'):
+        raise ValueError(f"notify_preference: unknown value {values['notify_preference']!r}")
+    return values
+
+
+def load_columns(dataset: str) -> Tuple[str, ...]:
+    columns = tuple(column for column, _, _, _ in FIELDS[dataset])
+    return columns + ('isbn13',) if dataset == 'books' else columns
+
+
+def process_chunk(task: Tuple) -> Tuple[list, list]:
+    """Parse and validate one chunk of input.
+
+    Returns (rows, errors): rows are tuples in load_columns() order for
+    load and dicts for update; errors are (record number, message) pairs.
+    """
+    dataset, mode, fmt, first_record, items = task
+    columns = load_columns(dataset)
+    rows, errors = [], []
+    for offset, item in enumerate(items):
+        try:
+            record = json.loads(item) if fmt == 'jsonl' else item
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            values = validate_record(dataset, record, mode)
+        except ValueError as e:  # includes JSONDecodeError
+            errors.append((first_record + offset, str(e)))
+            continue
+        rows.append(values if mode == 'update' else tuple(values[c] for c in columns))
+    return rows, errors
+
+
+# ========== INPUT ==========
+def open_input(filename: str, fmt: Optional[str]) -> Tuple[io.TextIOBase, str]:
+    """Text stream and format for a file name or "-" (stdin)"""
+    if filename == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline=''), fmt or 'csv'
+    detected_fmt, compression = detect_format(filename)
+    return COMPRESSORS[compression](filename, 'rt', encoding='utf-8', newline=''), fmt or detected_fmt
+
+
+def read_chunks(dataset: str, mode: str, filenames: List[str], fmt: Optional[str],
+                chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple]:
+    """Chunks of raw records, ready for process_chunk. JSON Lines stay as
+    raw lines so decoding happens in the workers; CSV is split into dicts
+    here, since quoted fields may span lines."""
+    for filename in filenames:
+        stream, file_fmt = open_input(filename, fmt)
+        if file_fmt not in FORMATS:
+            raise ValueError(f"Unknown input format: {file_fmt}")
+        with stream:
+            if file_fmt == 'csv':
+                records = csv.DictReader(stream)
+            else:
+                records = (line for line in stream if line.strip())
+            first_record = 1
+            while True:
+                items = list(islice(records, chunk_size))
+                if not items:
+                    break
+                yield dataset, mode, file_fmt, first_record, items
+                first_record += len(items)
+
+
+def process_chunks(tasks: Iterable[Tuple], workers: int) -> Iterator[Tuple[list, list]]:
+    """process_chunk over every task, in input order. With workers, at most
+    two chunks per worker are in flight so memory stays bounded."""
+    if workers <= 0:
+        for task in tasks:
+            yield process_chunk(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(process_chunk, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ========== COMMANDS ==========
+class BatchWriter:
+    """The single writer: buffers validated rows and commits them in batches"""
+
+    def __init__(self, db: DatabaseManager, dataset: str, mode: str, batch_size: int,
+                 ignore_conflicts: bool = False):
+        self.db = db
+        self.table, self.key = DATASETS[dataset]
+        self.columns = load_columns(dataset)
+        self.mode = mode
+        self.batch_size = batch_size
+        self.ignore_conflicts = ignore_conflicts
+        self.buffer = []
+        self.written = 0
+
+    def add(self, rows: list):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.mode == 'update':
+            self.written += self.db.bulk_update(self.table, self.key, self.buffer)
+        else:
+            self.written += self.db.bulk_insert(self.table, self.columns, self.buffer, self.ignore_conflicts)
+        self.buffer = []
+
+
+def run_write(args) -> int:
+    mode = args.command
+    db = DatabaseManager(args.db)
+    writer = BatchWriter(db, args.dataset, mode, args.batch_size,
+                         ignore_conflicts=getattr(args, 'skip_duplicates', False))
+    rejects = open(args.rejects, 'w', encoding='utf-8') if args.rejects else None
+    seen = rejected = 0
+    start = time.perf_counter()
+    try:
+        tasks = read_chunks(args.dataset, mode, args.files, args.format, args.chunk_size)
+        for rows, errors in process_chunks(tasks, args.workers):
+            seen += len(rows) + len(errors)
+            for number, message in errors:
+                rejected += 1
+                if rejects:
+                    rejects.write(json.dumps({'record': number, 'error': message}) + '\n')
+                elif rejected <= 20:
+                    print(f"record {number}: {message}", file=sys.stderr)
+            if errors and args.strict:
+                raise ValueError(f"{len(errors)} invalid records (first at record {errors[0][0]}); "
+                                 f"nothing after the last committed batch was written")
+            writer.add(rows)
+        writer.flush()
+    except sqlite3.IntegrityError as e:
+        raise ValueError(f"{e}; the {writer.written} rows in earlier batches were committed "
+                         f"(use --skip-duplicates to skip clashing rows)")
+    finally:
+        if rejects:
+            rejects.close()
+        db.close()
+
+    elapsed = time.perf_counter() - start
+    verb = 'Updated' if mode == 'update' else 'Loaded'
+    print(f"{verb} {writer.written} of {seen} {args.dataset} records ({rejected} rejected) "
+          f"in {elapsed:.2f}s ({seen / elapsed if elapsed else 0:.0f} records/s)", file=sys.stderr)
+    return 0
+
+
+def run_query(args) -> int:
+    db = DatabaseManager(args.db)
+    try:
+        db.conn.execute("PRAGMA query_only = ON")
+        cursor = db.conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(args.sql, args.param or [])
+        if cursor.description is None:
+            raise ValueError("query must return rows")
+        columns = [d[0] for d in cursor.description]
+        out = sys.stdout
+        if args.format == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(columns)
+        count = 0
+        while True:
+            size = min(1000, args.limit - count) if args.limit else 1000
+            rows = cursor.fetchmany(size) if size > 0 else []
+            if not rows:
+                break
+            if args.format == 'csv':
+                writer.writerows(rows)
+            else:
+                out.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+            count += len(rows)
+        print(f"{count} rows", file=sys.stderr)
+    finally:
+        db.close()
+    return 0
+
+
+def run_export(args) -> int:
+    result = ExportManager(args.db).export(args.dataset, args.output, args.format, args.compression,
+                                           args.incremental)
+    print(f"Exported {result['rows']} {result['dataset']} rows to {result['file']}", file=sys.stderr)
+    return 0
+
+
+def run_vacuum(args) -> int:
+    db = DatabaseManager(args.db)
+    try:
+        start = time.perf_counter()
+        db.vacuum(args.into)
+        print(f"Vacuumed {args.into or args.db} in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    finally:
+        db.close()
+    return 0
+
+
+def run_reindex(args) -> int:
+    db = DatabaseManager(args.db)
+    try:
+        start = time.perf_counter()
+        db.reindex(args.name)
+        print(f"Reindexed {args.name or 'all indexes'} in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    finally:
+        db.close()
+    return 0
+
+
+def run_duplicates(args) -> int:
+    db = DatabaseManager(args.db)
+    out = open(args.output, 'w', encoding='utf-8') if args.output != '-' else sys.stdout
+    try:
+        start = time.perf_counter()
+        clusters = books = 0
+        for cluster in db.get_duplicate_clusters(args.threshold):
+            clusters += 1
+            books += len(cluster)
+            out.write(json.dumps({'cluster': clusters, 'books': [
+                {column: book[column] for column in ('book_id', 'isbn', 'title', 'author', 'publication_year',
+                                                     'total_copies', 'similarity')}
+                for book in cluster]}) + '\n')
+        print(f"Found {clusters} groups covering {books} books in {time.perf_counter() - start:.2f}s",
+              file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+    return 0
+
+
+def run_reconcile(args) -> int:
+    db = DatabaseManager(args.db)
+    try:
+        start = time.perf_counter()
+        report = db.reconcile_copies(fix=args.fix)
+        for book in report['mismatched']:
+            print(f"{book['book_id']}\t{book['title']}\ttotal {book['total_copies']} -> {book['copies_in_stock']}"
+                  f"\tavailable {book['available_copies']} -> {book['copies_on_shelf']}")
+        print(f"{len(report['mismatched'])} books with wrong counters"
+              f"{' (fixed)' if args.fix and report['mismatched'] else ''}, "
+              f"{report['unlinked_loans']} open loans without an on-loan copy, "
+              f"checked in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    finally:
+        db.close()
+    return 1 if report['unlinked_loans'] or (report['mismatched'] and not args.fix) else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batch operations on the library database")
+    parser.add_argument("--db", default="library.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("load", "insert records"), ("update", "update records by primary key")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("dataset", choices=sorted(FIELDS))
+        command.add_argument("files", nargs="*", default=["-"], help="input files, or - for stdin")
+        command.add_argument("--format", choices=FORMATS, help="default: from the file name (csv for stdin)")
+        command.add_argument("--workers", type=int, default=0,
+                             help="processes for parsing and validation (0 = this process)")
+        command.add_argument("--batch-size", type=int, default=5000, help="rows per committed transaction")
+        command.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="records per worker task")
+        command.add_argument("--rejects", help="write rejected records to this JSON Lines file")
+        command.add_argument("--strict", action="store_true", help="stop at the first invalid record")
+        if name == "load":
+            command.add_argument("--skip-duplicates", action="store_true",
+                                 help="skip rows that clash with an existing unique key")
+        command.set_defaults(run=run_write)
+
+    command = commands.add_parser("query", help="run a read-only SQL query")
+    command.add_argument("sql")
+    command.add_argument("--param", action="append", help="query parameter (repeatable)")
+    command.add_argument("--format", choices=FORMATS, default="csv")
+    command.add_argument("--limit", type=int, default=0)
+    command.set_defaults(run=run_query)
+
+    command = commands.add_parser("export", help="export a dataset to a file")
+    command.add_argument("dataset", choices=sorted(DATASETS))
+    command.add_argument("output", help="output file; .csv/.jsonl with optional .gz/.bz2/.xz")
+    command.add_argument("--format", choices=FORMATS)
+    command.add_argument("--compression", choices=sorted(COMPRESSORS))
+    command.add_argument("--incremental", action="store_true")
+    command.set_defaults(run=run_export)
+
+    command = commands.add_parser("vacuum", help="rebuild the database file")
+    command.add_argument("--into", help="write a compacted copy here instead")
+    command.set_defaults(run=run_vacuum)
+
+    command = commands.add_parser("reindex", help="rebuild indexes and refresh statistics")
+    command.add_argument("name", nargs="?", help="a table or index (default: all)")
+    command.set_defaults(run=run_reindex)
+
+    command = commands.add_parser("duplicates", help="group books that look like duplicates, for review")
+    command.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help="minimum title/author similarity, 0-1")
+    command.add_argument("--output", default="-", help="JSON Lines file, one group per line (default: stdout)")
+    command.set_defaults(run=run_duplicates)
+
+    command = commands.add_parser("reconcile", help="check book copy counters against the copies table")
+    command.add_argument("--fix", action="store_true", help="reset the counters from the copies")
+    command.set_defaults(run=run_reconcile)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
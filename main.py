@@ -1,50 +1,107 @@
 """
 Library Management System - Main Application
 Integrated GUI with Database and API Integration
+
+Usage: python main.py [--db library.db]
+       python main.py --replica-of //server/library/library.db [--replica replica.db]
+       python main.py --profile [--profile-report profile_report.txt] [--stall-ms 200]
+       python main.py --db-profile desk
 """
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, simpledialog
-from PIL import Image, ImageTk
-import requests
 from io import BytesIO
 from datetime import datetime, timedelta
 import threading
 
-from db_manager import DatabaseManager
-from book_api import BookAPI
+from db_manager import PERFORMANCE_PROFILES, DatabaseManager
 from notifications import NotificationManager
 
+# PIL, requests and book_api (which pulls in requests) are imported on first
+# use so that startup only pays for tkinter and sqlite3.
+
+
+def load_cover_photo(url: str, size: tuple):
+    """Download a cover image and return a Tk PhotoImage thumbnail"""
+    import requests
+    from PIL import Image, ImageTk
+
+    response = requests.get(url, timeout=5)
+    img = Image.open(BytesIO(response.content))
+    img.thumbnail(size)
+    return ImageTk.PhotoImage(img)
+
 
 class LibraryManagementSystem(tk.Tk):
-    def __init__(self):
+    def __init__(self, db_name: str = "library.db", db=None):
         super().__init__()
         self.title("📚 Library Management System")
         self.geometry("1200x900")
         self.config(bg="#f5f5f5")
 
         # Initialize modules
-        self.db = DatabaseManager()
-        self.book_api = BookAPI()
+        # db, if given, stands in for the DatabaseManager (e.g. a ReplicaDatabase)
+        self.db = db or DatabaseManager(db_name)
+        self._book_api = None
+        self._analytics = None
         self.notifications = NotificationManager()
 
+        # Widgets that belong to tabs which have not been built yet
+        self.stats_label = None
+        self.books_tree = None
+        self.members_tree = None
+        self.transactions_tree = None
+        self.reviews_tree = None
+        self.reports_summary = None
+
         # Create notebook for tabs
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill="both", expand=True, padx=10, pady=10)
 
-        # Create tabs
-        self.create_dashboard_tab()
-        self.create_book_management_tab()
-        self.create_member_management_tab()
-        self.create_transaction_tab()
-        self.create_reviews_tab()
-
-        # Refresh dashboard on startup
-        self.refresh_dashboard()
+        # Tabs are added as empty frames and built on first activation
+        self._tab_builders = {}
+        for text, builder in (
+            ("📊 Dashboard", self.create_dashboard_tab),
+            ("📚 Book Management", self.create_book_management_tab),
+            ("👥 Member Management", self.create_member_management_tab),
+            ("📖 Transactions", self.create_transaction_tab),
+            ("⭐ Reviews", self.create_reviews_tab),
+            ("📈 Reports", self.create_reports_tab),
+        ):
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=text)
+            self._tab_builders[str(frame)] = (frame, builder)
+
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        # Build the initially selected tab once the window has been drawn
+        self.after_idle(self.on_tab_changed)
+        self.after_idle(self.expire_holds)
+
+    @property
+    def book_api(self):
+        """Book API client, created on first lookup"""
+        if self._book_api is None:
+            from book_api import BookAPI
+            self._book_api = BookAPI()
+        return self._book_api
+
+    @property
+    def analytics(self):
+        """Rollup-backed analytics, created when the Reports tab is first built"""
+        if self._analytics is None:
+            from analytics import AnalyticsManager
+            self._analytics = AnalyticsManager(self.db.db_name)
+        return self._analytics
+
+    def on_tab_changed(self, event=None):
+        """Build a tab the first time it is selected"""
+        selected = self.notebook.select()
+        entry = self._tab_builders.pop(selected, None)
+        if entry:
+            frame, builder = entry
+            builder(frame)
 
     # ========== DASHBOARD TAB ==========
-    def create_dashboard_tab(self):
-        dashboard_frame = ttk.Frame(self.notebook)
-        self.notebook.add(dashboard_frame, text="📊 Dashboard")
+    def create_dashboard_tab(self, dashboard_frame):
 
         # Title
         title_label = tk.Label(
@@ -126,8 +183,13 @@ class LibraryManagementSystem(tk.Tk):
         self.popular_list = tk.Listbox(popular_frame, height=6, font=("Arial", 11))
         self.popular_list.pack(fill="both", expand=True)
 
+        self.refresh_dashboard()
+
     def refresh_dashboard(self):
         """Refresh dashboard statistics and data"""
+        if self.stats_label is None:
+            return
+
         stats = self.db.get_statistics()
         stats_text = f"""
 📚 Total Books: {stats['total_books']}
@@ -158,9 +220,7 @@ class LibraryManagementSystem(tk.Tk):
             self.popular_list.insert(tk.END, f"{book['title']} by {book['author']}")
 
     # ========== BOOK MANAGEMENT TAB ==========
-    def create_book_management_tab(self):
-        book_frame = ttk.Frame(self.notebook)
-        self.notebook.add(book_frame, text="📚 Book Management")
+    def create_book_management_tab(self, book_frame):
 
         # Top buttons
         btn_frame = tk.Frame(book_frame, bg="#e3f2fd")
@@ -193,6 +253,9 @@ class LibraryManagementSystem(tk.Tk):
 
     def refresh_books_table(self):
         """Refresh books table"""
+        if self.books_tree is None:
+            return
+
         for item in self.books_tree.get_children():
             self.books_tree.delete(item)
         
@@ -231,6 +294,13 @@ class LibraryManagementSystem(tk.Tk):
                 messagebox.showerror("Error", "Please enter an ISBN")
                 return
             
+            # Scanned or typed ISBN-10/13 of a book we already hold
+            existing = self.db.get_book_by_isbn(isbn)
+            if existing:
+                status_label.config(text="Already in catalogue", fg="orange")
+                messagebox.showinfo("Already Exists", f"'{existing['title']}' (ID {existing['book_id']}) is already in the catalogue.")
+                return
+
             status_label.config(text="Searching...", fg="blue")
             win.update()
 
@@ -332,10 +402,7 @@ class LibraryManagementSystem(tk.Tk):
 
         def display_cover_image(url):
             try:
-                response = requests.get(url, timeout=5)
-                img = Image.open(BytesIO(response.content))
-                img.thumbnail((150, 200))
-                photo = ImageTk.PhotoImage(img)
+                photo = load_cover_photo(url, (150, 200))
                 cover_label.config(image=photo, text="")
                 cover_label.image = photo
             except:
@@ -381,11 +448,22 @@ class LibraryManagementSystem(tk.Tk):
                     messagebox.showerror("Error", "Title is required")
                     return
 
-                self.db.add_book(book_data)
-                messagebox.showinfo("Success", "Book added successfully!")
+                # Same book under a slightly different title, or without an ISBN
+                similar = self.db.find_similar_books(book_data['title'], book_data['author'], limit=3)
+                if similar:
+                    listing = "\n".join(f"  {b['title']} by {b['author']} (ID {b['book_id']}, "
+                                        f"{b['similarity']:.0%} similar)" for b in similar)
+                    if not messagebox.askyesno("Possible Duplicate",
+                                               f"The catalogue already has:\n{listing}\n\nAdd this book anyway?"):
+                        return
+
+                book_id = self.db.add_book(book_data)
                 self.refresh_books_table()
                 self.refresh_dashboard()
                 win.destroy()
+                if messagebox.askyesno("Success", "Book added successfully!\n\n"
+                                                  "Announce this arrival to all members?"):
+                    self.announce_new_book(book_id)
             except ValueError as e:
                 messagebox.showerror("Error", str(e))
             except Exception as e:
@@ -496,7 +574,6 @@ class LibraryManagementSystem(tk.Tk):
 
         fields = [
             ("Total Copies:", "total_copies"),
-            ("Available Copies:", "available_copies"),
             ("Shelf Location:", "shelf_location")
         ]
 
@@ -514,7 +591,6 @@ class LibraryManagementSystem(tk.Tk):
             try:
                 update_data = {
                     'total_copies': int(entries['total_copies'].get()) if entries['total_copies'].get().strip() else book['total_copies'],
-                    'available_copies': int(entries['available_copies'].get()) if entries['available_copies'].get().strip() else book['available_copies'],
                     'shelf_location': entries['shelf_location'].get().strip() or book.get('shelf_location', '')
                 }
                 self.db.update_book(book_id, update_data)
@@ -545,32 +621,49 @@ class LibraryManagementSystem(tk.Tk):
         self.open_book_details_window(book_id)
     
     def export_books_csv(self):
-        """Export books to CSV file"""
+        """Export books to CSV (or JSON Lines / compressed) in the background"""
+        from tkinter import filedialog
+        from export_manager import ExportManager, ExportJob
+
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines", "*.jsonl"),
+                       ("Compressed CSV", "*.csv.gz"), ("All files", "*.*")],
+            title="Export Books"
+        )
+
+        if not filename:
+            return
+
         try:
-            from tkinter import filedialog
-            import csv
-            
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                title="Export Books to CSV"
-            )
-            
-            if not filename:
-                return
-            
-            books = self.db.get_all_books()
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['book_id', 'isbn', 'title', 'author', 'publisher', 'publication_year', 
-                             'category', 'page_count', 'language', 'total_copies', 'available_copies', 'shelf_location']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for book in books:
-                    writer.writerow({k: book.get(k, '') for k in fieldnames})
-            
-            messagebox.showinfo("Success", f"Exported {len(books)} books to {filename}")
+            job = ExportJob(ExportManager(self.db.db_name), 'books', filename).start()
         except Exception as e:
             messagebox.showerror("Error", f"Error exporting books: {e}")
+            return
+
+        win = tk.Toplevel(self)
+        win.title("Exporting Books")
+        win.geometry("350x120")
+        progress_label = tk.Label(win, text="Starting export...", font=("Arial", 10))
+        progress_label.pack(pady=10)
+        progress_bar = ttk.Progressbar(win, length=300, mode="determinate")
+        progress_bar.pack(pady=5)
+        win.protocol("WM_DELETE_WINDOW", job.cancel)
+
+        def poll():
+            if not job.done:
+                if job.total_rows:
+                    progress_bar["value"] = 100 * job.rows_written / job.total_rows
+                progress_label.config(text=f"Exported {job.rows_written} of {job.total_rows} books")
+                self.after(100, poll)
+                return
+            win.destroy()
+            if job.error:
+                messagebox.showerror("Error", f"Error exporting books: {job.error}")
+            else:
+                messagebox.showinfo("Success", f"Exported {job.result['rows']} books to {filename}")
+
+        poll()
     
     def open_book_details_window(self, book_id):
         """Open detailed book view window"""
@@ -598,10 +691,7 @@ class LibraryManagementSystem(tk.Tk):
         # Load cover image if available
         if book.get('cover_image_url'):
             try:
-                response = requests.get(book['cover_image_url'], timeout=5)
-                img = Image.open(BytesIO(response.content))
-                img.thumbnail((200, 300))
-                photo = ImageTk.PhotoImage(img)
+                photo = load_cover_photo(book['cover_image_url'], (200, 300))
                 cover_label.config(image=photo, text="")
                 cover_label.image = photo
             except:
@@ -615,7 +705,12 @@ class LibraryManagementSystem(tk.Tk):
         tk.Label(right_frame, text=book['title'], font=("Arial", 18, "bold"), bg="white", wraplength=400).pack(anchor="w", pady=(0, 5))
         
         # Author
-        tk.Label(right_frame, text=f"By: {book['author']}", font=("Arial", 14), bg="white", fg="#666").pack(anchor="w", pady=(0, 10))
+        tk.Label(right_frame, text=f"By: {book['author']}", font=("Arial", 14), bg="white", fg="#666").pack(anchor="w", pady=(0, 5))
+        authors_frame = tk.Frame(right_frame, bg="white")
+        authors_frame.pack(anchor="w", pady=(0, 10))
+        for author in self.db.get_book_authors(book_id):
+            ttk.Button(authors_frame, text=f"About {author['name']}",
+                       command=lambda author_id=author['author_id']: self.open_author_window(author_id)).pack(side="left", padx=(0, 5))
         
         # Details grid
         details_frame = tk.Frame(right_frame, bg="white")
@@ -630,6 +725,7 @@ class LibraryManagementSystem(tk.Tk):
             ("Page Count:", str(book.get('page_count', 'N/A'))),
             ("Total Copies:", str(book.get('total_copies', 0))),
             ("Available Copies:", str(book.get('available_copies', 0))),
+            ("Holds:", str(len(self.db.get_book_holds(book_id)))),
             ("Shelf Location:", book.get('shelf_location', 'N/A'))
         ]
         
@@ -650,12 +746,33 @@ class LibraryManagementSystem(tk.Tk):
         reviews_frame = tk.LabelFrame(right_frame, text="Reviews", font=("Arial", 12, "bold"), bg="white")
         reviews_frame.pack(fill="x", pady=10)
         
-        reviews = self.db.get_book_reviews(book_id)
-        if reviews:
-            for review in reviews[:3]:  # Show top 3 reviews
-                rating_stars = "⭐" * review['rating'] + "☆" * (5 - review['rating'])
-                review_text = f"{review.get('member_name', 'Anonymous')} - {rating_stars}\n{review.get('review_text', '')[:100]}..."
-                tk.Label(reviews_frame, text=review_text, font=("Arial", 9), bg="white", wraplength=400, justify="left").pack(anchor="w", padx=10, pady=5)
+        rating = self.db.get_book_rating(book_id)
+        if rating['review_count']:
+            tk.Label(reviews_frame, text=f"⭐ {rating['average']:.1f} / 5 ({rating['review_count']} reviews)",
+                     font=("Arial", 10, "bold"), bg="white").pack(anchor="w", padx=10, pady=(5, 0))
+            most = max(rating['histogram'])
+            for stars in range(5, 0, -1):
+                count = rating['histogram'][stars - 1]
+                bar = "█" * round(20 * count / most)
+                tk.Label(reviews_frame, text=f"{stars}★ {bar} {count}", font=("Courier", 8), bg="white").pack(anchor="w", padx=10)
+
+            # Three reviews at a time, newest first
+            page = {'before': None}
+
+            def show_more():
+                reviews = self.db.get_book_reviews(book_id, limit=3, before=page['before'])
+                for review in reviews:
+                    rating_stars = "⭐" * review['rating'] + "☆" * (5 - review['rating'])
+                    review_text = f"{review.get('member_name', 'Anonymous')} - {rating_stars}\n{(review.get('review_text') or '')[:100]}..."
+                    tk.Label(reviews_frame, text=review_text, font=("Arial", 9), bg="white", wraplength=400, justify="left").pack(anchor="w", padx=10, pady=5, before=more_btn)
+                if reviews:
+                    page['before'] = reviews[-1]['review_id']
+                if len(reviews) < 3:
+                    more_btn.pack_forget()
+
+            more_btn = ttk.Button(reviews_frame, text="Older Reviews", command=show_more)
+            more_btn.pack(anchor="w", padx=10, pady=5)
+            show_more()
         else:
             tk.Label(reviews_frame, text="No reviews yet", font=("Arial", 10), bg="white", fg="#999").pack(pady=10)
         
@@ -666,10 +783,66 @@ class LibraryManagementSystem(tk.Tk):
         ttk.Button(btn_frame, text="Add Review", command=lambda: (win.destroy(), self.open_add_review_window())).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Close", command=win.destroy).pack(side="right", padx=5)
 
+    def open_author_window(self, author_id: int):
+        """Author details (from the authors table, refreshed from Open Library
+        when stale) and the author's books in the catalogue"""
+        author = self.db.get_author(author_id)
+        if not author:
+            messagebox.showerror("Error", "Author not found")
+            return
+
+        win = tk.Toplevel(self)
+        win.title(f"Author: {author['name']}")
+        win.geometry("600x450")
+        win.config(bg="white")
+
+        tk.Label(win, text=author['name'], font=("Arial", 18, "bold"), bg="white").pack(anchor="w", padx=20, pady=(20, 5))
+        info_label = tk.Label(win, text="Loading author details...", font=("Arial", 10), bg="white", fg="#666", justify="left")
+        info_label.pack(anchor="w", padx=20, pady=(0, 10))
+
+        columns = ("ID", "Title", "Year", "Available")
+        tree = ttk.Treeview(win, columns=columns, show="headings", height=12)
+        for col in columns:
+            tree.heading(col, text=col)
+        tree.column("ID", width=50)
+        tree.column("Title", width=330)
+        tree.column("Year", width=70)
+        tree.column("Available", width=80)
+        tree.pack(fill="both", expand=True, padx=20, pady=(0, 10))
+        for book in self.db.get_author_books(author_id):
+            tree.insert("", "end", values=(book['book_id'], book['title'], book['publication_year'] or "",
+                                           f"{book['available_copies']}/{book['total_copies']}"))
+        tree.bind("<Double-1>", lambda e: tree.selection() and self.open_book_details_window(
+            tree.item(tree.selection()[0])['values'][0]))
+
+        def show_info(info):
+            if not info_label.winfo_exists():
+                return
+            if not info:
+                info_label.config(text="No further details available")
+                return
+            lines = []
+            if info.get('birth_date') or info.get('death_date'):
+                lines.append(f"{info.get('birth_date') or '?'} - {info.get('death_date') or ''}")
+            if info.get('top_work'):
+                lines.append(f"Best known for: {info['top_work']}")
+            if info.get('work_count'):
+                lines.append(f"Works: {info['work_count']}")
+            info_label.config(text="\n".join(lines) or "No further details available")
+
+        # Cached rows answer immediately; only a stale or missing entry goes to the network
+        def fetch_info():
+            db = DatabaseManager(self.db.db_name)
+            try:
+                info = self.book_api.get_author_info(author['name'], db=db)
+            finally:
+                db.close()
+            win.after(0, lambda: show_info(info))
+
+        threading.Thread(target=fetch_info, daemon=True).start()
+
     # ========== MEMBER MANAGEMENT TAB ==========
-    def create_member_management_tab(self):
-        member_frame = ttk.Frame(self.notebook)
-        self.notebook.add(member_frame, text="👥 Member Management")
+    def create_member_management_tab(self, member_frame):
 
         btn_frame = tk.Frame(member_frame, bg="#f3e5f5")
         btn_frame.pack(fill="x", padx=20, pady=10)
@@ -698,6 +871,9 @@ class LibraryManagementSystem(tk.Tk):
 
     def refresh_members_table(self):
         """Refresh members table"""
+        if self.members_tree is None:
+            return
+
         for item in self.members_tree.get_children():
             self.members_tree.delete(item)
         
@@ -747,6 +923,16 @@ class LibraryManagementSystem(tk.Tk):
         entries['membership_type'].insert(0, "Standard")
         entries['status'].insert(0, "Active")
 
+        tk.Label(form_frame, text="Notify By:", font=("Arial", 10)).grid(row=row, column=0, sticky="w", pady=5)
+        notify_var = tk.StringVar(value="email")
+        ttk.Combobox(form_frame, textvariable=notify_var, values=["email", "sms", "both", "none"],
+                     state="readonly", width=27).grid(row=row, column=1, pady=5)
+        row += 1
+        tk.Label(form_frame, text="Language:", font=("Arial", 10)).grid(row=row, column=0, sticky="w", pady=5)
+        locale_var = tk.StringVar(value="en")
+        ttk.Combobox(form_frame, textvariable=locale_var, values=self.notifications.templates.locales(),
+                     state="readonly", width=27).grid(row=row, column=1, pady=5)
+
         def save_member():
             try:
                 member_data = {
@@ -757,7 +943,9 @@ class LibraryManagementSystem(tk.Tk):
                     'phone': entries['phone'].get().strip(),
                     'address': entries['address'].get().strip(),
                     'membership_type': entries['membership_type'].get().strip() or 'Standard',
-                    'status': entries['status'].get().strip() or 'Active'
+                    'status': entries['status'].get().strip() or 'Active',
+                    'notify_preference': notify_var.get(),
+                    'locale': locale_var.get()
                 }
 
                 if not member_data['first_name'] or not member_data['last_name']:
@@ -902,22 +1090,10 @@ class LibraryManagementSystem(tk.Tk):
         reminder_frame = tk.LabelFrame(win, text="Send Reminders", padx=20, pady=15)
         reminder_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
-        def send_overdue_reminders():
-            overdue = self.db.get_overdue_books()
-            if not overdue:
-                messagebox.showinfo("Info", "No overdue books")
-                return
-            
-            results = self.notifications.send_bulk_due_reminders(overdue)
-            sent_count = sum(1 for r in results if r['sent'])
-            messagebox.showinfo("Reminders Sent", f"Sent {sent_count} out of {len(results)} reminders")
-
-        ttk.Button(reminder_frame, text="Send Overdue Reminders", command=send_overdue_reminders).pack(pady=10)
+        ttk.Button(reminder_frame, text="Send Overdue Reminders", command=self.send_due_reminders).pack(pady=10)
 
     # ========== TRANSACTION TAB ==========
-    def create_transaction_tab(self):
-        txn_frame = ttk.Frame(self.notebook)
-        self.notebook.add(txn_frame, text="📖 Transactions")
+    def create_transaction_tab(self, txn_frame):
 
         btn_frame = tk.Frame(txn_frame, bg="#fff3e0")
         btn_frame.pack(fill="x", padx=20, pady=10)
@@ -946,6 +1122,9 @@ class LibraryManagementSystem(tk.Tk):
 
     def refresh_transactions_table(self):
         """Refresh transactions table"""
+        if self.transactions_tree is None:
+            return
+
         for item in self.transactions_tree.get_children():
             self.transactions_tree.delete(item)
         
@@ -986,13 +1165,13 @@ class LibraryManagementSystem(tk.Tk):
         member_combo.grid(row=0, column=1, pady=5)
         member_combo.current(0)
 
-        # Book selection with dropdown (only available books)
+        # Book selection with dropdown (books on loan can be reserved)
         tk.Label(form_frame, text="Book:", font=("Arial", 10)).grid(row=1, column=0, sticky="w", pady=5)
         book_var = tk.StringVar()
-        books = [b for b in self.db.get_all_books() if b['available_copies'] > 0]
+        books = self.db.get_all_books()
         book_options = [f"{b['book_id']}: {b['title']} by {b['author']} (Available: {b['available_copies']})" for b in books]
         if not book_options:
-            messagebox.showwarning("Warning", "No available books. All books are currently issued.")
+            messagebox.showwarning("Warning", "No books in the catalogue. Please add books first.")
             win.destroy()
             return
         book_combo = ttk.Combobox(form_frame, textvariable=book_var, values=book_options, state="readonly", width=40)
@@ -1011,10 +1190,23 @@ class LibraryManagementSystem(tk.Tk):
         due_date_entry.insert(0, (datetime.now().date() + timedelta(days=14)).isoformat())
         due_date_entry.grid(row=3, column=1, pady=5)
 
+        # A scanned copy barcode overrides the book selection
+        tk.Label(form_frame, text="Copy Barcode:", font=("Arial", 10)).grid(row=4, column=0, sticky="w", pady=5)
+        barcode_entry = tk.Entry(form_frame, width=30, font=("Arial", 10))
+        barcode_entry.grid(row=4, column=1, pady=5)
+
         def issue_book():
             try:
                 member_id = int(member_var.get().split(":")[0])
-                book_id = int(book_var.get().split(":")[0])
+                barcode = barcode_entry.get().strip() or None
+                if barcode:
+                    copy = self.db.get_copy(barcode)
+                    if not copy:
+                        messagebox.showerror("Error", f"No copy with barcode {barcode}")
+                        return
+                    book_id = copy['book_id']
+                else:
+                    book_id = int(book_var.get().split(":")[0])
                 issue_date = issue_date_entry.get().strip()
                 due_date = due_date_entry.get().strip()
 
@@ -1036,11 +1228,18 @@ class LibraryManagementSystem(tk.Tk):
                 if not book:
                     messagebox.showerror("Error", "Book not found")
                     return
-                if book['available_copies'] <= 0:
-                    messagebox.showerror("Error", "Book is not available")
+                if book['available_copies'] <= 0 and not self.db.get_ready_reservation(member_id, book_id):
+                    waiting = sum(1 for hold in self.db.get_book_holds(book_id) if hold['status'] == 'Waiting')
+                    if messagebox.askyesno("Not Available",
+                                           f"'{book['title']}' is out on loan ({waiting} already waiting).\n\n"
+                                           f"Place a hold for {member['first_name']} {member['last_name']}?"):
+                        reservation_id = self.db.reserve_book(member_id, book_id)
+                        messagebox.showinfo("Hold Placed", f"Hold placed. Position in queue: "
+                                                           f"{self.db.get_queue_position(reservation_id)}")
+                        win.destroy()
                     return
 
-                self.db.issue_book(member_id, book_id, issue_date, due_date)
+                self.db.issue_book(member_id, book_id, issue_date, due_date, barcode=barcode)
                 messagebox.showinfo("Success", f"Book '{book['title']}' issued to {member['first_name']} {member['last_name']} successfully!")
                 self.refresh_transactions_table()
                 self.refresh_books_table()
@@ -1052,6 +1251,9 @@ class LibraryManagementSystem(tk.Tk):
                 messagebox.showerror("Error", f"Error issuing book: {e}")
 
         ttk.Button(win, text="Issue Book", command=issue_book).pack(pady=10)
+        # Barcode scanners finish with Enter
+        barcode_entry.bind("<Return>", lambda e: issue_book())
+        barcode_entry.focus_set()
 
     def open_return_book_window(self):
         """Open return book window with dropdown"""
@@ -1082,8 +1284,12 @@ class LibraryManagementSystem(tk.Tk):
         return_date_entry.insert(0, datetime.now().date().isoformat())
         return_date_entry.grid(row=1, column=1, pady=5)
 
+        tk.Label(form_frame, text="Scan Barcode:", font=("Arial", 10)).grid(row=2, column=0, sticky="w", pady=5)
+        barcode_entry = tk.Entry(form_frame, width=30, font=("Arial", 10))
+        barcode_entry.grid(row=2, column=1, pady=5)
+
         fine_label = tk.Label(form_frame, text="Fine Amount: $0.00", font=("Arial", 10), fg="red")
-        fine_label.grid(row=2, column=0, columnspan=2, pady=10)
+        fine_label.grid(row=3, column=0, columnspan=2, pady=10)
 
         def calculate_fine():
             try:
@@ -1118,8 +1324,26 @@ class LibraryManagementSystem(tk.Tk):
             except:
                 pass
 
+        def select_scanned():
+            """Select the open loan of the scanned copy"""
+            try:
+                loan = self.db.get_loan_by_barcode(barcode_entry.get())
+            except ValueError as e:
+                fine_label.config(text=str(e), fg="red")
+                return
+            if not loan:
+                fine_label.config(text="This copy is not on loan", fg="blue")
+                return
+            option = next((o for o in txn_options if int(o.split(":")[0]) == loan['transaction_id']), None)
+            if option:
+                txn_var.set(option)
+                calculate_fine()
+            barcode_entry.delete(0, tk.END)
+
         txn_combo.bind("<<ComboboxSelected>>", lambda e: calculate_fine())
         return_date_entry.bind("<KeyRelease>", lambda e: calculate_fine())
+        barcode_entry.bind("<Return>", lambda e: select_scanned())
+        barcode_entry.focus_set()
 
         def return_book():
             try:
@@ -1160,33 +1384,83 @@ class LibraryManagementSystem(tk.Tk):
                     days_overdue = (return_date_obj - due_date).days
                     fine = days_overdue * 1.0
 
-                self.db.return_book(txn_id, return_date, fine)
+                reservation_id = self.db.return_book(txn_id, return_date, fine)
                 fine_msg = f"\nFine: ${fine:.2f}" if fine > 0 else "\nNo fine (returned on time)"
+                if reservation_id:
+                    hold = self.db.get_reservation(reservation_id)
+                    member = self.db.get_member(hold['member_id'])
+                    fine_msg += (f"\n\nPlace this copy on the hold shelf for {member['first_name']} "
+                                 f"{member['last_name']} (until {hold['expires_at']}).")
                 messagebox.showinfo("Success", f"Book '{txn.get('book_title', '')}' returned successfully!{fine_msg}")
                 self.refresh_transactions_table()
                 self.refresh_books_table()
                 self.refresh_dashboard()
                 win.destroy()
+                if reservation_id:
+                    self.send_hold_notices(expire=False)
             except Exception as e:
                 messagebox.showerror("Error", f"Error returning book: {e}")
 
         ttk.Button(win, text="Return Book", command=return_book).pack(pady=10)
 
+    def _run_notifier(self, job, title: str):
+        """Run a BulkNotifier job on a worker thread with its own connection
+        and report the delivery counts; the Tk thread only polls"""
+        outcome = {}
+
+        def run():
+            from bulk_notifier import BulkNotifier
+            notifier = BulkNotifier(self.db.db_name, self.notifications)
+            try:
+                outcome['stats'] = job(notifier)
+            except Exception as e:
+                outcome['error'] = e
+            finally:
+                notifier.close()
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+
+        def poll():
+            if worker.is_alive():
+                self.after(200, poll)
+                return
+            if 'error' in outcome:
+                messagebox.showerror("Error", f"Error sending notifications: {outcome['error']}")
+                return
+            stats = outcome['stats']
+            sent = sum(stats.get(channel, {}).get('sent', 0) for channel in ('email', 'sms'))
+            failed = sum(stats.get(channel, {}).get('failed', 0) for channel in ('email', 'sms'))
+            messagebox.showinfo(title,
+                                f"Queued {stats['queued']} messages\n"
+                                f"Delivered: {sent} (email {stats.get('email', {}).get('sent', 0)}, "
+                                f"SMS {stats.get('sms', {}).get('sent', 0)})\nFailed: {failed}")
+
+        poll()
+
     def send_due_reminders(self):
-        """Send due date reminders"""
+        """Send due date reminders by email and/or SMS, per member preference"""
         overdue = self.db.get_overdue_books()
         if not overdue:
             messagebox.showinfo("Info", "No overdue books")
             return
-        
-        results = self.notifications.send_bulk_due_reminders(overdue)
-        sent_count = sum(1 for r in results if r['sent'])
-        messagebox.showinfo("Reminders Sent", f"Sent {sent_count} out of {len(results)} reminders")
+        self._run_notifier(lambda notifier: notifier.send_reminders(overdue), "Reminders Sent")
+
+    def send_hold_notices(self, expire: bool = True):
+        """Tell members their reserved copies are ready (lapsing uncollected holds first)"""
+        self._run_notifier(lambda notifier: notifier.send_hold_notices(expire), "Hold Notices Sent")
+
+    def expire_holds(self):
+        """Startup sweep: pass copies from uncollected holds to the next in line"""
+        if self.db.expire_reservations():
+            self.send_hold_notices(expire=False)
+
+    def announce_new_book(self, book_id: int):
+        """Tell every active member about a new arrival"""
+        self._run_notifier(lambda notifier: notifier.announce_new_book(book_id), "New Book Announced")
 
     # ========== REVIEWS TAB ==========
-    def create_reviews_tab(self):
-        review_frame = ttk.Frame(self.notebook)
-        self.notebook.add(review_frame, text="⭐ Reviews")
+    def create_reviews_tab(self, review_frame):
 
         # Title and add review section
         header_frame = tk.Frame(review_frame, bg="#f5f5f5")
@@ -1202,9 +1476,14 @@ class LibraryManagementSystem(tk.Tk):
         
         tk.Label(filter_frame, text="Filter by Book:", bg="#f5f5f5", font=("Arial", 10)).pack(side="left", padx=5)
         book_filter_var = tk.StringVar(value="All Books")
-        books_list = ["All Books"] + [f"{b['book_id']}: {b['title']}" for b in self.db.get_all_books()]
-        book_filter = ttk.Combobox(filter_frame, textvariable=book_filter_var, values=books_list, state="readonly", width=40)
+        book_filter = ttk.Combobox(filter_frame, textvariable=book_filter_var, values=["All Books"], state="readonly", width=40)
         book_filter.pack(side="left", padx=5)
+
+        # Book list is only loaded when the dropdown is opened
+        def load_book_filter():
+            book_filter.configure(values=["All Books"] + [f"{b['book_id']}: {b['title']}" for b in self.db.get_all_books()])
+
+        book_filter.configure(postcommand=load_book_filter)
         
         def filter_reviews():
             self.refresh_reviews_table(book_filter_var.get())
@@ -1238,23 +1517,17 @@ class LibraryManagementSystem(tk.Tk):
 
     def refresh_reviews_table(self, filter_book="All Books"):
         """Refresh reviews table"""
+        if self.reviews_tree is None:
+            return
+
         for item in self.reviews_tree.get_children():
             self.reviews_tree.delete(item)
         
-        # Get all reviews
-        all_books = self.db.get_all_books()
-        all_reviews = []
-        
-        for book in all_books:
-            reviews = self.db.get_book_reviews(book['book_id'])
-            for review in reviews:
-                review['book_title'] = book['title']
-                all_reviews.append(review)
-        
-        # Filter if needed
+        # Get reviews, filtered in SQL if needed
+        book_id = None
         if filter_book != "All Books":
             book_id = int(filter_book.split(":")[0])
-            all_reviews = [r for r in all_reviews if r['book_id'] == book_id]
+        all_reviews = self.db.get_all_reviews(book_id)
         
         # Display reviews
         for review in all_reviews:
@@ -1339,7 +1612,156 @@ class LibraryManagementSystem(tk.Tk):
         ttk.Button(win, text="Save Review", command=save_review).pack(pady=10)
 
 
+    # ========== REPORTS TAB ==========
+    REPORT_PERIODS = {"Last 30 days": 30, "Last 90 days": 90, "Last 365 days": 365, "All time": None}
+
+    def create_reports_tab(self, reports_frame):
+
+        # Header with period selection
+        header_frame = tk.Frame(reports_frame, bg="#f5f5f5")
+        header_frame.pack(fill="x", padx=20, pady=10)
+
+        tk.Label(header_frame, text="Circulation Reports", font=("Arial", 16, "bold"), bg="#f5f5f5").pack(side="left", padx=10)
+        self.reports_period = tk.StringVar(value="Last 90 days")
+        period_combo = ttk.Combobox(header_frame, textvariable=self.reports_period,
+                                    values=list(self.REPORT_PERIODS), state="readonly", width=15)
+        period_combo.pack(side="right", padx=10)
+        period_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_reports())
+        ttk.Button(header_frame, text="Refresh", command=self.refresh_reports).pack(side="right", padx=5)
+
+        # Summary
+        summary_frame = tk.LabelFrame(reports_frame, text="Summary", font=("Arial", 12, "bold"), padx=20, pady=10, bg="#e8eaf6")
+        summary_frame.pack(fill="x", padx=20, pady=5)
+        self.reports_summary = tk.Label(summary_frame, text="Loading reports...", font=("Arial", 11), justify="left", bg="#e8eaf6")
+        self.reports_summary.pack(anchor="w")
+
+        # Breakdowns by category and membership type
+        breakdown_frame = tk.Frame(reports_frame)
+        breakdown_frame.pack(fill="both", expand=True, padx=20, pady=5)
+        columns = ("name", "loans", "returns", "on_time", "avg_days", "fines")
+        self.reports_trees = {}
+        for index, (dimension, title) in enumerate((("category", "By Category"),
+                                                    ("membership_type", "By Membership Type"))):
+            frame = tk.LabelFrame(breakdown_frame, text=title, font=("Arial", 11, "bold"))
+            frame.grid(row=0, column=index, sticky="nsew", padx=5)
+            tree = ttk.Treeview(frame, columns=columns, show="headings", height=8)
+            for col in columns:
+                tree.heading(col, text=col.replace("_", " ").title())
+                tree.column(col, width=140 if col == "name" else 75)
+            tree.pack(fill="both", expand=True)
+            self.reports_trees[dimension] = tree
+            breakdown_frame.columnconfigure(index, weight=1)
+        breakdown_frame.rowconfigure(0, weight=1)
+
+        # Daily loans and monthly fine revenue
+        trend_frame = tk.Frame(reports_frame)
+        trend_frame.pack(fill="both", expand=True, padx=20, pady=5)
+        for index, (key, title, cols) in enumerate((("daily", "Loans per Day", ("day", "loans")),
+                                                    ("fines", "Fine Revenue by Month", ("month", "fines")))):
+            frame = tk.LabelFrame(trend_frame, text=title, font=("Arial", 11, "bold"))
+            frame.grid(row=0, column=index, sticky="nsew", padx=5)
+            tree = ttk.Treeview(frame, columns=cols, show="headings", height=8)
+            scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            for col in cols:
+                tree.heading(col, text=col.title())
+                tree.column(col, width=150)
+            tree.pack(side="left", fill="both", expand=True)
+            scrollbar.pack(side="right", fill="y")
+            self.reports_trees[key] = tree
+            trend_frame.columnconfigure(index, weight=1)
+        trend_frame.rowconfigure(0, weight=1)
+
+        self.refresh_reports()
+
+    def refresh_reports(self):
+        """Refresh the Reports tab; reads only the precomputed rollups"""
+        if self.reports_summary is None:
+            return
+
+        from analytics import period_start
+        self.analytics.refresh()
+        start = period_start(self.REPORT_PERIODS[self.reports_period.get()])
+
+        summary = self.analytics.summary(start)
+        on_time = f"{summary['on_time_rate'] * 100:.1f}%" if summary['on_time_rate'] is not None else "n/a"
+        avg_days = f"{summary['avg_loan_days']} days" if summary['avg_loan_days'] is not None else "n/a"
+        self.reports_summary.config(text=(
+            f"📖 Loans: {summary['loans']}    ✅ Returns: {summary['returns']}    "
+            f"⏱️ Returned on time: {on_time}    📅 Average loan: {avg_days}    "
+            f"💰 Fines: ${summary['fines']:.2f}"
+        ))
+
+        for dimension in ("category", "membership_type"):
+            tree = self.reports_trees[dimension]
+            tree.delete(*tree.get_children())
+            for row in self.analytics.breakdown(dimension, start):
+                tree.insert("", "end", values=(
+                    row[dimension],
+                    row['loans'],
+                    row['returns'],
+                    f"{row['on_time_rate'] * 100:.0f}%" if row['on_time_rate'] is not None else "",
+                    row['avg_loan_days'] if row['avg_loan_days'] is not None else "",
+                    f"{row['fines']:.2f}"
+                ))
+
+        daily = self.reports_trees["daily"]
+        daily.delete(*daily.get_children())
+        for day, loans in reversed(self.analytics.loans_by_day(start)):
+            daily.insert("", "end", values=(day, loans))
+
+        fines = self.reports_trees["fines"]
+        fines.delete(*fines.get_children())
+        for month, revenue in reversed(self.analytics.fines_by_month(start)):
+            fines.insert("", "end", values=(month, f"{revenue:.2f}"))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Library Management System")
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--profile", action="store_true",
+                        help="time callbacks, sample event-loop stalls and track memory per window (see tk_profiler.py)")
+    parser.add_argument("--profile-report", default="profile_report.txt")
+    parser.add_argument("--stall-ms", type=int, default=200, help="callbacks at least this long count as stalls")
+    parser.add_argument("--replica-of", metavar="PRIMARY",
+                        help="desk terminal mode: read books and members from a local replica of PRIMARY "
+                             "(see replica.py) and send everything else there")
+    parser.add_argument("--replica", default="replica.db", help="the local replica file")
+    parser.add_argument("--db-profile", choices=list(PERFORMANCE_PROFILES),
+                        help="SQLite cache, mmap and sync settings (see db_manager.PERFORMANCE_PROFILES)")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile:
+        from tk_profiler import TkProfiler
+        profiler = TkProfiler(args.profile_report, stall_threshold=args.stall_ms / 1000)
+        # Hooks must be in place before any widget registers a callback
+        profiler.install()
+    db = None
+    if args.replica_of:
+        from replica import ReplicaDatabase
+        db = ReplicaDatabase(args.replica_of, args.replica)
+        if args.db_profile:
+            db.local.apply_profile(args.db_profile)
+        db.try_sync()
+        db.start_sync()
+    elif args.db_profile:
+        db = DatabaseManager(args.db, profile=args.db_profile)
+    app = LibraryManagementSystem(args.replica_of or args.db, db)
+    if profiler:
+        profiler.attach(app, cache_stats=app.db.get_cache_stats)
+    try:
+        app.mainloop()
+    finally:
+        if profiler:
+            print(f"Profile written to {profiler.write_report()}")
+            profiler.uninstall()
+        if db:
+            db.close()
+
+
 if __name__ == "__main__":
-    app = LibraryManagementSystem()
-    app.mainloop()
+    main()
 
@@ -0,0 +1,324 @@
+"""
+Maintenance Module
+Keeps query plans and file size in shape as tables churn: refreshes planner
+statistics (ANALYZE, PRAGMA optimize), returns free pages to the filesystem
+(incremental vacuum) and checkpoints the write-ahead log
+
+Every task runs in small chunks (one table or index, a few hundred pages), so
+a desk writer waits at most one chunk for the lock. The scheduler only runs
+chunks while no other connection has committed for a while. Page and freelist
+counts taken before and after each run show its effect.
+
+Usage: python maintenance.py [--db library.db] status
+       python maintenance.py [--db library.db] run [--tasks analyze optimize vacuum checkpoint]
+       python maintenance.py [--db library.db] schedule [--idle 60] [--interval 21600]
+       python maintenance.py [--db library.db] enable-incremental-vacuum
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from db_manager import PERFORMANCE_PROFILES, DatabaseManager
+
+# Tasks run in this order. 'reindex' rebuilds every index (and leaves the
+# old pages free, hence before 'vacuum'); it only runs when asked for.
+ALL_TASKS = ('reindex', 'analyze', 'optimize', 'vacuum', 'checkpoint')
+TASKS = ALL_TASKS[1:]
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+class MaintenanceManager:
+    def __init__(self, db_name: str = "library.db", profile: str = "maintenance", analysis_limit: int = 1000,
+                 vacuum_pages: int = 256, pause: float = 0.05):
+        self.db_name = db_name
+        self.profile = profile
+        # Rows ANALYZE samples per index (0 reads them all)
+        self.analysis_limit = analysis_limit
+        # Free pages released per incremental_vacuum chunk
+        self.vacuum_pages = vacuum_pages
+        # Pause between chunks so desk writers can get the lock
+        self.pause = pause
+        self.db = DatabaseManager(db_name, profile=profile)
+
+    def _pragma(self, name: str):
+        return self.db.conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def get_statistics(self) -> Dict:
+        """File, freelist and statistics coverage figures for the database"""
+        self.db.cursor.execute("""
+            SELECT COUNT(*) FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        """)
+        tables = self.db.cursor.fetchone()[0]
+        analyzed = 0
+        if self._has_stat1():
+            self.db.cursor.execute("SELECT COUNT(DISTINCT tbl) FROM sqlite_stat1")
+            analyzed = self.db.cursor.fetchone()[0]
+        wal = f"{self.db_name}-wal"
+        return {
+            'page_size': self._pragma('page_size'),
+            'page_count': self._pragma('page_count'),
+            'freelist_count': self._pragma('freelist_count'),
+            'file_bytes': os.path.getsize(self.db_name),
+            'wal_bytes': os.path.getsize(wal) if os.path.exists(wal) else 0,
+            'auto_vacuum': AUTO_VACUUM_MODES.get(self._pragma('auto_vacuum')),
+            'journal_mode': self._pragma('journal_mode'),
+            'tables': tables,
+            'analyzed_tables': analyzed,
+        }
+
+    def _has_stat1(self) -> bool:
+        self.db.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        return self.db.cursor.fetchone() is not None
+
+    def _tables(self) -> List[str]:
+        """Tables to analyze, those without statistics first"""
+        analyzed = set()
+        if self._has_stat1():
+            self.db.cursor.execute("SELECT DISTINCT tbl FROM sqlite_stat1")
+            analyzed = {row[0] for row in self.db.cursor.fetchall()}
+        self.db.cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'
+            ORDER BY name
+        """)
+        names = [row[0] for row in self.db.cursor.fetchall()]
+        return sorted(names, key=lambda name: name in analyzed)
+
+    # ========== TASKS ==========
+    # Each task is a generator that does one chunk of work per step
+
+    def _analyze(self) -> Iterator[str]:
+        # Other connections plan with the statistics they loaded when they
+        # opened; new desk sessions pick these up
+        self.db.conn.execute(f"PRAGMA analysis_limit = {int(self.analysis_limit)}")
+        for table in self._tables():
+            self.db.conn.execute(f'ANALYZE "{table}"')
+            self.db.conn.commit()
+            yield table
+
+    def _optimize(self) -> Iterator[str]:
+        # Only re-analyzes tables whose statistics look stale, so it is cheap
+        # enough for frequent passes without 'analyze'
+        self.db.conn.execute("PRAGMA optimize")
+        self.db.conn.commit()
+        yield "optimized"
+
+    def _vacuum(self) -> Iterator[str]:
+        if self._pragma('auto_vacuum') != 2:
+            # Free pages can only be released by a full VACUUM; see
+            # enable_incremental_vacuum()
+            if self._pragma('freelist_count'):
+                yield "skipped: auto_vacuum is not incremental (run enable-incremental-vacuum once)"
+            return
+        while self._pragma('freelist_count'):
+            # The pragma frees one page per step and the sqlite3 module only
+            # steps it once; executescript runs it to the end
+            self.db.conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+            yield f"{self._pragma('freelist_count')} free pages left"
+
+    def _checkpoint(self) -> Iterator[str]:
+        if self._pragma('journal_mode') != 'wal':
+            return
+        # PASSIVE copies what it can without waiting for readers or writers
+        busy, log_frames, done = self.db.conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        yield f"{done} of {log_frames} frames checkpointed"
+        if not busy and done == log_frames:
+            # Everything is in the database file: shrink the log back to nothing
+            self.db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            yield "log truncated"
+
+    def _reindex(self) -> Iterator[str]:
+        self.db.cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'index' AND name NOT LIKE 'sqlite_%' AND sql IS NOT NULL
+            ORDER BY tbl_name, name
+        """)
+        for index in [row[0] for row in self.db.cursor.fetchall()]:
+            self.db.conn.execute(f'REINDEX "{index}"')
+            self.db.conn.commit()
+            yield index
+
+    def steps(self, tasks: Tuple[str, ...] = TASKS) -> Iterator[Tuple[str, str]]:
+        """Run the tasks one chunk per step, yielding (task, what was done)"""
+        for task in tasks:
+            if task not in ALL_TASKS:
+                raise ValueError(f"Unknown maintenance task {task!r}; choose from {', '.join(ALL_TASKS)}")
+        for task in sorted(set(tasks), key=ALL_TASKS.index):
+            for detail in getattr(self, f"_{task}")():
+                yield task, detail
+
+    def run(self, tasks: Tuple[str, ...] = TASKS, progress: Callable = None,
+            should_continue: Callable = None) -> Dict:
+        """Run the tasks to completion (or until should_continue() is false),
+        returning the statistics before and after"""
+        before = self.get_statistics()
+        start = time.perf_counter()
+        chunks = 0
+        completed = True
+        for task, detail in self.steps(tasks):
+            chunks += 1
+            if progress:
+                progress(task, detail)
+            if should_continue and not should_continue():
+                completed = False
+                break
+            time.sleep(self.pause)
+        return {'before': before, 'after': self.get_statistics(), 'chunks': chunks,
+                'seconds': round(time.perf_counter() - start, 2), 'completed': completed}
+
+    def enable_incremental_vacuum(self) -> Dict:
+        """Switch an existing database to incremental auto-vacuum. This takes
+        one full VACUUM, which rewrites the file under an exclusive lock, so
+        run it while the library is closed."""
+        before = self.get_statistics()
+        if before['auto_vacuum'] != 'incremental':
+            self.db.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.db.conn.execute("VACUUM")
+        return {'before': before, 'after': self.get_statistics()}
+
+    def close(self):
+        self.db.close()
+
+
+class MaintenanceScheduler:
+    """Runs a maintenance pass every `interval` seconds on a background
+    thread, one chunk at a time, whenever no other connection has committed
+    for `idle_seconds`; a pass interrupted by desk activity resumes at the
+    next idle window"""
+
+    def __init__(self, manager: MaintenanceManager, idle_seconds: float = 60, interval: float = 6 * 3600,
+                 poll: float = 5, on_result: Callable = None, tasks: Tuple[str, ...] = TASKS):
+        self.manager = manager
+        self.tasks = tasks
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.poll = poll
+        self.on_result = on_result
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        # SQLite connections belong to the thread that opened them
+        settings = self.manager
+        manager = MaintenanceManager(settings.db_name, settings.profile, settings.analysis_limit,
+                                     settings.vacuum_pages, settings.pause)
+        try:
+            self._loop(manager)
+        finally:
+            manager.close()
+
+    def _loop(self, manager: MaintenanceManager):
+        def data_version() -> int:
+            # Changes whenever another connection commits
+            return manager.db.conn.execute("PRAGMA data_version").fetchone()[0]
+
+        version = data_version()
+        quiet_since = time.monotonic()
+        next_pass = quiet_since
+        steps = None
+        before = None
+        while not self._stop.wait(self.poll):
+            now = time.monotonic()
+            current = data_version()
+            if current != version:
+                version, quiet_since = current, now
+                continue
+            if now - quiet_since < self.idle_seconds:
+                continue
+            if steps is None:
+                if now < next_pass:
+                    continue
+                before = manager.get_statistics()
+                steps = manager.steps(self.tasks)
+            try:
+                # Work until the pass ends or a desk writes again
+                while not self._stop.is_set() and data_version() == version:
+                    if next(steps, None) is None:
+                        self.last_result = {'before': before, 'after': manager.get_statistics()}
+                        self.last_error = None
+                        steps = None
+                        next_pass = time.monotonic() + self.interval
+                        if self.on_result:
+                            self.on_result(self.last_result, None)
+                        break
+                    time.sleep(manager.pause)
+            except sqlite3.Error as e:
+                # Most likely a writer held the lock past the busy timeout;
+                # start the pass over at the next idle window
+                self.last_error = e
+                steps = None
+                print(f"Error running scheduled maintenance: {e}")
+                if self.on_result:
+                    self.on_result(None, e)
+
+    def start(self) -> "MaintenanceScheduler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def format_statistics(stats: Dict) -> str:
+    size = stats['file_bytes'] / 2**20
+    return (f"{stats['page_count']} pages of {stats['page_size']} bytes ({size:.1f} MiB), "
+            f"{stats['freelist_count']} free; WAL {stats['wal_bytes']} bytes; "
+            f"auto_vacuum {stats['auto_vacuum']}, journal {stats['journal_mode']}; "
+            f"statistics for {stats['analyzed_tables']} of {stats['tables']} tables")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database maintenance: statistics, vacuum and checkpoints")
+    parser.add_argument("command", choices=["status", "run", "schedule", "enable-incremental-vacuum"])
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--profile", default="maintenance", choices=list(PERFORMANCE_PROFILES),
+                        help="connection tunables used by the maintenance connection")
+    parser.add_argument("--tasks", nargs="+", default=list(TASKS), choices=list(ALL_TASKS),
+                        help="run in the order reindex, analyze, optimize, vacuum, checkpoint")
+    parser.add_argument("--analysis-limit", type=int, default=1000, help="rows sampled per index (0 for all)")
+    parser.add_argument("--vacuum-pages", type=int, default=256, help="free pages released per chunk")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between chunks")
+    parser.add_argument("--idle", type=float, default=60, help="seconds without commits before a chunk runs")
+    parser.add_argument("--interval", type=float, default=6 * 3600, help="seconds between scheduled passes")
+    args = parser.parse_args()
+
+    manager = MaintenanceManager(args.db, args.profile, args.analysis_limit, args.vacuum_pages, args.pause)
+    try:
+        if args.command == "status":
+            print(format_statistics(manager.get_statistics()))
+            print(f"Connection settings ({args.profile} profile):")
+            for pragma, value in manager.db.get_pragmas().items():
+                print(f"  {pragma}: {value}")
+        elif args.command == "run":
+            result = manager.run(tuple(args.tasks), progress=lambda task, detail: print(f"{task}: {detail}"))
+            print(f"Before: {format_statistics(result['before'])}")
+            print(f"After:  {format_statistics(result['after'])}")
+            print(f"{result['chunks']} chunks in {result['seconds']}s")
+        elif args.command == "enable-incremental-vacuum":
+            result = manager.enable_incremental_vacuum()
+            print(f"Before: {format_statistics(result['before'])}")
+            print(f"After:  {format_statistics(result['after'])}")
+        elif args.command == "schedule":
+            def report(result, error):
+                print(error or f"Maintenance pass done: {format_statistics(result['after'])}")
+
+            scheduler = MaintenanceScheduler(manager, args.idle, args.interval, on_result=report,
+                                             tasks=tuple(args.tasks)).start()
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                scheduler.stop()
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
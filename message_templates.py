@@ -0,0 +1,168 @@
+"""
+Message Templates Module
+Notification templates loaded and compiled once, with plain-text, HTML and
+SMS variants per locale
+
+Templates live in templates/<locale>/<name>.<variant> where variant is
+subject, txt, html or sms, and use $name / ${name} placeholders ($$ for a
+literal dollar sign). A locale such as af_ZA falls back to af and then to
+the default locale, per template. HTML variants get HTML-escaped values.
+
+Usage: python message_templates.py [--locale af] [--template overdue_notice]
+"""
+import argparse
+import html
+import os
+from string import Template
+from typing import Dict, Optional
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+DEFAULT_LOCALE = 'en'
+VARIANTS = ('subject', 'txt', 'html', 'sms')
+
+
+def _partial(template: Template, values: Dict) -> str:
+    """Template source with only the given placeholders filled in; other
+    placeholders and $$ escapes are left for the final render"""
+    def replace(match):
+        name = match.group('named') or match.group('braced')
+        if name in values:
+            return str(values[name]).replace('$', '$$')
+        return match.group(0)
+    return template.pattern.sub(replace, template.template)
+
+
+class CompiledTemplate:
+    """The parsed variants of one template in one locale"""
+
+    def __init__(self, name: str, locale: str, sources: Dict[str, Optional[str]]):
+        self.name = name
+        self.locale = locale
+        self.sources = sources
+        self.variants = {variant: Template(source) if source is not None else None
+                         for variant, source in sources.items()}
+
+    def bind(self, **shared) -> "CompiledTemplate":
+        """A copy with the given fields filled in ahead of time.
+
+        Used for bulk sends where most fields (the book, the due date) are
+        the same for every recipient, so each render only substitutes the
+        per-member fields.
+        """
+        sources = {}
+        for variant, template in self.variants.items():
+            if template is None:
+                sources[variant] = None
+                continue
+            sources[variant] = _partial(template, {
+                key: html.escape(str(value)) if variant == 'html' else value
+                for key, value in shared.items()})
+        return CompiledTemplate(self.name, self.locale, sources)
+
+    def render(self, context: Dict) -> Dict[str, Optional[str]]:
+        """subject, text, html and sms for one recipient (html/sms may be None)"""
+        escaped = None
+        message = {}
+        for variant, template in self.variants.items():
+            if template is None:
+                message[variant] = None
+            elif variant == 'html':
+                if escaped is None:
+                    escaped = {key: html.escape(str(value)) for key, value in context.items()}
+                message[variant] = template.substitute(escaped)
+            else:
+                message[variant] = template.substitute(context)
+        return {
+            'subject': message['subject'].strip(),
+            'text': message['txt'].strip(),
+            'html': message['html'],
+            'sms': message['sms'].strip() if message['sms'] else None,
+        }
+
+
+class TemplateStore:
+    def __init__(self, directory: str = TEMPLATE_DIR, default_locale: str = DEFAULT_LOCALE):
+        self.directory = directory
+        self.default_locale = default_locale
+        # (name, locale) -> CompiledTemplate; files are read once per process
+        self._compiled: Dict[tuple, CompiledTemplate] = {}
+
+    def locales(self) -> list:
+        """Locales that have a templates directory"""
+        try:
+            return sorted(entry for entry in os.listdir(self.directory)
+                          if os.path.isdir(os.path.join(self.directory, entry)))
+        except FileNotFoundError:
+            return []
+
+    def _candidates(self, locale: Optional[str]) -> list:
+        candidates = []
+        if locale:
+            locale = locale.replace('-', '_')
+            candidates.append(locale)
+            if '_' in locale:
+                candidates.append(locale.split('_')[0])
+        candidates.append(self.default_locale)
+        return list(dict.fromkeys(candidates))
+
+    def _load(self, name: str, locale: str) -> Optional[CompiledTemplate]:
+        folder = os.path.join(self.directory, locale)
+        sources = {}
+        for variant in VARIANTS:
+            try:
+                with open(os.path.join(folder, f"{name}.{variant}"), 'r', encoding='utf-8') as f:
+                    sources[variant] = f.read()
+            except FileNotFoundError:
+                sources[variant] = None
+        if sources['subject'] is None or sources['txt'] is None:
+            return None
+        return CompiledTemplate(name, locale, sources)
+
+    def get(self, name: str, locale: str = None) -> CompiledTemplate:
+        """Compiled template for a locale, falling back to the default locale"""
+        key = (name, locale)
+        template = self._compiled.get(key)
+        if template is None:
+            for candidate in self._candidates(locale):
+                template = self._compiled.get((name, candidate)) or self._load(name, candidate)
+                if template is not None:
+                    self._compiled[(name, candidate)] = template
+                    break
+            else:
+                raise ValueError(f"Unknown template: {name}")
+            self._compiled[key] = template
+        return template
+
+    def render(self, name: str, context: Dict, locale: str = None) -> Dict[str, Optional[str]]:
+        return self.get(name, locale).render(context)
+
+
+_default_store = None
+
+
+def get_store() -> TemplateStore:
+    """Process-wide store over the bundled templates directory"""
+    global _default_store
+    if _default_store is None:
+        _default_store = TemplateStore()
+    return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a notification template with sample values")
+    parser.add_argument("--locale", default=DEFAULT_LOCALE)
+    parser.add_argument("--template", default="overdue_notice")
+    args = parser.parse_args()
+
+    store = get_store()
+    print(f"Locales: {', '.join(store.locales())}")
+    message = store.render(args.template, {
+        'member_name': 'Thandi Mokoena', 'book_title': 'Long Walk to Freedom', 'author': 'Nelson Mandela',
+        'due_date': '2024-03-01', 'days_overdue': 5, 'fine_amount': '5.00',
+    }, args.locale)
+    for part in ('subject', 'text', 'html', 'sms'):
+        print(f"--- {part} ---\n{message[part]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,835 @@
+"""
+Schema Migrations Module
+Ordered, versioned schema migrations tracked with PRAGMA user_version
+
+Each migration runs in its own transaction and bumps user_version on
+commit. Long data migrations (such as merging the legacy *tb tables
+written by Library_Management.py) commit in batches and record their
+progress, so an interrupted run resumes where it stopped.
+
+Usage: python migrations.py [--db library.db] [--status]
+"""
+import argparse
+import sqlite3
+from typing import Callable, List, Tuple
+
+from author_utils import link_book_authors
+from duplicate_index import index_book
+from isbn_utils import to_isbn13
+
+# Primary key of each table that carries an updated_at change marker
+TRACKED_TABLES = {
+    'books': 'book_id',
+    'members': 'member_id',
+    'transactions': 'transaction_id',
+    'book_reviews': 'review_id',
+}
+
+LEGACY_BATCH_SIZE = 5000
+
+# Barcodes generated for copies: 7-digit book id then 3-digit copy number
+BARCODE_FORMAT = '%07d%03d'
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _table_exists(cursor: sqlite3.Cursor, table: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+# ========== MIGRATION STEPS ==========
+def create_base_tables(conn: sqlite3.Connection):
+    """Books, members, transactions and reviews"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS books (
+            book_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            isbn TEXT UNIQUE,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            publisher TEXT,
+            publication_year INTEGER,
+            category TEXT,
+            description TEXT,
+            cover_image_url TEXT,
+            page_count INTEGER,
+            language TEXT,
+            total_copies INTEGER DEFAULT 1,
+            available_copies INTEGER DEFAULT 1,
+            shelf_location TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS members (
+            member_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            membership_number TEXT UNIQUE,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            email TEXT UNIQUE,
+            phone TEXT,
+            address TEXT,
+            join_date DATE,
+            membership_type TEXT,
+            status TEXT DEFAULT 'Active'
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER,
+            book_id INTEGER,
+            issue_date DATE,
+            due_date DATE,
+            return_date DATE,
+            fine_amount REAL DEFAULT 0,
+            status TEXT DEFAULT 'Issued',
+            FOREIGN KEY(member_id) REFERENCES members(member_id),
+            FOREIGN KEY(book_id) REFERENCES books(book_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_reviews (
+            review_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER,
+            member_id INTEGER,
+            rating INTEGER NOT NULL CHECK(rating >= 1 AND rating <= 5),
+            review_text TEXT,
+            review_date DATE,
+            FOREIGN KEY(book_id) REFERENCES books(book_id),
+            FOREIGN KEY(member_id) REFERENCES members(member_id)
+        )
+    """)
+
+
+def add_isbn13_key(conn: sqlite3.Connection, batch_size: int = 1000):
+    """Canonical isbn13 column, backfilled and covered by a partial unique index"""
+    cursor = conn.cursor()
+    if 'isbn13' not in _columns(cursor, 'books'):
+        cursor.execute("ALTER TABLE books ADD COLUMN isbn13 TEXT")
+
+    # Rows with an invalid or duplicate ISBN get '' so they are skipped
+    # by the partial index and not revisited.
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_books_isbn13
+        ON books(isbn13) WHERE isbn13 != ''
+    """)
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT book_id, isbn FROM books
+            WHERE isbn13 IS NULL AND book_id > ?
+            ORDER BY book_id LIMIT ?
+        """, (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for book_id, isbn in rows:
+            try:
+                cursor.execute("UPDATE books SET isbn13 = ? WHERE book_id = ?", (to_isbn13(isbn) or '', book_id))
+            except sqlite3.IntegrityError:
+                # Same book already stored under its other ISBN form;
+                # add_isbn13_duplicates lists these
+                cursor.execute("UPDATE books SET isbn13 = '' WHERE book_id = ?", (book_id,))
+        last_id = rows[-1][0]
+
+
+def add_change_tracking(conn: sqlite3.Connection):
+    """Indexed updated_at column on each table, maintained by triggers"""
+    cursor = conn.cursor()
+    for table, pk in TRACKED_TABLES.items():
+        if 'updated_at' not in _columns(cursor, table):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TEXT")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table}(updated_at)")
+        for event in ('INSERT', 'UPDATE'):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_touch_{event.lower()}
+                AFTER {event} ON {table}
+                {'WHEN NEW.updated_at IS OLD.updated_at' if event == 'UPDATE' else ''}
+                BEGIN
+                    UPDATE {table} SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+                    WHERE {pk} = NEW.{pk};
+                END
+            """)
+
+
+def add_lookup_indexes(conn: sqlite3.Connection):
+    """Indexes for member history and per-book review lookups"""
+    cursor = conn.cursor()
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_member ON transactions(member_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_reviews_book ON book_reviews(book_id)")
+
+
+def merge_legacy_tables(conn: sqlite3.Connection, batch_size: int = LEGACY_BATCH_SIZE):
+    """Merge membertb/booktb/transtb/bookreviewtb rows into the canonical tables.
+
+    Member and book ids are translated through legacy_id_map so loans and
+    reviews point at the merged rows. Each batch commits together with its
+    mappings and the last legacy id processed, so an interrupted merge
+    resumes from there.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS legacy_id_map (
+            legacy_table TEXT NOT NULL,
+            legacy_id INTEGER NOT NULL,
+            new_id INTEGER,
+            PRIMARY KEY (legacy_table, legacy_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS legacy_migration_state (
+            legacy_table TEXT PRIMARY KEY,
+            last_legacy_id INTEGER NOT NULL,
+            merged INTEGER DEFAULT 0,
+            deduplicated INTEGER DEFAULT 0,
+            skipped INTEGER DEFAULT 0
+        )
+    """)
+    conn.commit()
+
+    for legacy_table, merge_row in (
+        ('membertb', _merge_member),
+        ('booktb', _merge_book),
+        ('transtb', _merge_transaction),
+        ('bookreviewtb', _merge_review),
+    ):
+        if not _table_exists(cursor, legacy_table):
+            continue
+        pk = _columns(cursor, legacy_table)[0]
+        cursor.execute("INSERT OR IGNORE INTO legacy_migration_state (legacy_table, last_legacy_id) VALUES (?, 0)",
+                       (legacy_table,))
+        cursor.execute("SELECT last_legacy_id FROM legacy_migration_state WHERE legacy_table = ?", (legacy_table,))
+        last_id = cursor.fetchone()[0]
+        reader = conn.cursor()
+        while True:
+            reader.execute(f"SELECT * FROM {legacy_table} WHERE {pk} > ? ORDER BY {pk} LIMIT ?",
+                           (last_id, batch_size))
+            columns = [d[0] for d in reader.description]
+            rows = reader.fetchall()
+            if not rows:
+                break
+            counts = {'merged': 0, 'deduplicated': 0, 'skipped': 0}
+            mappings = []
+            for row in rows:
+                record = dict(zip(columns, row))
+                outcome, new_id = merge_row(cursor, record)
+                counts[outcome] += 1
+                if new_id is not None and legacy_table in ('membertb', 'booktb'):
+                    mappings.append((legacy_table, record[pk], new_id))
+            cursor.executemany("INSERT OR REPLACE INTO legacy_id_map VALUES (?, ?, ?)", mappings)
+            last_id = rows[-1][0]
+            cursor.execute("""
+                UPDATE legacy_migration_state
+                SET last_legacy_id = ?, merged = merged + ?, deduplicated = deduplicated + ?,
+                    skipped = skipped + ?
+                WHERE legacy_table = ?
+            """, (last_id, counts['merged'], counts['deduplicated'], counts['skipped'], legacy_table))
+            conn.commit()
+
+
+def _mapped_id(cursor: sqlite3.Cursor, legacy_table: str, legacy_id) -> int:
+    cursor.execute("SELECT new_id FROM legacy_id_map WHERE legacy_table = ? AND legacy_id = ?",
+                   (legacy_table, legacy_id))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _merge_member(cursor: sqlite3.Cursor, record: dict) -> Tuple[str, int]:
+    number = str(record['membership_number']) if record.get('membership_number') is not None else None
+    cursor.execute("SELECT member_id FROM members WHERE email = ? OR membership_number = ? LIMIT 1",
+                   (record.get('email'), number))
+    row = cursor.fetchone()
+    if row:
+        return 'deduplicated', row[0]
+    cursor.execute("""
+        INSERT INTO members (membership_number, first_name, last_name, email, phone,
+                             address, join_date, membership_type, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (number, record['first_name'], record['last_name'], record.get('email'), record.get('phone'),
+          record.get('address'), record.get('join_date'), record.get('membership_type'),
+          record.get('status') or 'Active'))
+    return 'merged', cursor.lastrowid
+
+
+def _merge_book(cursor: sqlite3.Cursor, record: dict) -> Tuple[str, int]:
+    isbn13 = to_isbn13(record.get('isbn'))
+    row = None
+    if isbn13:
+        cursor.execute("SELECT book_id FROM books WHERE isbn13 = ? AND isbn13 != ''", (isbn13,))
+        row = cursor.fetchone()
+    if not row:
+        cursor.execute("SELECT book_id FROM books WHERE isbn = ?", (record.get('isbn'),))
+        row = cursor.fetchone()
+    if row:
+        return 'deduplicated', row[0]
+    cursor.execute("""
+        INSERT INTO books (isbn, title, author, publisher, publication_year, category, description,
+                           cover_image_url, page_count, language, total_copies, available_copies,
+                           shelf_location, isbn13)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (record.get('isbn'), record['title'], record['author'], record.get('publisher'),
+          record.get('publication_year'), record.get('category'), record.get('description'),
+          record.get('cover_image_url'), record.get('page_count'), record.get('language'),
+          record.get('total_copies'), record.get('available_copies'), record.get('shelf_loc'),
+          isbn13 or ''))
+    return 'merged', cursor.lastrowid
+
+
+def _merge_transaction(cursor: sqlite3.Cursor, record: dict) -> Tuple[str, int]:
+    member_id = _mapped_id(cursor, 'membertb', record.get('member_id'))
+    book_id = _mapped_id(cursor, 'booktb', record.get('book_id'))
+    if member_id is None or book_id is None:
+        return 'skipped', None
+    cursor.execute("""
+        SELECT transaction_id FROM transactions
+        WHERE member_id = ? AND book_id = ? AND issue_date IS ?
+    """, (member_id, book_id, record.get('issue_date')))
+    row = cursor.fetchone()
+    if row:
+        return 'deduplicated', row[0]
+    cursor.execute("""
+        INSERT INTO transactions (member_id, book_id, issue_date, due_date, return_date, fine_amount, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (member_id, book_id, record.get('issue_date'), record.get('due_date'),
+          record.get('return_date') or None, record.get('fine_amount') or 0, record.get('status') or 'Issued'))
+    return 'merged', cursor.lastrowid
+
+
+def _merge_review(cursor: sqlite3.Cursor, record: dict) -> Tuple[str, int]:
+    member_id = _mapped_id(cursor, 'membertb', record.get('member_id'))
+    book_id = _mapped_id(cursor, 'booktb', record.get('book_id'))
+    rating = record.get('rating')
+    if member_id is None or book_id is None or not isinstance(rating, int) or not 1 <= rating <= 5:
+        return 'skipped', None
+    cursor.execute("""
+        SELECT review_id FROM book_reviews
+        WHERE book_id = ? AND member_id = ? AND review_date IS ? AND review_text IS ?
+    """, (book_id, member_id, record.get('review_date'), record.get('review_text')))
+    row = cursor.fetchone()
+    if row:
+        return 'deduplicated', row[0]
+    cursor.execute("""
+        INSERT INTO book_reviews (book_id, member_id, rating, review_text, review_date)
+        VALUES (?, ?, ?, ?, ?)
+    """, (book_id, member_id, rating, record.get('review_text'), record.get('review_date')))
+    return 'merged', cursor.lastrowid
+
+
+def add_interbranch_loans(conn: sqlite3.Connection):
+    """Ledger of loans between branches, kept in both branch databases"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS interbranch_loans (
+            loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            direction TEXT NOT NULL CHECK(direction IN ('out', 'in')),
+            peer_branch TEXT NOT NULL,
+            peer_loan_id INTEGER,
+            book_id INTEGER,
+            isbn TEXT,
+            title TEXT,
+            member_id INTEGER,
+            issue_date DATE,
+            due_date DATE,
+            return_date DATE,
+            fine_amount REAL DEFAULT 0,
+            status TEXT DEFAULT 'Issued'
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_interbranch_loans_status ON interbranch_loans(status, due_date)")
+
+
+def add_change_log(conn: sqlite3.Connection):
+    """Append-only change log filled by triggers on every tracked table.
+
+    AUTOINCREMENT keeps sequence numbers strictly increasing even after
+    compaction deletes the newest entries.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('insert', 'update', 'delete')),
+            changed_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log(table_name, row_id, seq)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_consumers (
+            consumer TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    for table, pk in TRACKED_TABLES.items():
+        for event, ref in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            # The updated_at touch is itself an UPDATE; only log the original write
+            when = 'WHEN NEW.updated_at IS OLD.updated_at' if event == 'UPDATE' else ''
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_log_{event.lower()}
+                AFTER {event} ON {table}
+                {when}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, op)
+                    VALUES ('{table}', {ref}.{pk}, '{event.lower()}');
+                END
+            """)
+
+
+def add_notification_deliveries(conn: sqlite3.Connection):
+    """Member contact preference and persisted notification delivery state"""
+    if 'notify_preference' not in _columns(conn.cursor(), 'members'):
+        # 'email', 'sms', 'both' or 'none'
+        conn.execute("ALTER TABLE members ADD COLUMN notify_preference TEXT DEFAULT 'email'")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notification_deliveries (
+            delivery_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER,
+            channel TEXT NOT NULL CHECK(channel IN ('email', 'sms')),
+            recipient TEXT NOT NULL,
+            kind TEXT,
+            subject TEXT,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            provider_message_id TEXT,
+            error TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            sent_at TEXT,
+            FOREIGN KEY(member_id) REFERENCES members(member_id)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notification_deliveries_status
+        ON notification_deliveries(status, channel)
+    """)
+
+
+def add_message_locales(conn: sqlite3.Connection):
+    """Member message locale and HTML bodies for queued email"""
+    if 'locale' not in _columns(conn.cursor(), 'members'):
+        conn.execute("ALTER TABLE members ADD COLUMN locale TEXT DEFAULT 'en'")
+    if 'body_html' not in _columns(conn.cursor(), 'notification_deliveries'):
+        conn.execute("ALTER TABLE notification_deliveries ADD COLUMN body_html TEXT")
+
+
+def add_authors(conn: sqlite3.Connection, batch_size: int = LEGACY_BATCH_SIZE):
+    """Author entities linked to books, backfilled from the comma-joined books.author"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS authors (
+            author_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL UNIQUE,
+            ol_key TEXT,
+            birth_date TEXT,
+            death_date TEXT,
+            top_work TEXT,
+            work_count INTEGER,
+            info_status TEXT,
+            info_fetched_at TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_authors (
+            book_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (book_id, author_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_authors_author ON book_authors(author_id, book_id)")
+    # One row per word of each author key, so 'tolkien' finds 'J.R.R. Tolkien'
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS author_tokens (
+            token TEXT NOT NULL,
+            author_id INTEGER NOT NULL,
+            PRIMARY KEY (token, author_id)
+        ) WITHOUT ROWID
+    """)
+
+    known = {}
+    last_id = 0
+    while True:
+        cursor.execute("SELECT book_id, author FROM books WHERE book_id > ? ORDER BY book_id LIMIT ?",
+                       (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for book_id, author in rows:
+            link_book_authors(cursor, book_id, author, known)
+        last_id = rows[-1][0]
+
+
+def add_duplicate_index(conn: sqlite3.Connection, batch_size: int = LEGACY_BATCH_SIZE):
+    """MinHash LSH buckets over title and author for near-duplicate lookups"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_minhash (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, book_id)
+        ) WITHOUT ROWID
+    """)
+    last_id = 0
+    while True:
+        cursor.execute("SELECT book_id, title, author FROM books WHERE book_id > ? ORDER BY book_id LIMIT ?",
+                       (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for book_id, title, author in rows:
+            index_book(cursor, book_id, title, author)
+        last_id = rows[-1][0]
+
+
+def add_reservations(conn: sqlite3.Connection):
+    """Per-book FIFO hold queues.
+
+    A returned copy goes to the oldest 'Waiting' hold, which becomes 'Ready'
+    until expires_at; partial indexes keep the queue head, the expiry sweep
+    and the not-yet-notified holds each one index seek away.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reservations (
+            reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            member_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Waiting'
+                CHECK(status IN ('Waiting', 'Ready', 'Fulfilled', 'Cancelled', 'Expired')),
+            reserved_at TEXT DEFAULT (datetime('now')),
+            ready_at TEXT,
+            expires_at TEXT,
+            notified_at TEXT,
+            FOREIGN KEY(book_id) REFERENCES books(book_id),
+            FOREIGN KEY(member_id) REFERENCES members(member_id)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_queue
+        ON reservations(book_id, reservation_id) WHERE status = 'Waiting'
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_expiry
+        ON reservations(expires_at) WHERE status = 'Ready'
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_unnotified
+        ON reservations(reservation_id) WHERE status = 'Ready' AND notified_at IS NULL
+    """)
+    # One open hold per member and book
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reservations_member_book
+        ON reservations(member_id, book_id) WHERE status IN ('Waiting', 'Ready')
+    """)
+
+
+def insert_copies(cursor: sqlite3.Cursor, after_book_id: int = 0):
+    """total_copies shelf copies with generated barcodes for each book with
+    an id above `after_book_id` (books just bulk-inserted); the caller commits"""
+    cursor.execute(f"""
+        WITH RECURSIVE n(i) AS (
+            SELECT 1 UNION ALL SELECT i + 1 FROM n
+            WHERE i < (SELECT MAX(total_copies) FROM books WHERE book_id > ?)
+        )
+        INSERT INTO copies (barcode, book_id, shelf_location)
+        SELECT printf('{BARCODE_FORMAT}', b.book_id, n.i), b.book_id, b.shelf_location
+        FROM books b JOIN n ON n.i <= b.total_copies
+        WHERE b.book_id > ?
+        ORDER BY b.book_id, n.i
+    """, (after_book_id, after_book_id))
+
+
+def add_copies(conn: sqlite3.Connection):
+    """One row per physical copy, and the copy each loan and ready hold refers to.
+
+    Existing counts are exploded set-wise: each book gets
+    max(total_copies, open loans + ready holds) copies with generated
+    barcodes, the first ones assigned to its open loans (oldest first),
+    the next to its ready holds, the rest on the shelf.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS copies (
+            copy_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            shelf_location TEXT,
+            status TEXT NOT NULL DEFAULT 'Available'
+                CHECK(status IN ('Available', 'On Loan', 'On Hold', 'Lost', 'Withdrawn')),
+            added_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY(book_id) REFERENCES books(book_id)
+        )
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_copies_barcode ON copies(barcode)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_copies_book_status ON copies(book_id, status)")
+    # Yearly archives (archive_manager.py) keep the hot table's columns
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'transactions_archive_%'")
+    archives = [row[0] for row in cursor.fetchall()]
+    for table in ['transactions', 'reservations'] + archives:
+        if 'copy_id' not in _columns(cursor, table):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN copy_id INTEGER REFERENCES copies(copy_id)")
+    # Scanning a copy back in finds its open loan directly
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_open_copy
+        ON transactions(copy_id) WHERE return_date IS NULL
+    """)
+
+    cursor.execute("""
+        CREATE TEMP TABLE copy_plan AS
+        SELECT b.book_id, b.shelf_location, COALESCE(l.n, 0) AS loans, COALESCE(h.n, 0) AS holds,
+               MAX(COALESCE(b.total_copies, 0), COALESCE(l.n, 0) + COALESCE(h.n, 0)) AS copies
+        FROM books b
+        LEFT JOIN (SELECT book_id, COUNT(*) AS n FROM transactions
+                   WHERE status = 'Issued' AND return_date IS NULL GROUP BY book_id) l ON l.book_id = b.book_id
+        LEFT JOIN (SELECT book_id, COUNT(*) AS n FROM reservations
+                   WHERE status = 'Ready' GROUP BY book_id) h ON h.book_id = b.book_id
+    """)
+    cursor.execute("CREATE UNIQUE INDEX temp.idx_copy_plan ON copy_plan(book_id)")
+    cursor.execute(f"""
+        WITH RECURSIVE n(i) AS (
+            SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < (SELECT MAX(copies) FROM copy_plan)
+        )
+        INSERT INTO copies (barcode, book_id, shelf_location, status)
+        SELECT printf('{BARCODE_FORMAT}', p.book_id, n.i), p.book_id, p.shelf_location,
+               CASE WHEN n.i <= p.loans THEN 'On Loan'
+                    WHEN n.i <= p.loans + p.holds THEN 'On Hold'
+                    ELSE 'Available' END
+        FROM copy_plan p JOIN n ON n.i <= p.copies
+        ORDER BY p.book_id, n.i
+    """)
+    # Copy k of a book goes to its k-th open loan, then to its ready holds
+    cursor.execute("""
+        CREATE TEMP TABLE copy_owner AS
+        SELECT 'transactions' AS owner, transaction_id AS owner_id, book_id,
+               ROW_NUMBER() OVER (PARTITION BY book_id ORDER BY transaction_id) AS k
+        FROM transactions WHERE status = 'Issued' AND return_date IS NULL
+        UNION ALL
+        SELECT 'reservations', r.reservation_id, r.book_id,
+               COALESCE(p.loans, 0) + ROW_NUMBER() OVER (PARTITION BY r.book_id ORDER BY r.reservation_id)
+        FROM reservations r JOIN copy_plan p ON p.book_id = r.book_id
+        WHERE r.status = 'Ready'
+    """)
+    cursor.execute("CREATE INDEX temp.idx_copy_owner ON copy_owner(owner, owner_id)")
+    for table, pk in (('transactions', 'transaction_id'), ('reservations', 'reservation_id')):
+        cursor.execute(f"""
+            UPDATE {table} SET copy_id = (
+                SELECT c.copy_id FROM copy_owner o
+                JOIN copies c ON c.barcode = printf('{BARCODE_FORMAT}', o.book_id, o.k)
+                WHERE o.owner = '{table}' AND o.owner_id = {table}.{pk}
+            )
+            WHERE {pk} IN (SELECT owner_id FROM copy_owner WHERE owner = '{table}')
+        """)
+    # From here on the counters are derived from the copies
+    cursor.execute("""
+        UPDATE books SET
+            total_copies = (SELECT copies FROM copy_plan p WHERE p.book_id = books.book_id),
+            available_copies = (SELECT copies - loans - holds FROM copy_plan p WHERE p.book_id = books.book_id)
+    """)
+    cursor.execute("DROP TABLE copy_plan")
+    cursor.execute("DROP TABLE copy_owner")
+
+
+def fold_ratings(cursor: sqlite3.Cursor, after_review_id: int = 0):
+    """Add reviews with ids above `after_review_id` (just inserted, one or a
+    whole batch) into their books' book_ratings rows with one grouped
+    upsert; the caller commits"""
+    # NOT INDEXED keeps the planner on the review_id range instead of
+    # walking the whole book_id index for the GROUP BY
+    stars = ', '.join(f"SUM(r.rating = {n})" for n in range(1, 6))
+    added = ', '.join(f"stars_{n} = stars_{n} + excluded.stars_{n}" for n in range(1, 6))
+    cursor.execute(f"""
+        INSERT INTO book_ratings (book_id, category, review_count, rating_sum,
+                                  stars_1, stars_2, stars_3, stars_4, stars_5, average)
+        SELECT r.book_id, b.category, COUNT(*), SUM(r.rating), {stars}, AVG(r.rating)
+        FROM book_reviews r NOT INDEXED LEFT JOIN books b ON b.book_id = r.book_id
+        WHERE r.review_id > ? AND r.book_id IS NOT NULL
+        GROUP BY r.book_id
+        ON CONFLICT(book_id) DO UPDATE SET
+            review_count = review_count + excluded.review_count,
+            rating_sum = rating_sum + excluded.rating_sum,
+            {added},
+            average = (rating_sum + excluded.rating_sum) * 1.0 / (review_count + excluded.review_count)
+    """, (after_review_id,))
+
+
+def add_rating_aggregates(conn: sqlite3.Connection):
+    """Per-book review count, rating sum and 1-5 star histogram.
+
+    The book's category is copied in, so the highest rated books of a
+    category are read off an index instead of scanning every review.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS book_ratings (
+            book_id INTEGER PRIMARY KEY,
+            category TEXT,
+            review_count INTEGER NOT NULL DEFAULT 0,
+            rating_sum INTEGER NOT NULL DEFAULT 0,
+            stars_1 INTEGER NOT NULL DEFAULT 0,
+            stars_2 INTEGER NOT NULL DEFAULT 0,
+            stars_3 INTEGER NOT NULL DEFAULT 0,
+            stars_4 INTEGER NOT NULL DEFAULT 0,
+            stars_5 INTEGER NOT NULL DEFAULT 0,
+            average REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_book_ratings_category
+        ON book_ratings(category, average DESC, review_count DESC)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_ratings_average ON book_ratings(average DESC, review_count DESC)")
+    cursor.execute("DELETE FROM book_ratings")
+    fold_ratings(cursor)
+
+
+def add_interbranch_copy_id(conn: sqlite3.Connection):
+    """Record which copy an outgoing inter-branch loan took off the shelf"""
+    cursor = conn.cursor()
+    if 'copy_id' not in _columns(cursor, 'interbranch_loans'):
+        cursor.execute("ALTER TABLE interbranch_loans ADD COLUMN copy_id INTEGER REFERENCES copies(copy_id)")
+    # Link loans made before this to a copy: as add_copies did for local
+    # loans, mark one shelf copy per open outgoing loan as on loan
+    cursor.execute("""
+        SELECT loan_id, book_id FROM interbranch_loans
+        WHERE direction = 'out' AND status = 'Issued' AND copy_id IS NULL
+        ORDER BY loan_id
+    """)
+    books = set()
+    for loan_id, book_id in cursor.fetchall():
+        cursor.execute("SELECT copy_id FROM copies WHERE book_id = ? AND status = 'Available' LIMIT 1", (book_id,))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("UPDATE copies SET status = 'On Loan' WHERE copy_id = ?", (row[0],))
+            cursor.execute("UPDATE interbranch_loans SET copy_id = ? WHERE loan_id = ?", (row[0], loan_id))
+            books.add(book_id)
+    # The counter follows the copies (add_copies counted these loans as
+    # shelved; loans made since had lowered it without touching a copy)
+    cursor.executemany("""
+        UPDATE books SET available_copies = (
+            SELECT COUNT(*) FROM copies WHERE copies.book_id = books.book_id AND status = 'Available'
+        )
+        WHERE book_id = ?
+    """, [(book_id,) for book_id in books])
+
+
+def add_isbn13_duplicates(conn: sqlite3.Connection, batch_size: int = 1000):
+    """List the books add_isbn13_key left out of the isbn13 index because
+    another book already holds their ISBN, for the librarian to merge"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS isbn13_duplicates (
+            book_id INTEGER PRIMARY KEY,
+            isbn TEXT,
+            duplicate_of INTEGER
+        )
+    """)
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT book_id, isbn FROM books
+            WHERE isbn13 = '' AND book_id > ?
+            ORDER BY book_id LIMIT ?
+        """, (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        # Invalid ISBNs have no isbn13 and so no holder
+        cursor.executemany("""
+            INSERT OR REPLACE INTO isbn13_duplicates (book_id, isbn, duplicate_of)
+            SELECT ?, ?, book_id FROM books WHERE isbn13 = ?
+        """, [(book_id, isbn, to_isbn13(isbn)) for book_id, isbn in rows if to_isbn13(isbn)])
+        last_id = rows[-1][0]
+
+
+# (version, description, function, transactional)
+# Non-transactional steps commit their own batches and must be resumable.
+MIGRATIONS: List[Tuple[int, str, Callable, bool]] = [
+    (1, "Create base tables", create_base_tables, True),
+    (2, "Add canonical isbn13 key", add_isbn13_key, True),
+    (3, "Add updated_at change tracking", add_change_tracking, True),
+    (4, "Add lookup indexes", add_lookup_indexes, True),
+    (5, "Merge legacy Library_Management.py tables", merge_legacy_tables, False),
+    (6, "Add inter-branch loan ledger", add_interbranch_loans, True),
+    (7, "Add change log", add_change_log, True),
+    (8, "Add notification preferences and delivery log", add_notification_deliveries, True),
+    (9, "Add member locale and HTML message bodies", add_message_locales, True),
+    (10, "Add authors and book_authors", add_authors, True),
+    (11, "Add near-duplicate title index", add_duplicate_index, True),
+    (12, "Add reservations", add_reservations, True),
+    (13, "Add per-copy inventory", add_copies, True),
+    (14, "Add book rating aggregates", add_rating_aggregates, True),
+    (15, "Add copy_id to inter-branch loans", add_interbranch_copy_id, True),
+    (16, "List duplicate ISBNs left out of the isbn13 index", add_isbn13_duplicates, True),
+]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Tuple[int, str, Callable, bool]]:
+    current = get_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current]
+
+
+def migrate(conn: sqlite3.Connection, target: int = None, verbose: bool = False) -> int:
+    """Apply pending migrations in order; returns the resulting schema version"""
+    if get_version(conn) == 0 and conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+        # Only settable before the first table exists (later it takes a full
+        # VACUUM, see maintenance.py): lets maintenance hand freed pages back
+        # to the filesystem in small incremental_vacuum chunks
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    for version, description, step, transactional in pending_migrations(conn):
+        if target is not None and version > target:
+            break
+        if verbose:
+            print(f"Applying migration {version}: {description}")
+        if conn.in_transaction:
+            conn.commit()
+        try:
+            if transactional:
+                conn.execute("BEGIN IMMEDIATE")
+            step(conn)
+            # user_version is written in the same transaction as the step
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except BaseException:
+            # Also on Ctrl+C, so a half-done batch never commits later
+            conn.rollback()
+            raise
+    return get_version(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations to a library database")
+    parser.add_argument("--db", default="library.db")
+    parser.add_argument("--status", action="store_true", help="show the version and pending migrations only")
+    parser.add_argument("--target", type=int, help="migrate up to this version")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        print(f"Schema version: {get_version(conn)}")
+        if args.status:
+            for version, description, _, _ in pending_migrations(conn):
+                print(f"  pending {version}: {description}")
+            return
+        version = migrate(conn, args.target, verbose=True)
+        print(f"Schema version now {version}")
+        if _table_exists(conn.cursor(), 'legacy_migration_state'):
+            for row in conn.execute("SELECT * FROM legacy_migration_state"):
+                print(f"  {row[0]}: merged {row[2]}, deduplicated {row[3]}, skipped {row[4]}")
+        if _table_exists(conn.cursor(), 'isbn13_duplicates'):
+            for book_id, isbn, duplicate_of in conn.execute("SELECT * FROM isbn13_duplicates ORDER BY book_id"):
+                print(f"  duplicate ISBN {isbn}: book {book_id} not indexed, same as book {duplicate_of}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
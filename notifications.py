@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 from typing import List, Dict
 import json
 
+from message_templates import get_store
+
 
 class NotificationManager:
     def __init__(self, smtp_server: str = "smtp.gmail.com", smtp_port: int = 587):
@@ -16,6 +18,7 @@ class NotificationManager:
         self.smtp_port = smtp_port
         self.email_config = self._load_email_config()
         self.sms_config = self._load_sms_config()
+        self.templates = get_store()
 
     def _load_email_config(self) -> Dict:
         """Load email configuration from file or use defaults"""
@@ -58,19 +61,28 @@ class NotificationManager:
             json.dump(config, f, indent=2)
         self.email_config = config
 
-    def send_email(self, recipient: str, subject: str, body: str) -> bool:
+    def build_email(self, recipient: str, subject: str, body: str, html: str = None):
+        """MIME message: plain text, or text plus HTML alternatives"""
+        if html:
+            msg = MIMEMultipart('alternative')
+            msg.attach(MIMEText(body, 'plain'))
+            msg.attach(MIMEText(html, 'html'))
+        else:
+            msg = MIMEText(body, 'plain')
+        msg['From'] = self.email_config.get('sender_email', '')
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        return msg
+
+    def send_email(self, recipient: str, subject: str, body: str, html: str = None) -> bool:
         """Send email notification"""
         if not self.email_config.get('enabled'):
             print(f"[EMAIL NOT SENT - Config not set] To: {recipient}, Subject: {subject}")
             return False
         
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_config['sender_email']
-            msg['To'] = recipient
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
-            
+            msg = self.build_email(recipient, subject, body, html)
+
             server = smtplib.SMTP(self.smtp_server, self.smtp_port)
             server.starttls()
             server.login(self.email_config['sender_email'], self.email_config['sender_password'])
@@ -83,105 +95,86 @@ class NotificationManager:
             print(f"Error sending email: {e}")
             return False
 
+    def get_sms_provider(self):
+        """SMS provider described by sms_config.json (imported on first use)"""
+        from sms_providers import provider_from_config
+        return provider_from_config(self.sms_config)
+
     def send_sms(self, phone_number: str, message: str) -> bool:
-        """Send SMS notification (placeholder - requires SMS API service)"""
+        """Send a single SMS through the configured provider"""
         if not self.sms_config.get('enabled'):
             print(f"[SMS NOT SENT - Config not set] To: {phone_number}, Message: {message[:50]}...")
             return False
-        
-        # This is a placeholder. In production, you would integrate with:
-        # - Twilio API
-        # - AWS SNS
-        # - Other SMS service providers
-        print(f"[SMS] To: {phone_number}, Message: {message}")
-        return True
-
-    def send_due_date_reminder(self, member_email: str, member_name: str, book_title: str, due_date: str):
-        """Send due date reminder email"""
-        subject = "Library Book Due Date Reminder"
-        body = f"""
-Dear {member_name},
-
-This is a reminder that the book "{book_title}" is due on {due_date}.
 
-Please return the book on or before the due date to avoid late fees.
+        import asyncio
+        from sms_providers import send_one
+        try:
+            return asyncio.run(send_one(self.get_sms_provider(), phone_number, message))
+        except Exception as e:
+            print(f"Error sending SMS: {e}")
+            return False
 
-Thank you,
-Library Management System
-        """.strip()
-        return self.send_email(member_email, subject, body)
+    def send_due_date_reminder(self, member_email: str, member_name: str, book_title: str, due_date: str,
+                               locale: str = None):
+        """Send due date reminder email"""
+        message = self.templates.render('due_reminder', {
+            'member_name': member_name, 'book_title': book_title, 'due_date': due_date}, locale)
+        return self.send_email(member_email, message['subject'], message['text'], message['html'])
 
-    def send_overdue_notification(self, member_email: str, member_name: str, book_title: str, 
-                                   due_date: str, days_overdue: int, fine_amount: float):
+    def send_overdue_notification(self, member_email: str, member_name: str, book_title: str,
+                                   due_date: str, days_overdue: int, fine_amount: float, locale: str = None):
         """Send overdue book notification"""
-        subject = "Overdue Book Notification"
-        body = f"""
-Dear {member_name},
-
-The book "{book_title}" is overdue.
-
-Due Date: {due_date}
-Days Overdue: {days_overdue}
-Fine Amount: ${fine_amount:.2f}
-
-Please return the book as soon as possible to avoid additional charges.
-
-Thank you,
-Library Management System
-        """.strip()
-        return self.send_email(member_email, subject, body)
-
-    def send_new_book_notification(self, member_email: str, member_name: str, book_title: str, author: str):
-        """Send new book arrival notification"""
-        subject = "New Book Arrival"
-        body = f"""
-Dear {member_name},
-
-We're excited to inform you that a new book has arrived at the library:
-
-Title: {book_title}
-Author: {author}
-
-Visit the library to check it out!
-
-Thank you,
-Library Management System
-        """.strip()
-        return self.send_email(member_email, subject, body)
+        message = self.templates.render('overdue_notice', {
+            'member_name': member_name, 'book_title': book_title, 'due_date': due_date,
+            'days_overdue': days_overdue, 'fine_amount': f"{fine_amount:.2f}"}, locale)
+        return self.send_email(member_email, message['subject'], message['text'], message['html'])
+
+    def send_new_book_notification(self, member_email: str, member_name: str, book_title: str, author: str,
+                                   locale: str = None):
+        """Send new book arrival notification (BulkNotifier.announce_new_book sends to every member)"""
+        message = self.templates.render('new_book', {
+            'member_name': member_name, 'book_title': book_title, 'author': author}, locale)
+        return self.send_email(member_email, message['subject'], message['text'], message['html'])
+
+    def compose_reminder(self, item: Dict) -> Dict:
+        """Email subject/text/HTML and SMS text for one due or overdue loan"""
+        due_date = item.get('due_date', '')
+
+        # Calculate days overdue
+        try:
+            due = datetime.strptime(due_date, '%Y-%m-%d').date()
+            days_overdue = (datetime.now().date() - due).days
+        except (TypeError, ValueError):
+            days_overdue = 0
+
+        kind = 'overdue' if days_overdue > 0 else 'due'
+        message = self.templates.render('overdue_notice' if kind == 'overdue' else 'due_reminder', {
+            'member_name': item.get('member_name', 'Member'),
+            'book_title': item.get('book_title', 'Book'),
+            'due_date': due_date,
+            'days_overdue': days_overdue,
+            'fine_amount': f"{item.get('fine_amount') or 0:.2f}",
+        }, item.get('locale'))
+        return dict(message, kind=kind, body=message['text'])
 
     def send_bulk_due_reminders(self, overdue_list: List[Dict]):
-        """Send reminders to multiple members"""
+        """Send reminder emails to multiple members, one at a time"""
         results = []
         for item in overdue_list:
             member_email = item.get('email', '')
-            member_name = item.get('member_name', 'Member')
-            book_title = item.get('book_title', 'Book')
-            due_date = item.get('due_date', '')
-            
-            # Calculate days overdue
-            try:
-                due = datetime.strptime(due_date, '%Y-%m-%d').date()
-                days_overdue = (datetime.now().date() - due).days
-            except:
-                days_overdue = 0
-            
-            if days_overdue > 0:
-                result = self.send_overdue_notification(
-                    member_email, member_name, book_title, due_date, days_overdue, 0
-                )
-            else:
-                result = self.send_due_date_reminder(member_email, member_name, book_title, due_date)
-            
+            message = self.compose_reminder(item)
+            result = self.send_email(member_email, message['subject'], message['body'], message['html'])
             results.append({
-                'member': member_name,
+                'member': item.get('member_name', 'Member'),
                 'email': member_email,
                 'sent': result
             })
         
         return results
 
-    def send_sms_reminder(self, phone_number: str, book_title: str, due_date: str):
+    def send_sms_reminder(self, phone_number: str, book_title: str, due_date: str, locale: str = None):
         """Send SMS reminder"""
-        message = f"Reminder: '{book_title}' is due on {due_date}. Please return to library."
-        return self.send_sms(phone_number, message)
+        message = self.templates.render('due_reminder', {
+            'member_name': '', 'book_title': book_title, 'due_date': due_date}, locale)
+        return self.send_sms(phone_number, message['sms'])
 
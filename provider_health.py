@@ -0,0 +1,110 @@
+"""
+Provider Health Module
+Circuit breaker and latency/success tracking for external book providers
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider's circuit is open and calls are being skipped"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now (one probe is let through when half-open)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, hard: bool = False):
+        """Count a failure; hard failures (timeouts, refused connections) open at once"""
+        with self._lock:
+            self.failures += 1
+            if hard or self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class ProviderHealth:
+    def __init__(self, name: str, window: int = 50, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, success: bool, hard: bool = False):
+        """Record the outcome of one call"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(success)
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure(hard)
+
+    @property
+    def p95_latency(self) -> float:
+        with self._lock:
+            if not self.latencies:
+                return 0.0
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    @property
+    def success_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 1.0
+            return sum(self.outcomes) / len(self.outcomes)
+
+    def expected_cost(self, timeout: float) -> float:
+        """Rough expected seconds to an answer: p95 plus failures paid at the timeout"""
+        if self.breaker.state == CircuitBreaker.OPEN:
+            return float('inf')
+        return self.p95_latency + (1 - self.success_rate) * timeout
+
+    def stats(self) -> Dict:
+        return {
+            'provider': self.name,
+            'state': self.breaker.state,
+            'p95_latency': round(self.p95_latency, 3),
+            'success_rate': round(self.success_rate, 3),
+            'samples': len(self.outcomes),
+        }
+
+
+def order_providers(health: Dict[str, ProviderHealth], preferred: List[str], timeout: float) -> List[str]:
+    """Order providers by expected cost, keeping the preferred order on ties"""
+    return sorted(preferred, key=lambda name: health[name].expected_cost(timeout))
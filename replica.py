@@ -0,0 +1,353 @@
+"""
+Replica Module
+Offline-first local replica of the primary library database for desk
+terminals whose library.db lives on a shared network drive
+
+Books and members (with the author index used by author search) are kept
+in a local SQLite file and brought up to date from the primary's change
+feed by sequence number, so searches and pickers read local disk and keep
+working while the primary is unreachable. Everything else, and every
+write, goes to the primary; issue_book, return_book and reserve_book are
+checked for conflicts with changes made at other desks since the last
+sync.
+
+Usage: python replica.py --primary //server/library/library.db --local replica.db status
+       python replica.py --primary //server/library/library.db --local replica.db sync
+"""
+import argparse
+import socket
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from author_utils import link_book_authors
+from db_manager import DatabaseManager
+
+# Tables copied to the replica, with their primary keys
+REPLICATED_TABLES = {
+    'books': 'book_id',
+    'members': 'member_id',
+}
+# DatabaseManager methods answered from the replica
+LOCAL_READS = frozenset({
+    'get_book', 'get_book_by_isbn', 'search_books', 'get_all_books',
+    'get_member', 'get_member_by_email', 'get_all_members', 'get_cache_stats',
+})
+SYNC_BATCH_SIZE = 1000
+SYNC_INTERVAL = 2.0
+
+
+class ReplicaConflict(ValueError):
+    """A forwarded write failed on rows another desk changed since this desk last synced"""
+
+
+class ReplicaDatabase:
+    """DatabaseManager stand-in for a desk: local reads for books and
+    members, the primary for everything else"""
+
+    def __init__(self, primary_db: str, local_db: str = "replica.db", consumer: str = None):
+        self.db_name = primary_db
+        self.local_db = local_db
+        self.consumer = consumer or f"replica-{socket.gethostname()}"
+        self.local = DatabaseManager(local_db)
+        self.local.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS replica_state (
+                primary_db TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL,
+                synced_at TEXT
+            )
+        """)
+        self.local.conn.commit()
+        self._primary: Optional[DatabaseManager] = None
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    @property
+    def primary(self) -> DatabaseManager:
+        """Connection to the primary, opened on first use (and reopened after a failure)"""
+        if self._primary is None:
+            self._primary = DatabaseManager(self.db_name)
+        return self._primary
+
+    def __getattr__(self, name):
+        if name in LOCAL_READS:
+            return getattr(self.local, name)
+        attr = getattr(self.primary, name)
+        if not callable(attr):
+            return attr
+
+        def forwarded(*args, **kwargs):
+            before = self.primary.conn.total_changes
+            result = attr(*args, **kwargs)
+            if self.primary.conn.total_changes != before:
+                # Pull our own write back so local reads show it at once
+                self.try_sync()
+            return result
+        return forwarded
+
+    # ========== FORWARDED WRITES ==========
+    def issue_book(self, member_id: int, book_id: int = None, issue_date: str = None, due_date: str = None,
+                   barcode: str = None) -> int:
+        rows = [('members', member_id)]
+        if book_id is None and barcode:
+            copy = self.primary.get_copy(barcode)
+            book_id = copy['book_id'] if copy else None
+        if book_id is not None:
+            rows.append(('books', book_id))
+        return self._forward('issue_book', rows, member_id, book_id, issue_date, due_date, barcode=barcode)
+
+    def return_book(self, transaction_id: int, return_date: str = None, fine_amount: float = 0) -> Optional[int]:
+        return self._forward('return_book', [('transactions', transaction_id)],
+                             transaction_id, return_date, fine_amount)
+
+    def reserve_book(self, member_id: int, book_id: int) -> int:
+        return self._forward('reserve_book', [('books', book_id), ('members', member_id)], member_id, book_id)
+
+    def _forward(self, method: str, rows: List[Tuple[str, int]], *args, **kwargs):
+        """Run a write on the primary. If it is refused and any of `rows`
+        changed there after the replica's position, the desk acted on a stale
+        copy: that is reported as a ReplicaConflict once the replica has been
+        refreshed, so the desk sees the current state when it retries."""
+        position = self.get_position() or 0
+        try:
+            result = getattr(self.primary, method)(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            self._disconnect()
+            raise ValueError(f"The primary database is unreachable ({e}); try again shortly") from e
+        except ValueError as e:
+            changed = self._changed_since(rows, position)
+            self.try_sync()
+            if changed:
+                raise ReplicaConflict(f"{e}. This was changed at another desk since this desk last synced; "
+                                      f"the local copy has been refreshed.") from e
+            raise
+        self.try_sync()
+        return result
+
+    def _changed_since(self, rows: Iterable[Tuple[str, int]], seq: int) -> bool:
+        """Whether the primary logged a change to any of these rows after `seq`
+        (compaction keeps each row's newest entry, so this stays answerable)"""
+        cursor = self.primary.cursor
+        for table, row_id in rows:
+            cursor.execute("SELECT 1 FROM change_log WHERE table_name = ? AND row_id = ? AND seq > ? LIMIT 1",
+                           (table, row_id, seq))
+            if cursor.fetchone():
+                return True
+        return False
+
+    # ========== SYNC ==========
+    def get_position(self) -> Optional[int]:
+        """Last primary change applied locally, or None before the first snapshot"""
+        self.local.cursor.execute("SELECT last_seq FROM replica_state WHERE primary_db = ?", (self.db_name,))
+        row = self.local.cursor.fetchone()
+        return row[0] if row else None
+
+    def status(self) -> Dict:
+        state = self.local._fetch_one("SELECT * FROM replica_state WHERE primary_db = ?", (self.db_name,))
+        primary_seq = self.primary.get_last_change_seq()
+        position = state['last_seq'] if state else None
+        return {'primary': self.db_name, 'local': self.local_db, 'consumer': self.consumer,
+                'position': position, 'primary_seq': primary_seq,
+                'behind': primary_seq - position if position is not None else None,
+                'synced_at': state['synced_at'] if state else None}
+
+    def snapshot(self) -> int:
+        """Copy the replicated tables whole, as of one primary sequence number;
+        returns the rows copied"""
+        primary, local = self.primary, self.local
+        if primary.conn.in_transaction:
+            primary.conn.commit()
+        copied = 0
+        # One read transaction, so the rows and the sequence number agree
+        primary.cursor.execute("BEGIN")
+        try:
+            seq = primary.get_last_change_seq()
+            local.cursor.execute("BEGIN IMMEDIATE")
+            for table in REPLICATED_TABLES:
+                local.cursor.execute(f"DELETE FROM {table}")
+                source = primary.conn.execute(f"SELECT * FROM {table}")
+                columns = [d[0] for d in source.description]
+                while True:
+                    rows = source.fetchmany(SYNC_BATCH_SIZE)
+                    if not rows:
+                        break
+                    self._store(table, columns, rows)
+                    copied += len(rows)
+            self._set_position(seq)
+            local.conn.commit()
+        except Exception:
+            local.conn.rollback()
+            raise
+        finally:
+            primary.conn.rollback()
+        primary.ack_changes(self.consumer, seq)
+        self._invalidate()
+        return copied
+
+    def sync(self, batch_size: int = SYNC_BATCH_SIZE) -> int:
+        """Apply the primary's changes since the replica's position (taking a
+        snapshot first if there is none); returns the rows refreshed"""
+        position = self.get_position()
+        if position is None or (position and not self._registered()):
+            # Never synced, or the primary dropped this consumer and may have
+            # compacted away changes it had not seen
+            return self.snapshot()
+        applied = 0
+        while True:
+            changes = self.primary.changes_since(position, batch_size)
+            if not changes:
+                break
+            ids: Dict[str, set] = {table: set() for table in REPLICATED_TABLES}
+            for change in changes:
+                if change['table_name'] in ids:
+                    ids[change['table_name']].add(change['row_id'])
+            fetched = {table: self._fetch_rows(table, row_ids) for table, row_ids in ids.items() if row_ids}
+
+            local = self.local
+            local.cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if self.get_position() != position:
+                    # Another connection (the background worker) applied this batch
+                    local.conn.rollback()
+                    position = self.get_position()
+                    continue
+                for table, (columns, rows) in fetched.items():
+                    self._store(table, columns, rows)
+                    gone = ids[table] - {row[0] for row in rows}
+                    self._delete(table, gone)
+                    applied += len(rows) + len(gone)
+                position = changes[-1]['seq']
+                self._set_position(position)
+                local.conn.commit()
+            except Exception:
+                local.conn.rollback()
+                raise
+            self.primary.ack_changes(self.consumer, position)
+            self._invalidate(fetched)
+            if len(changes) < batch_size:
+                break
+        return applied
+
+    def try_sync(self) -> Optional[int]:
+        """sync(), or None if the primary cannot be reached right now"""
+        try:
+            return self.sync()
+        except sqlite3.OperationalError:
+            self._disconnect()
+            return None
+
+    def start_sync(self, interval: float = SYNC_INTERVAL):
+        """Keep the replica current from a background thread with its own connections"""
+        if self._worker is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            worker = ReplicaDatabase(self.db_name, self.local_db, self.consumer)
+            try:
+                while not self._stop.is_set():
+                    worker.try_sync()
+                    self._stop.wait(interval)
+            finally:
+                worker.close()
+
+        self._worker = threading.Thread(target=run, name="replica-sync", daemon=True)
+        self._worker.start()
+
+    def stop_sync(self):
+        if self._worker is not None:
+            self._stop.set()
+            self._worker.join()
+            self._worker = None
+
+    def _registered(self) -> bool:
+        self.primary.cursor.execute("SELECT 1 FROM change_consumers WHERE consumer = ?", (self.consumer,))
+        return self.primary.cursor.fetchone() is not None
+
+    def _fetch_rows(self, table: str, row_ids: set) -> Tuple[List[str], List[tuple]]:
+        """Current primary rows among `row_ids` (rows deleted there are absent)"""
+        pk = REPLICATED_TABLES[table]
+        row_ids = list(row_ids)
+        columns, rows = None, []
+        for offset in range(0, len(row_ids), 500):
+            batch = row_ids[offset:offset + 500]
+            cursor = self.primary.conn.execute(
+                f"SELECT * FROM {table} WHERE {pk} IN ({', '.join('?' * len(batch))})", batch)
+            columns = [d[0] for d in cursor.description]
+            rows.extend(tuple(row) for row in cursor.fetchall())
+        return columns, rows
+
+    def _store(self, table: str, columns: List[str], rows: List[tuple]):
+        """Write primary rows locally, primary key first in `columns`"""
+        cursor = self.local.cursor
+        # REPLACE also clears a local row still holding a unique value (an
+        # ISBN, an email) that has moved to another row on the primary
+        cursor.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join('?' * len(columns))})", rows)
+        if table == 'books':
+            known = {}
+            author = columns.index('author')
+            for row in rows:
+                link_book_authors(cursor, row[0], row[author], known)
+        # The replica's own change log has no readers
+        cursor.execute("DELETE FROM change_log")
+
+    def _delete(self, table: str, row_ids: set):
+        pk = REPLICATED_TABLES[table]
+        for row_id in row_ids:
+            if table == 'books':
+                self.local.cursor.execute("DELETE FROM book_authors WHERE book_id = ?", (row_id,))
+            self.local.cursor.execute(f"DELETE FROM {table} WHERE {pk} = ?", (row_id,))
+
+    def _set_position(self, seq: int):
+        self.local.cursor.execute("""
+            INSERT INTO replica_state (primary_db, last_seq, synced_at) VALUES (?, ?, datetime('now'))
+            ON CONFLICT(primary_db) DO UPDATE SET last_seq = excluded.last_seq, synced_at = excluded.synced_at
+        """, (self.db_name, seq))
+
+    def _invalidate(self, fetched: Dict = None):
+        if fetched is None:
+            self.local.book_cache.clear()
+            self.local.member_cache.clear()
+            return
+        for table, (_, rows) in fetched.items():
+            cache = self.local.book_cache if table == 'books' else self.local.member_cache
+            for row in rows:
+                cache.invalidate(row[0])
+
+    def _disconnect(self):
+        if self._primary is not None:
+            try:
+                self._primary.close()
+            except sqlite3.Error:
+                pass
+            self._primary = None
+
+    def close(self):
+        self.stop_sync()
+        self._disconnect()
+        self.local.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local replica of the primary library database")
+    parser.add_argument("--primary", required=True, help="the shared library.db")
+    parser.add_argument("--local", default="replica.db")
+    parser.add_argument("command", choices=["status", "sync", "snapshot"])
+    args = parser.parse_args()
+
+    replica = ReplicaDatabase(args.primary, args.local)
+    try:
+        if args.command == "snapshot":
+            print(f"Copied {replica.snapshot()} rows")
+        elif args.command == "sync":
+            print(f"Refreshed {replica.sync()} rows")
+        status = replica.status()
+        print(f"{status['local']} follows {status['primary']} as {status['consumer']}: "
+              f"at change {status['position']} of {status['primary_seq']}, last synced {status['synced_at']}")
+    finally:
+        replica.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+SMS Providers Module
+Provider interface for bulk SMS delivery, an HTTP bulk-endpoint provider
+and a logging stand-in used when SMS is not configured
+"""
+import asyncio
+import time
+from typing import Dict, List
+
+import aiohttp
+
+from async_book_api import TokenBucket, parse_retry_after
+
+
+class SMSProvider:
+    """Interface every SMS provider implements.
+
+    send_batch() receives at most `max_batch` messages, each a dict with
+    'ref' (our delivery id), 'to' and 'body', and returns one result per
+    message: {'ref', 'status': 'sent' | 'failed' | 'retry',
+    'message_id', 'error'}. 'retry' means the message may be sent again.
+    """
+    name = 'base'
+    max_batch = 1
+    concurrency = 1
+    rate = 1.0  # batch requests per second
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send_batch(self, messages: List[Dict]) -> List[Dict]:
+        raise NotImplementedError
+
+
+class LogSMSProvider(SMSProvider):
+    """Prints messages instead of sending them (SMS not configured)"""
+    name = 'log'
+    max_batch = 1000
+    concurrency = 1
+    rate = 1000.0
+
+    async def send_batch(self, messages: List[Dict]) -> List[Dict]:
+        for message in messages:
+            print(f"[SMS NOT SENT - Config not set] To: {message['to']}, Message: {message['body'][:50]}...")
+        return [{'ref': m['ref'], 'status': 'failed', 'message_id': None, 'error': 'SMS not configured'}
+                for m in messages]
+
+
+class HTTPSMSProvider(SMSProvider):
+    """Generic JSON bulk endpoint: POST {base_url}/messages/bulk.
+
+    Request:  {"from": ..., "messages": [{"client_ref", "to", "body"}, ...]}
+    Response: {"results": [{"client_ref", "status": "accepted"|"rejected", "message_id", "error"}]}
+    Throttling (429/503 with Retry-After) pauses the shared token bucket;
+    server errors and timeouts are retried with backoff, then reported as
+    'retry' so the messages stay queued.
+    """
+    name = 'http'
+
+    def __init__(self, base_url: str, api_key: str = '', api_secret: str = '', from_number: str = '',
+                 max_batch: int = 100, concurrency: int = 4, rate: float = 10.0,
+                 timeout: float = 10, max_retries: int = 3):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.from_number = from_number
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.bucket = None
+        self.session = None
+
+    async def open(self):
+        if self.session is None:
+            self.bucket = TokenBucket(self.rate)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                auth=aiohttp.BasicAuth(self.api_key, self.api_secret) if self.api_key else None,
+                headers={'User-Agent': 'Library Management System/1.0'}
+            )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def send_batch(self, messages: List[Dict]) -> List[Dict]:
+        await self.open()
+        payload = {
+            'from': self.from_number,
+            'messages': [{'client_ref': str(m['ref']), 'to': m['to'], 'body': m['body']} for m in messages],
+        }
+        error = None
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                async with self.session.post(f"{self.base_url}/messages/bulk", json=payload) as response:
+                    if response.status in (429, 503):
+                        self.bucket.pause(parse_retry_after(response.headers.get('Retry-After'), 2.0 ** attempt))
+                        error = f"throttled ({response.status})"
+                        continue
+                    if response.status >= 500:
+                        error = f"server error {response.status}"
+                        await asyncio.sleep(min(8.0, 0.2 * 2 ** attempt))
+                        continue
+                    if response.status >= 400:
+                        # The whole batch was refused; retrying will not help
+                        text = await response.text()
+                        return [{'ref': m['ref'], 'status': 'failed', 'message_id': None,
+                                 'error': f"{response.status}: {text[:200]}"} for m in messages]
+                    data = await response.json(content_type=None)
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                error = str(e) or type(e).__name__
+                await asyncio.sleep(min(8.0, 0.2 * 2 ** attempt))
+                continue
+
+            by_ref = {str(r.get('client_ref')): r for r in data.get('results', [])}
+            results = []
+            for message in messages:
+                result = by_ref.get(str(message['ref']))
+                if result is None:
+                    results.append({'ref': message['ref'], 'status': 'retry', 'message_id': None,
+                                    'error': 'missing from provider response'})
+                elif result.get('status') == 'accepted':
+                    results.append({'ref': message['ref'], 'status': 'sent',
+                                    'message_id': result.get('message_id'), 'error': None})
+                else:
+                    results.append({'ref': message['ref'], 'status': 'failed', 'message_id': None,
+                                    'error': result.get('error') or 'rejected'})
+            return results
+
+        return [{'ref': m['ref'], 'status': 'retry', 'message_id': None, 'error': error} for m in messages]
+
+
+def provider_from_config(config: Dict) -> SMSProvider:
+    """Build the SMS provider described by sms_config.json"""
+    if not config.get('enabled') or not config.get('base_url'):
+        return LogSMSProvider()
+    return HTTPSMSProvider(
+        config['base_url'],
+        api_key=config.get('api_key', ''),
+        api_secret=config.get('api_secret', ''),
+        from_number=config.get('from_number', ''),
+        max_batch=config.get('max_batch', 100),
+        concurrency=config.get('concurrency', 4),
+        rate=config.get('rate', 10.0),
+    )
+
+
+async def send_one(provider: SMSProvider, phone_number: str, message: str) -> bool:
+    """Send a single SMS through a provider"""
+    try:
+        result = (await provider.send_batch([{'ref': int(time.time() * 1000), 'to': phone_number,
+                                              'body': message}]))[0]
+        return result['status'] == 'sent'
+    finally:
+        await provider.close()
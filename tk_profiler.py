@@ -0,0 +1,316 @@
+"""
+Tk Profiler Module
+Profiling mode for the Tk application (main.py --profile). Every Tk
+callback, including after() handlers, is timed per call site; callbacks
+that block the event loop longer than a threshold are recorded with a
+stack sample taken while they are still running, which shows whether the
+freeze is SQLite, PIL decoding, a requests call or Treeview inserts.
+tracemalloc snapshots taken when a window opens and again after it closes
+show what each kind of window leaves behind (e.g. PhotoImages still
+referenced from cover_label.image).
+
+Everything kept is bounded: per call site and per window totals, the last
+few stalls, and at most one snapshot per open window, so a profiled desk
+session can run all day. The report is rewritten periodically and on exit.
+"""
+import gc
+import linecache
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+import tracemalloc
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+# Frames tracemalloc keeps per allocation; more frames cost more memory
+TRACE_FRAMES = 5
+# Innermost frame modules that identify what a stalled callback was doing
+STALL_CAUSES = (
+    ('image decoding', ('PIL',)),
+    ('network', ('requests', 'urllib3', 'http', 'socket', 'ssl')),
+    ('database', ('sqlite3', 'db_manager.py', 'migrations.py', 'analytics.py')),
+    ('tk', ('tkinter',)),
+)
+
+
+def _callback_target(func: Callable) -> Callable:
+    """The user function behind a registered Tk callback (after() registers
+    a local callit wrapper that closes over it)"""
+    code = getattr(func, '__code__', None)
+    if code is not None and code.co_name == 'callit' and 'func' in code.co_freevars:
+        return func.__closure__[code.co_freevars.index('func')].cell_contents
+    return func
+
+
+def describe_callback(func: Callable) -> str:
+    """'Qualified.name (file.py:line)' for a callback"""
+    target = _callback_target(func)
+    prefix = 'after ' if target is not func else ''
+    name = getattr(target, '__qualname__', None) or type(target).__qualname__
+    code = getattr(getattr(target, '__func__', target), '__code__', None)
+    where = f" ({os.path.basename(code.co_filename)}:{code.co_firstlineno})" if code else ''
+    return f"{prefix}{name}{where}"
+
+
+def _opener() -> str:
+    """The first function outside tkinter on the stack: what opened a window"""
+    frame = sys._getframe(2)
+    tk_dir = os.path.dirname(tk.__file__)
+    while frame is not None and frame.f_code.co_filename.startswith(tk_dir):
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else 'unknown'
+
+
+def _inside_callback(stack: traceback.StackSummary) -> traceback.StackSummary:
+    """The frames of a stack sample below Tk's CallWrapper, i.e. the callback's own"""
+    for position in range(len(stack) - 1, -1, -1):
+        frame = stack[position]
+        if frame.name == '__call__' and frame.filename == tk.__file__:
+            return traceback.StackSummary.from_list(stack[position + 1:])
+    return stack
+
+
+def stall_cause(stack: traceback.StackSummary) -> str:
+    """What a callback's stack sample was doing, judged from its innermost
+    frame that belongs to a known library"""
+    for frame in reversed(stack):
+        for cause, markers in STALL_CAUSES:
+            if any(marker in frame.filename for marker in markers):
+                return cause
+    return 'python'
+
+
+class TkProfiler:
+    def __init__(self, report_path: str = "profile_report.txt", stall_threshold: float = 0.2,
+                 report_interval: float = 300.0, max_stalls: int = 50, top: int = 15):
+        self.report_path = report_path
+        self.stall_threshold = stall_threshold
+        self.report_interval = report_interval
+        self.top = top
+        self.started = time.time()
+        self.root: Optional[tk.Tk] = None
+        self.cache_stats: Optional[Callable[[], Dict]] = None
+
+        # label -> [calls, total seconds, max seconds]
+        self.callbacks: Dict[str, list] = {}
+        self.stalls = deque(maxlen=max_stalls)
+        self.stall_counts: Dict[str, int] = {}
+        self.loop_lag = {'ticks': 0, 'late': 0, 'max': 0.0}
+        # window kind -> opens, closes, bytes retained after closing, Tk images left, top retaining lines
+        self.windows: Dict[str, Dict] = {}
+        self._open_windows: Dict[str, tuple] = {}
+        self.memory_growth = []
+        self._baseline = None
+
+        # Set by the Tk thread around each callback, read by the watchdog
+        self._current = None
+        self._sample = None
+        self._overhead = 0.0
+        self._main_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._original_call = None
+        self._original_toplevel_init = None
+
+    # ========== INSTALLATION ==========
+    def install(self):
+        """Start tracing and hook Tk callbacks and Toplevel windows; call
+        before the application creates its widgets"""
+        tracemalloc.start(TRACE_FRAMES)
+        self._baseline = self._snapshot()
+        profiler = self
+        self._original_call = original_call = tk.CallWrapper.__call__
+        self._original_toplevel_init = original_init = tk.Toplevel.__init__
+
+        def timed_call(wrapper, *args):
+            return profiler._run(wrapper, original_call, args)
+
+        def toplevel_init(window, *args, **kwargs):
+            original_init(window, *args, **kwargs)
+            profiler._window_opened(window, _opener())
+
+        tk.CallWrapper.__call__ = timed_call
+        tk.Toplevel.__init__ = toplevel_init
+        threading.Thread(target=self._watch, name="tk-profiler", daemon=True).start()
+
+    def attach(self, root: tk.Tk, cache_stats: Callable[[], Dict] = None):
+        """Start the loop-lag heartbeat and periodic reports for an application;
+        F12 writes the report immediately"""
+        self.root = root
+        self.cache_stats = cache_stats
+        root.bind_all("<F12>", lambda e: self.write_report())
+        self._tick(time.perf_counter())
+        root.after(int(self.report_interval * 1000), self._periodic_report)
+
+    def uninstall(self):
+        self._stop.set()
+        if self._original_call:
+            tk.CallWrapper.__call__ = self._original_call
+            tk.Toplevel.__init__ = self._original_toplevel_init
+            self._original_call = None
+        tracemalloc.stop()
+
+    # ========== CALLBACK TIMING ==========
+    def _run(self, wrapper, original_call, args):
+        if self._current is not None:
+            # A nested event loop (wait_window, update) inside a callback
+            return original_call(wrapper, *args)
+        target = _callback_target(wrapper.func)
+        code = getattr(getattr(target, '__func__', target), '__code__', None)
+        if code is not None and code.co_filename == __file__:
+            # The profiler's own heartbeat and window hooks
+            return original_call(wrapper, *args)
+        label = describe_callback(wrapper.func)
+        overhead = self._overhead
+        start = time.perf_counter()
+        current = self._current = (label, start)
+        try:
+            return original_call(wrapper, *args)
+        finally:
+            self._current = None
+            elapsed = time.perf_counter() - start - (self._overhead - overhead)
+            sample, self._sample = self._sample, None
+            self._record(label, elapsed, sample[1] if sample and sample[0] is current else None)
+
+    def _record(self, label: str, elapsed: float, sample: traceback.StackSummary = None):
+        stats = self.callbacks.get(label)
+        if stats is None:
+            stats = self.callbacks[label] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        if elapsed >= self.stall_threshold:
+            cause = stall_cause(sample) if sample else 'unknown'
+            self.stall_counts[cause] = self.stall_counts.get(cause, 0) + 1
+            self.stalls.append({'at': datetime.now().isoformat(timespec='seconds'), 'callback': label,
+                                'seconds': elapsed, 'cause': cause,
+                                'stack': ''.join(sample.format()) if sample else ''})
+
+    def _watch(self):
+        """Sample the Tk thread's stack once per callback that overruns the threshold"""
+        interval = max(min(self.stall_threshold / 4, 0.05), 0.005)
+        while not self._stop.wait(interval):
+            current = self._current
+            if current is None or (self._sample is not None and self._sample[0] is current):
+                continue
+            if time.perf_counter() - current[1] >= self.stall_threshold:
+                frame = sys._current_frames().get(self._main_thread)
+                if frame is not None and self._current is current:
+                    self._sample = (current, _inside_callback(traceback.extract_stack(frame, limit=40)))
+
+    def _tick(self, expected: float):
+        """Heartbeat: how late the event loop runs a 100 ms timer catches
+        stalls outside Python callbacks too (layout, redraws)"""
+        lag = time.perf_counter() - expected
+        self.loop_lag['ticks'] += 1
+        if lag >= self.stall_threshold:
+            self.loop_lag['late'] += 1
+        self.loop_lag['max'] = max(self.loop_lag['max'], lag)
+        if not self._stop.is_set():
+            self.root.after(100, self._tick, time.perf_counter() + 0.1)
+
+    # ========== MEMORY ==========
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Collect garbage and snapshot; the time taken is not charged to callbacks"""
+        start = time.perf_counter()
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            # Source lines read to format stack samples
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        self._overhead += time.perf_counter() - start
+        return snapshot
+
+    def _image_count(self, widget) -> int:
+        try:
+            return len(widget.tk.call('image', 'names'))
+        except tk.TclError:
+            return 0
+
+    def _window_opened(self, window: tk.Toplevel, kind: str):
+        stats = self.windows.setdefault(kind, {'opens': 0, 'closes': 0, 'retained': 0,
+                                               'images_left': 0, 'top': []})
+        stats['opens'] += 1
+        self._open_windows[str(window)] = (kind, self._snapshot(), self._image_count(window))
+        window.bind("<Destroy>", lambda e: e.widget is window and self._window_closed(window), add="+")
+
+    def _window_closed(self, window: tk.Toplevel):
+        entry = self._open_windows.pop(str(window), None)
+        if entry is None or self.root is None:
+            return
+        # Measure once the widgets are gone and their callbacks released
+        self.root.after_idle(self._measure_closed, *entry)
+
+    def _measure_closed(self, kind: str, opened: tracemalloc.Snapshot, images: int):
+        diff = [stat for stat in self._snapshot().compare_to(opened, 'lineno') if stat.size_diff > 0]
+        stats = self.windows[kind]
+        stats['closes'] += 1
+        stats['retained'] += sum(stat.size_diff for stat in diff)
+        stats['images_left'] += max(self._image_count(self.root) - images, 0)
+        stats['top'] = [str(stat) for stat in diff[:5]]
+
+    # ========== REPORT ==========
+    def _periodic_report(self):
+        self.write_report()
+        if not self._stop.is_set():
+            self.root.after(int(self.report_interval * 1000), self._periodic_report)
+
+    def write_report(self, path: str = None) -> str:
+        """Write the report (replacing the previous one) and return its path"""
+        path = path or self.report_path
+        if tracemalloc.is_tracing():
+            growth = self._snapshot().compare_to(self._baseline, 'lineno')
+            self.memory_growth = [str(stat) for stat in growth[:self.top] if stat.size_diff > 0]
+            current, peak = tracemalloc.get_traced_memory()
+        else:
+            current = peak = 0
+        with open(path, 'w', encoding='utf-8') as out:
+            out.write(self.format_report(current, peak))
+        return path
+
+    def format_report(self, current: int = 0, peak: int = 0) -> str:
+        minutes = (time.time() - self.started) / 60
+        lines = [f"Profile of a {minutes:.1f} minute session, written {datetime.now():%Y-%m-%d %H:%M:%S}",
+                 f"Stall threshold {self.stall_threshold * 1000:.0f} ms", ""]
+
+        lines.append("== Callbacks by total time ==")
+        lines.append(f"{'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9}  callback")
+        ranked = sorted(self.callbacks.items(), key=lambda item: -item[1][1])
+        for label, (calls, total, longest) in ranked[:self.top * 2]:
+            lines.append(f"{calls:7d} {total:9.2f} {total / calls * 1000:9.1f} {longest * 1000:9.1f}  {label}")
+
+        lines += ["", "== Event loop =="]
+        lag = self.loop_lag
+        lines.append(f"{lag['ticks']} heartbeats, {lag['late']} late by over the threshold, "
+                     f"worst {lag['max'] * 1000:.0f} ms")
+        causes = ', '.join(f"{cause} {count}" for cause, count in
+                           sorted(self.stall_counts.items(), key=lambda item: -item[1]))
+        lines.append(f"Stalls by cause: {causes or 'none'}")
+
+        lines += ["", f"== Last {len(self.stalls)} stalls =="]
+        for stall in reversed(self.stalls):
+            lines.append(f"{stall['at']}  {stall['seconds'] * 1000:.0f} ms  [{stall['cause']}]  {stall['callback']}")
+            if stall['stack']:
+                lines.extend("    " + line for line in stall['stack'].rstrip().splitlines())
+
+        lines += ["", "== Memory ==",
+                  f"Traced now {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB",
+                  "Growth since startup:"]
+        lines.extend("    " + line for line in self.memory_growth or ["(none)"])
+        lines += ["", "Per window (kept after closing):"]
+        for kind, stats in sorted(self.windows.items(), key=lambda item: -item[1]['retained']):
+            lines.append(f"  {kind}: opened {stats['opens']}, closed {stats['closes']}, "
+                         f"{stats['retained'] / 1024:.1f} KiB retained, {stats['images_left']} Tk images left")
+            lines.extend("      " + line for line in stats['top'])
+
+        if self.cache_stats:
+            lines += ["", "== Caches =="]
+            for name, stats in self.cache_stats().items():
+                lines.append(f"  {name}: " + ', '.join(f"{key} {value}" for key, value in stats.items()))
+        return '\n'.join(lines) + '\n'